@@ -1,22 +1,78 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
+import asyncio
+import time
 import os
 
-# Secret key to sign JWTs (should be env var in production)
-SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
-ALGORITHM = "HS256"
+# Signing key and algorithm, shared with the frontend's rate limits
+from common.auth import SECRET_KEY, ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# How long an authenticated user is trusted without re-reading it from the database;
+# this bounds how long a deactivated account (or an old email) keeps working
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+# bcrypt runs on its own small pool so logins can't stall the event loop or eat the
+# request threadpool; beyond PASSWORD_HASH_MAX_QUEUE waiting jobs new ones are refused
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+PASSWORD_HASH_SLOW_QUEUE_MS = float(os.getenv("PASSWORD_HASH_SLOW_QUEUE_MS", "500"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password")
+# Jobs submitted and not finished; only touched from the event loop thread
+_password_jobs = 0
+password_pool_stats = {
+    "completed": 0,
+    "rejected": 0,
+    "queue_seconds_total": 0.0,
+    "queue_seconds_max": 0.0,
+}
+
+class PasswordHasherBusy(Exception):
+    pass
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def password_jobs_in_flight() -> int:
+    return _password_jobs
+
+async def _run_password_job(fn, *args):
+    global _password_jobs
+    if _password_jobs >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        password_pool_stats["rejected"] += 1
+        raise PasswordHasherBusy()
+
+    submitted = time.monotonic()
+    def job():
+        return time.monotonic() - submitted, fn(*args)
+
+    _password_jobs += 1
+    try:
+        queue_seconds, result = await asyncio.get_running_loop().run_in_executor(_password_executor, job)
+    finally:
+        _password_jobs -= 1
+
+    password_pool_stats["completed"] += 1
+    password_pool_stats["queue_seconds_total"] += queue_seconds
+    password_pool_stats["queue_seconds_max"] = max(password_pool_stats["queue_seconds_max"], queue_seconds)
+    if queue_seconds * 1000 > PASSWORD_HASH_SLOW_QUEUE_MS:
+        print(f"⚠️  Password hashing queued for {queue_seconds * 1000:.0f}ms")
+    return result
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_password_job(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -0,0 +1,202 @@
+"""
+Local stand-in for Google Sheets, for benchmarks.
+
+Serves synthetic sheets through the same two doors get_gsheet_df uses:
+- the public CSV export:   /spreadsheets/d/<id>/export?format=csv&gid=0
+- the Sheets v4 API that gspread calls (metadata, values.get, values.batchGet),
+  plus an OAuth token endpoint so a throwaway service account can authenticate.
+
+Sheet ids look like "bench-<rows>-<shape>" (shape: narrow or wide) and are
+generated deterministically on first use.
+"""
+import io
+import csv
+import json
+import random
+import re
+import threading
+import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+SHAPES = {"narrow": 5, "wide": 50}
+COLUMN_KINDS = ("int", "float", "date", "category", "text")
+CATEGORIES = ["North", "South", "East", "West", "Central"]
+
+def sheet_id(rows: int, shape: str) -> str:
+    return f"bench-{rows}-{shape}"
+
+def make_sheet(rows: int, columns: int, seed: int = 42) -> list:
+    """Header plus `rows` rows of mixed numbers, dates, categories and text, as strings."""
+    rng = random.Random(seed)
+    kinds = [COLUMN_KINDS[i % len(COLUMN_KINDS)] for i in range(columns)]
+    header = [f"{kind}_{i}" for i, kind in enumerate(kinds)]
+    start = datetime.date(2024, 1, 1)
+    values = [header]
+    for r in range(rows):
+        row = []
+        for kind in kinds:
+            if kind == "int":
+                row.append(str(rng.randint(0, 100000)))
+            elif kind == "float":
+                row.append(f"{rng.uniform(0, 1000):.2f}")
+            elif kind == "date":
+                row.append((start + datetime.timedelta(days=r % 730)).isoformat())
+            elif kind == "category":
+                row.append(rng.choice(CATEGORIES))
+            else:
+                row.append(f"item {rng.randint(0, 10 ** 6)}")
+        values.append(row)
+    return values
+
+class SheetStore:
+    def __init__(self):
+        self._values = {}
+        self._csv = {}
+        self._lock = threading.Lock()
+
+    def values(self, spreadsheet_id: str) -> list:
+        with self._lock:
+            if spreadsheet_id not in self._values:
+                match = re.fullmatch(r"bench-(\d+)-(\w+)", spreadsheet_id)
+                if not match or match.group(2) not in SHAPES:
+                    raise KeyError(spreadsheet_id)
+                self._values[spreadsheet_id] = make_sheet(int(match.group(1)), SHAPES[match.group(2)])
+            return self._values[spreadsheet_id]
+
+    def csv(self, spreadsheet_id: str) -> bytes:
+        values = self.values(spreadsheet_id)
+        with self._lock:
+            if spreadsheet_id not in self._csv:
+                out = io.StringIO()
+                csv.writer(out, lineterminator="\n").writerows(values)
+                self._csv[spreadsheet_id] = out.getvalue().encode()
+            return self._csv[spreadsheet_id]
+
+def _row_range(a1: str, total: int) -> tuple:
+    """Rows [start, end) selected by an A1 range like 'Sheet1', 'Sheet1'!1:1001 or A1:E20."""
+    cells = a1.rsplit("!", 1)[1] if "!" in a1 else ""
+    numbers = [int(n) for n in re.findall(r"\d+", cells)]
+    if len(numbers) >= 2:
+        return numbers[0] - 1, min(numbers[1], total)
+    return 0, total
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store: SheetStore = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, payload, status: int = 200):
+        self._send(status, json.dumps(payload).encode(), "application/json")
+
+    def do_POST(self):
+        # OAuth token exchange for the throwaway service account
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/token"):
+            return self._json({"access_token": "bench-token", "expires_in": 3600, "token_type": "Bearer"})
+        self._json({"error": "not found"}, 404)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            match = re.fullmatch(r"/spreadsheets/d/([\w-]+)/export", url.path)
+            if match:
+                return self._send(200, self.store.csv(match.group(1)), "text/csv")
+
+            match = re.fullmatch(r"/v4/spreadsheets/([\w-]+)(?:/values/(.+)|/values:batchGet)?", url.path)
+            if match:
+                spreadsheet_id, a1 = match.group(1), match.group(2)
+                values = self.store.values(spreadsheet_id)
+                if url.path.endswith("/values:batchGet"):
+                    return self._json({
+                        "spreadsheetId": spreadsheet_id,
+                        "valueRanges": [self._value_range(values, r) for r in query.get("ranges", [])],
+                    })
+                if a1 is not None:
+                    return self._json(self._value_range(values, unquote(a1)))
+                return self._json(self._metadata(spreadsheet_id, values))
+        except KeyError:
+            return self._json({"error": {"code": 404, "message": "Requested entity was not found."}}, 404)
+        self._json({"error": "not found"}, 404)
+
+    def _value_range(self, values: list, a1: str) -> dict:
+        start, end = _row_range(a1, len(values))
+        return {"range": a1, "majorDimension": "ROWS", "values": values[start:end]}
+
+    def _metadata(self, spreadsheet_id: str, values: list) -> dict:
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "properties": {"title": spreadsheet_id, "locale": "en_US", "timeZone": "Etc/GMT"},
+            "sheets": [{
+                "properties": {
+                    "sheetId": 0,
+                    "title": "Sheet1",
+                    "index": 0,
+                    "sheetType": "GRID",
+                    "gridProperties": {"rowCount": len(values), "columnCount": len(values[0])},
+                }
+            }],
+        }
+
+class FakeSheetsServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        handler = type("Handler", (FakeSheetsHandler,), {"store": SheetStore()})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    def sheet_url(self, spreadsheet_id: str) -> str:
+        return f"{self.base_url}/spreadsheets/d/{spreadsheet_id}/edit"
+
+    def warm(self, spreadsheet_id: str):
+        """Generate a sheet up front so its creation isn't timed."""
+        self.httpd.RequestHandlerClass.store.csv(spreadsheet_id)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def point_gspread_at(base_url: str):
+    """Send gspread's Sheets API calls to the fake server instead of Google."""
+    import gspread.http_client
+    import gspread.urls
+    for name in dir(gspread.urls):
+        value = getattr(gspread.urls, name)
+        if name.startswith("SPREADSHEET") and isinstance(value, str) and hasattr(gspread.http_client, name):
+            setattr(gspread.http_client, name, value.replace(gspread.urls.SPREADSHEETS_API_V4_BASE_URL, f"{base_url}/v4/spreadsheets"))
+
+def write_service_account(path: str, base_url: str):
+    """A throwaway service account key whose token requests go to the fake server."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    with open(path, "w") as f:
+        json.dump({
+            "type": "service_account",
+            "project_id": "bench",
+            "private_key_id": "bench",
+            "private_key": pem,
+            "client_email": "bench@bench.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": f"{base_url}/token",
+        }, f)
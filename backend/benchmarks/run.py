@@ -0,0 +1,244 @@
+"""
+Offline benchmarks for reading sheets.
+
+Starts the fake Google Sheets server (benchmarks/fake_sheets.py) and drives the
+FastAPI app in-process: /data, /analyze and /download, plus get_gsheet_df itself,
+over synthetic sheets of each size and shape, read through the public CSV export
+and through the gspread API path. For every scenario it records latency percentiles,
+throughput, peak RSS and payload bytes, and writes them all to a JSON file.
+
+Run from backend/:
+    python -m benchmarks.run
+    python -m benchmarks.run --rows 1000 10000 --shapes narrow --endpoints data sheet
+    python -m benchmarks.run --baseline benchmarks/results/<earlier run>.json
+
+Plan limits and rate limits are switched off so every run reads whole sheets, and so
+is caching between requests (shared_cache.py) so every request fetches and parses one.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import resource
+import threading
+import subprocess
+import datetime
+
+from benchmarks.fake_sheets import SHAPES, FakeSheetsServer, sheet_id, point_gspread_at, write_service_account
+
+ENDPOINTS = ("sheet", "data", "analyze", "download")
+SOURCES = ("csv", "api")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# --- Measurements ---
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+def current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is KiB on Linux, bytes on macOS; only a fallback
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+class RSSSampler:
+    """Peak resident memory while a scenario runs, sampled from a background thread."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+# --- Scenarios ---
+async def run_scenario(client, endpoint: str, body: dict, requests: int, concurrency: int) -> dict:
+    from starlette.concurrency import run_in_threadpool
+    from sheets import get_gsheet_df
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, sizes, errors = [], [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            if endpoint == "sheet":
+                df = await run_in_threadpool(get_gsheet_df, body["sheet_url"], body["gid"], body["has_headers"])
+                ok, size = True, int(df.memory_usage(deep=True).sum())
+            else:
+                response = await client.post(f"/{endpoint}", json=body)
+                ok, size = response.status_code == 200, len(response.content)
+            latencies.append(time.perf_counter() - start)
+            sizes.append(size)
+            if not ok:
+                errors += 1
+
+    # One untimed request first, so imports and first-use costs don't skew the numbers
+    await one()
+    latencies.clear(), sizes.clear()
+    errors = 0
+
+    with RSSSampler() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(requests)])
+        elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "latency_ms": {
+            "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+            **{f"p{p}": round(percentile(ordered, p) * 1000, 2) for p in (50, 90, 95, 99)},
+            "max": round(ordered[-1] * 1000, 2),
+        },
+        "throughput_rps": round(requests / elapsed, 3),
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+        # Response body size; for "sheet", the DataFrame's in-memory size
+        "payload_bytes": round(sum(sizes) / len(sizes)),
+    }
+
+def use_source(source: str, service_account_file: str):
+    import sheets
+    if source == "api":
+        os.environ["GOOGLE_SERVICE_ACCOUNT_FILE"] = service_account_file
+        sheets.SERVICE_ACCOUNT_FILE = service_account_file
+    else:
+        os.environ.pop("GOOGLE_SERVICE_ACCOUNT_FILE", None)
+
+async def run_all(args, server: FakeSheetsServer, service_account_file: str) -> list:
+    import httpx
+    import main
+
+    results = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for source in args.sources:
+            use_source(source, service_account_file)
+            for rows in args.rows:
+                for shape in args.shapes:
+                    spreadsheet = sheet_id(rows, shape)
+                    server.warm(spreadsheet)
+                    body = {"sheet_url": server.sheet_url(spreadsheet), "gid": "0", "has_headers": True}
+                    for endpoint in args.endpoints:
+                        print(f"▶ {source:<4} {endpoint:<9} {rows:>7} rows {shape:<6}", end=" ", flush=True)
+                        result = await run_scenario(client, endpoint, body, args.requests, args.concurrency)
+                        result.update(source=source, endpoint=endpoint, rows=rows, shape=shape, columns=SHAPES[shape])
+                        results.append(result)
+                        latency = result["latency_ms"]
+                        print(f"p50 {latency['p50']:>9.1f}ms  p95 {latency['p95']:>9.1f}ms  "
+                              f"{result['throughput_rps']:>7.2f} req/s  {result['peak_rss_mb']:>7.1f} MB  "
+                              f"{result['payload_bytes']:>11} B" + (f"  ⚠️ {result['errors']} errors" if result["errors"] else ""))
+    return results
+
+# --- Reporting ---
+def scenario_key(result: dict) -> tuple:
+    return (result["source"], result["endpoint"], result["rows"], result["shape"])
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {scenario_key(r): r for r in json.load(f)["results"]}
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:+7.1f}%" if old else "    n/a"
+
+    print(f"\nChange against {baseline_path}:")
+    print(f"{'scenario':<36} {'p50':>8} {'p95':>8} {'req/s':>8} {'RSS':>8} {'bytes':>8}")
+    for result in results:
+        old = baseline.get(scenario_key(result))
+        if old is None:
+            continue
+        name = "{} {} {} {}".format(*scenario_key(result))
+        print(f"{name:<36} "
+              f"{change(result['latency_ms']['p50'], old['latency_ms']['p50'])} "
+              f"{change(result['latency_ms']['p95'], old['latency_ms']['p95'])} "
+              f"{change(result['throughput_rps'], old['throughput_rps'])} "
+              f"{change(result['peak_rss_mb'], old['peak_rss_mb'])} "
+              f"{change(result['payload_bytes'], old['payload_bytes'])}")
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=list(SHAPES))
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=list(SOURCES))
+    parser.add_argument("--requests", type=int, default=5, help="timed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="tables-alive-bench-")
+    # Set before the app is imported: a throwaway database and no plan or rate limits
+    os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{workdir}/bench.db")
+    os.environ["GOVERNOR_ENABLED"] = "0"
+    os.environ["RATE_LIMIT_ENABLED"] = "0"
+    # and no caching across requests, so every timed request fetches and parses its sheet
+    os.environ["SHARED_CACHE_TTL"] = "0"
+    os.environ["SHARED_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["SHARED_CACHE_SPILL_DIR"] = os.path.join(workdir, "spill")
+
+    server = FakeSheetsServer().start()
+    point_gspread_at(server.base_url)
+    service_account_file = os.path.join(workdir, "service_account.json")
+    write_service_account(service_account_file, server.base_url)
+
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    try:
+        results = asyncio.run(run_all(args, server, service_account_file))
+    finally:
+        server.stop()
+
+    output = args.output or os.path.join(RESULTS_DIR, started_at.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {
+                "started_at": started_at.isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "args": vars(args),
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\n✅ Results written to {output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+# Long lists are sized from this many items
+SIZEOF_SAMPLE = 100
+
+def sizeof(value) -> int:
+    """Approximate bytes held by a value: DataFrames by memory_usage(deep=True), arrays
+    by nbytes, containers and plain objects by their contents."""
+    if hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)) and value:
+        sample = value[:SIZEOF_SAMPLE]
+        size += sum(map(sizeof, sample)) * len(value) // len(sample)
+    elif hasattr(value, "__dict__"):
+        size += sizeof(vars(value))
+    return size
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire `ttl` seconds after they are set."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class SizedCache(TTLCache):
+    """TTLCache also bounded by the bytes its values hold (measured by sizeof).
+
+    Over either bound it evicts by GreedyDual-Size rather than plain LRU: an entry's
+    priority is the cache's clock at its last use plus its cost (seconds it took to
+    produce) per MB, the lowest goes first, and the clock rises to each evicted priority.
+    So big entries that are cheap to rebuild and haven't been used lately go before small
+    or expensive ones. Live entries that are evicted (or too big to hold at all) are
+    handed to `spill(key, value, seconds left)` instead of being dropped."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, max_bytes: int = 256 * 1024 * 1024,
+                 spill: Optional[Callable[[Hashable, Any, float], None]] = None):
+        super().__init__(maxsize, ttl)
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self.bytes = 0
+        self.evictions = 0
+        # key -> [size, cost, priority]
+        self._meta: Dict[Hashable, list] = {}
+        self._clock = 0.0
+
+    def _priority(self, size: int, cost: float) -> float:
+        return self._clock + cost * 1024 * 1024 / max(size, 1)
+
+    def _remove(self, key: Hashable):
+        del self._data[key]
+        self.bytes -= self._meta.pop(key)[0]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    meta = self._meta[key]
+                    meta[2] = self._priority(meta[0], meta[1])
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, cost: float = 0.0):
+        size = sizeof(value)
+        evicted = []
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if size > self.max_bytes:
+                self.evictions += 1
+                evicted.append((key, value, self.ttl))
+            else:
+                self._data[key] = (time.monotonic() + self.ttl, value)
+                self._meta[key] = [size, cost, self._priority(size, cost)]
+                self.bytes += size
+                while len(self._data) > self.maxsize or self.bytes > self.max_bytes:
+                    evicted.append(self._evict())
+        # Spilling does I/O, so outside the lock
+        if self.spill is not None:
+            for key, value, seconds_left in evicted:
+                if seconds_left > 0:
+                    self.spill(key, value, seconds_left)
+
+    def _evict(self) -> tuple:
+        key = min(self._meta, key=lambda k: self._meta[k][2])
+        self._clock = self._meta[key][2]
+        expires_at, value = self._data[key]
+        self._remove(key)
+        self.evictions += 1
+        return key, value, expires_at - time.monotonic()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            self._remove(key)
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._meta.clear()
+            self.bytes = 0
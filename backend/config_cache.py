@@ -0,0 +1,63 @@
+"""
+Read-through cache of serialized dashboard and report configs, with ETags.
+
+Configs are cached by (kind, id) as the JSON body plus an ETag made from the row's
+version, so reopening an unchanged dashboard reads one indexed column instead of the
+whole document and serializing it, and a client that already has it (If-None-Match)
+gets a 304 without a body. The entries live in each worker process, so before one is
+served its version is checked against the row: a write handled by another worker
+never serves a stale body or ETag. Writes call invalidate() to free the entry early.
+"""
+import os
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from cache import TTLCache
+
+CONFIG_CACHE_TTL = float(os.getenv("CONFIG_CACHE_TTL", "30"))
+
+class CachedConfig:
+    def __init__(self, user_id: int, version: int, body: bytes, etag: str):
+        self.user_id = user_id
+        self.version = version
+        self.body = body
+        self.etag = etag
+
+config_cache = TTLCache(maxsize=5000, ttl=CONFIG_CACHE_TTL)
+
+async def get(db: AsyncSession, model, kind: str, row_id: int, user_id: int):
+    """The cached config of a user's row, if it is still at the row's current version."""
+    cached = config_cache.get((kind, row_id))
+    if cached is None or cached.user_id != user_id:
+        return None
+    result = await db.execute(select(model.version).where(model.id == row_id, model.user_id == user_id))
+    if result.scalar() != cached.version:
+        config_cache.pop((kind, row_id))
+        return None
+    return cached
+
+def put(kind: str, config: BaseModel) -> CachedConfig:
+    cached = CachedConfig(config.user_id, config.version, config.model_dump_json().encode(),
+                          f'"{kind}-{config.id}-v{config.version}"')
+    config_cache.set((kind, config.id), cached)
+    return cached
+
+def invalidate(kind: str, *row_ids: int):
+    for row_id in row_ids:
+        config_cache.pop((kind, row_id))
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+def respond(request: Request, cached: CachedConfig) -> Response:
+    # Browsers revalidate on every use and get a 304 while the version is unchanged
+    headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
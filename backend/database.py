@@ -1,11 +1,100 @@
+from sqlalchemy import event, exc
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import time
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+asyncpg://user:password@db:5432/tablesalive")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# --- Tuning (all from the environment) ---
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"  # log every statement; development only
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+
+pool_stats = {
+    "waiting": 0,
+    "checkouts": 0,
+    "timeouts": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+}
+query_stats = {
+    "count": 0,
+    "slow": 0,
+    "seconds_total": 0.0,
+}
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how many callers wait for a connection and for how long."""
+
+    def _do_get(self):
+        pool_stats["waiting"] += 1
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats["timeouts"] += 1
+            raise
+        finally:
+            pool_stats["waiting"] -= 1
+        waited = time.perf_counter() - start
+        pool_stats["checkouts"] += 1
+        pool_stats["wait_seconds_total"] += waited
+        pool_stats["wait_seconds_max"] = max(pool_stats["wait_seconds_max"], waited)
+        return connection
+
+engine_options = {
+    "echo": DB_ECHO,
+    "poolclass": InstrumentedPool,
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+if DATABASE_URL.startswith("postgresql+asyncpg"):
+    engine_options["connect_args"] = {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+
+engine = create_async_engine(DATABASE_URL, **engine_options)
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    query_stats["count"] += 1
+    query_stats["seconds_total"] += elapsed
+    if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+        query_stats["slow"] += 1
+        print(f"⚠️  Slow query ({elapsed * 1000:.0f}ms): {' '.join(statement.split())}")
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _drop_query_timer(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time so the
+    # pooled connection's next query isn't timed against it
+    conn = context.connection
+    if conn is not None and context.execution_context is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+def pool_status() -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        **pool_stats,
+        "queries": dict(query_stats),
+    }
 
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
@@ -0,0 +1,194 @@
+"""
+JSON document columns (dashboard widgets and filters, report widget configs) and
+partial updates to them.
+
+Edits are JSON Patch (RFC 6902) ops whose paths are lists starting with the column:
+["widgets", 2, "config", "layout"]. Integers index arrays ("-" appends), strings
+name object keys. Indexes refer to the version the client last read; the update
+only applies while the stored version still matches, so they can't drift.
+
+The ops are first applied in Python to the stored document, so every dialect rejects
+the same ops (a missing path, a root replace of the wrong type) with a 422. On Postgres
+they then compile into jsonb_set / jsonb_insert / #- expressions and the document is
+changed in the database; those functions return NULL (and would wipe the column) or
+silently do nothing on a bad path, so they only ever see ops checked this way. Other
+dialects (SQLite in development) write the Python result, under the same version check.
+"""
+import copy
+from fastapi import HTTPException
+from sqlalchemy import JSON, Integer, Text, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+from typing import Dict
+
+# JSONB on Postgres (indexable, edited in place by the jsonb functions), JSON elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+class json_array_length(GenericFunction):
+    """json_array_length(), spelled jsonb_array_length() for JSONDocument columns on Postgres."""
+    type = Integer()
+    inherit_cache = True
+
+@compiles(json_array_length, "postgresql")
+def _compile_jsonb_array_length(element, compiler, **kw):
+    return f"jsonb_array_length({compiler.process(element.clauses, **kw)})"
+
+class PatchError(ValueError):
+    pass
+
+# --- Validation ---
+def validate_ops(ops, fields: Dict[str, type]) -> None:
+    """Check ops against the patchable fields ({field: list or dict})."""
+    for op in ops:
+        if op.op == "move" and not op.from_:
+            raise PatchError("'move' needs a from path")
+        for path in (op.path, op.from_) if op.op == "move" else (op.path,):
+            if not path or path[0] not in fields:
+                raise PatchError(f"Paths must start with one of: {', '.join(fields)}")
+            if op.op != "replace" and len(path) < 2:
+                raise PatchError(f"'{op.op}' needs a path inside {path[0]}")
+            if any(isinstance(key, int) and key < 0 for key in path):
+                # Python and Postgres would read them differently (from the end, or not at all)
+                raise PatchError("Array indexes can't be negative")
+            appends = op.op in ("add", "move") and path is op.path
+            if "-" in path[1:] and not (appends and path.index("-") == len(path) - 1):
+                raise PatchError("'-' is only allowed as the last element of an add or move target")
+        if op.op in ("add", "replace") and "value" not in op.model_fields_set:
+            raise PatchError(f"'{op.op}' needs a value")
+        if op.op == "replace" and len(op.path) == 1 and not isinstance(op.value, fields[op.path[0]]):
+            raise PatchError(f"{op.path[0]} must be a {'list' if fields[op.path[0]] is list else 'object'}")
+        if op.op == "move" and op.from_[0] != op.path[0]:
+            raise PatchError("Moves must stay within one field")
+        if op.op == "move" and len(op.path) > len(op.from_) and op.path[:len(op.from_)] == op.from_:
+            raise PatchError("Can't move a value into itself")
+
+# --- Python (any dialect) ---
+def _container(document, path):
+    for key in path:
+        try:
+            if isinstance(document, list) != isinstance(key, int):
+                raise TypeError
+            document = document[key]
+        except (KeyError, IndexError, TypeError):
+            raise PatchError(f"Path not found: {path}")
+    return document
+
+def _add(document, path, value):
+    parent, key = _container(document, path[:-1]), path[-1]
+    if isinstance(parent, list) and key == "-":
+        parent.append(value)
+    elif isinstance(parent, list) and isinstance(key, int) and 0 <= key <= len(parent):
+        parent.insert(key, value)
+    elif isinstance(parent, dict) and isinstance(key, str) and key != "-":
+        # "-" only appends (Postgres would turn the object into an array)
+        parent[key] = value
+    else:
+        raise PatchError(f"Can't add at {path}")
+
+def _remove(document, path):
+    parent, key = _container(document, path[:-1]), path[-1]
+    _container(parent, [key])
+    return parent.pop(key)
+
+def _apply_op(documents, op):
+    if op.op == "replace" and len(op.path) == 1:
+        documents[op.path[0]] = op.value
+    elif op.op == "replace":
+        _container(documents, op.path)
+        _container(documents, op.path[:-1])[op.path[-1]] = op.value
+    elif op.op == "add":
+        _add(documents, op.path, op.value)
+    elif op.op == "remove":
+        _remove(documents, op.path)
+    elif op.op == "move":
+        _add(documents, op.path, _remove(documents, op.from_))
+
+def apply_ops(documents: Dict[str, object], ops) -> Dict[str, object]:
+    """Apply ops to {field: document} and return the fields that changed."""
+    documents = {field: copy.deepcopy(value) for field, value in documents.items()}
+    changed = set()
+    for op in ops:
+        try:
+            _apply_op(documents, op)
+        except PatchError:
+            raise PatchError(f"Can't {op.op} at {op.from_ if op.op == 'move' else op.path}: path not found")
+        changed.add(op.path[0])
+    return {field: documents[field] for field in changed}
+
+# --- Postgres (in the database) ---
+def _pg_path(path):
+    return literal([str(key) for key in path], ARRAY(Text))
+
+def _pg_add(document, path, value):
+    if path[-1] == "-":
+        parent = path[:-1]
+        if not parent:
+            return document.op("||")(func.jsonb_build_array(value))
+        appended = document.op("#>")(_pg_path(parent)).op("||")(func.jsonb_build_array(value))
+        return func.jsonb_set(document, _pg_path(parent), appended, False)
+    if isinstance(path[-1], int):
+        return func.jsonb_insert(document, _pg_path(path), value)
+    return func.jsonb_set(document, _pg_path(path), value, True)
+
+def compile_ops(model, ops) -> dict:
+    """Ops as SET expressions, each column's edits nested over its current value."""
+    values = {}
+    for op in ops:
+        field, path = op.path[0], op.path[1:]
+        document = values.get(field, getattr(model, field))
+        if op.op == "replace":
+            value = literal(op.value, JSONB)
+            values[field] = func.jsonb_set(document, _pg_path(path), value, False) if path else value
+        elif op.op == "add":
+            values[field] = _pg_add(document, path, literal(op.value, JSONB))
+        elif op.op == "remove":
+            values[field] = document.op("#-")(_pg_path(path))
+        elif op.op == "move":
+            source = _pg_path(op.from_[1:])
+            values[field] = _pg_add(document.op("#-")(source), path, document.op("#>")(source))
+    return values
+
+# --- Endpoint helper ---
+async def patch_document(db: AsyncSession, model, row_id: int, user_id: int, fields: Dict[str, type], patch, not_found: str):
+    """Apply `patch` to a user's row if it is still at `patch.version`; returns its id, new version and updated_at.
+    `fields` maps the patchable columns to their document type (list or dict)."""
+    try:
+        validate_ops(patch.ops, fields)
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    current = (model.id == row_id, model.user_id == user_id, model.version == patch.version)
+    result = await db.execute(select(*[getattr(model, field) for field in fields]).where(*current))
+    row = result.first()
+    try:
+        values = apply_ops(dict(row._mapping), patch.ops) if row else None
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if values is not None and db.get_bind().dialect.name == "postgresql":
+        # Checked against this version, which the UPDATE below requires
+        values = compile_ops(model, patch.ops)
+
+    if values is not None:
+        result = await db.execute(
+            update(model)
+            .where(*current)
+            .values(**values, version=model.version + 1)
+            .returning(model.id, model.version, model.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        if row:
+            await db.commit()
+            return row._mapping
+
+    await db.rollback()
+    result = await db.execute(select(model.version).where(model.id == row_id, model.user_id == user_id))
+    version = result.scalar()
+    if version is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    raise HTTPException(
+        status_code=409,
+        detail={"message": "Modified by another request; reload and retry", "version": version},
+    )
@@ -0,0 +1,118 @@
+"""
+Per-plan resource limits for reading sheets.
+
+Each request that fetches a sheet runs under the limits of the caller's active
+subscription (anonymous callers and users without one get the Free plan):
+- max_rows / max_bytes: the download stops once either is reached, so oversized
+  sheets are never parsed in full; the rows read so far are returned.
+- max_concurrent_fetches: further fetches by the same caller get a 429.
+- max_fetch_seconds: deadline for downloading (and waiting for) the sheet.
+Values in Plan.limits override the defaults below. Responses say which limit was hit.
+On top of these, reads are rate limited per caller and per sheet (see ratelimit.py).
+"""
+import os
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import Dict, Optional
+
+import models
+import schemas
+import database
+import ratelimit
+import timing
+from cache import TTLCache
+from routers.auth import get_optional_user
+
+GOVERNOR_ENABLED = os.getenv("GOVERNOR_ENABLED", "1") == "1"
+DEFAULT_PLAN = "Free"
+
+PLAN_DEFAULTS = {
+    "Free": {"max_rows": 1000, "max_bytes": 5 * 1024 * 1024, "max_concurrent_fetches": 2, "max_fetch_seconds": 15},
+    "Pro": {"max_rows": 10000, "max_bytes": 50 * 1024 * 1024, "max_concurrent_fetches": 4, "max_fetch_seconds": 30},
+    "Enterprise": {"max_rows": 100000, "max_bytes": 200 * 1024 * 1024, "max_concurrent_fetches": 8, "max_fetch_seconds": 60},
+}
+
+class Limits:
+    def __init__(self, plan: str, max_rows: Optional[int], max_bytes: Optional[int],
+                 max_concurrent_fetches: Optional[int], max_fetch_seconds: float):
+        self.plan = plan
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_concurrent_fetches = max_concurrent_fetches
+        self.max_fetch_seconds = max_fetch_seconds
+
+    @property
+    def sheet_limits(self) -> Dict[str, Optional[int]]:
+        """Keyword arguments bounding a sheet read (also part of its snapshot key)."""
+        return {"max_rows": self.max_rows, "max_bytes": self.max_bytes}
+
+    def headers(self, limit_hit: Optional[str]) -> Dict[str, str]:
+        headers = {"X-Plan": self.plan}
+        if self.max_rows is not None:
+            headers["X-Row-Limit"] = str(self.max_rows)
+        if limit_hit:
+            headers["X-Limit-Hit"] = limit_hit
+        return headers
+
+UNLIMITED = Limits("Unlimited", None, None, None, 30)
+
+def limits_for_plan(name: Optional[str], overrides: Optional[dict] = None) -> Limits:
+    values = dict(PLAN_DEFAULTS.get(name) or PLAN_DEFAULTS[DEFAULT_PLAN])
+    values.update({k: v for k, v in (overrides or {}).items() if k in values})
+    return Limits(name or DEFAULT_PLAN, **values)
+
+# Plan limits by user id; subscriptions change rarely
+limits_cache = TTLCache(maxsize=10000, ttl=60)
+
+async def user_limits(db: AsyncSession, user: Optional[models.User]) -> Limits:
+    if not GOVERNOR_ENABLED:
+        return UNLIMITED
+    if user is None:
+        return limits_for_plan(DEFAULT_PLAN)
+    limits = limits_cache.get(user.id)
+    if limits is None:
+        result = await db.execute(
+            select(models.Plan.name, models.Plan.limits)
+            .join(models.Subscription, models.Subscription.plan_id == models.Plan.id)
+            .where(models.Subscription.user_id == user.id, models.Subscription.status == "active")
+            .order_by(models.Subscription.start_date.desc())
+            .limit(1)
+        )
+        plan = result.first()
+        limits = limits_for_plan(plan.name, plan.limits) if plan else limits_for_plan(DEFAULT_PLAN)
+        limits_cache.set(user.id, limits)
+    return limits
+
+def client_address(request: Request) -> str:
+    # The frontend proxy appends the browser's address; earlier entries are client-supplied
+    forwarded = request.headers.get("x-forwarded-for", "").split(",")[-1].strip()
+    return forwarded or (request.client.host if request.client else "unknown")
+
+async def fetch_limits(
+    request: Request,
+    req: schemas.SheetRequest,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(database.get_db)
+):
+    """Dependency: the caller's limits, admitting the read past the rate limits and
+    holding the caller's and the sheet's concurrency slots for the request."""
+    with timing.stage("limits"):
+        limits = await user_limits(db, current_user)
+    # Release the connection before the (slow) sheet download
+    await db.close()
+
+    caller = ("user", current_user.id) if current_user else ("client", client_address(request))
+    source = ("source", req.sheet_url, req.gid or "0")
+    ratelimit.check_rate(caller, ratelimit.RATE_LIMIT_USER_RATE, ratelimit.RATE_LIMIT_USER_BURST,
+                         "Too many sheet reads, slow down")
+    ratelimit.check_rate(source, ratelimit.RATE_LIMIT_SOURCE_RATE, ratelimit.RATE_LIMIT_SOURCE_BURST,
+                         "This sheet is being read too often, try again shortly")
+    with ratelimit.concurrency_slot(
+        caller, limits.max_concurrent_fetches,
+        f"Too many sheet reads in progress for the {limits.plan} plan",
+        headers=limits.headers("max_concurrent_fetches"),
+    ), ratelimit.concurrency_slot(
+        source, ratelimit.RATE_LIMIT_SOURCE_CONCURRENCY, "This sheet is already being read, try again shortly"
+    ):
+        yield limits
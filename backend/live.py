@@ -0,0 +1,81 @@
+import os
+import asyncio
+from typing import Dict, List, Set
+from starlette.concurrency import run_in_threadpool
+
+import workers
+from sheets import cached_fetch_sheet
+from snapshots import store, Snapshot
+
+# How often a sheet with live subscribers is re-read from Google
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", "15"))
+# Comment line sent on idle streams so proxies don't close them
+LIVE_HEARTBEAT_INTERVAL = float(os.getenv("LIVE_HEARTBEAT_INTERVAL", "20"))
+
+class Subscription:
+    def __init__(self, sources: Dict[tuple, List[int]]):
+        # source key -> datasource ids of this subscriber reading that sheet
+        self.sources = sources
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+class LiveHub:
+    """Fans snapshot changes out to subscribers, polling each subscribed sheet once
+    no matter how many clients are watching it."""
+
+    def __init__(self, poll_interval: float = LIVE_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._subscriptions: Dict[tuple, Set[Subscription]] = {}
+        self._pollers: Dict[tuple, asyncio.Task] = {}
+        self._loop = None
+        store.add_listener(self._on_snapshot)
+
+    def subscribe(self, sources: Dict[tuple, List[int]]) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(sources)
+        for key in sources:
+            self._subscriptions.setdefault(key, set()).add(subscription)
+            if key not in self._pollers:
+                self._pollers[key] = asyncio.create_task(self._poll(key))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for key in subscription.sources:
+            subscribers = self._subscriptions.get(key)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscriptions[key]
+                poller = self._pollers.pop(key, None)
+                if poller:
+                    poller.cancel()
+
+    def _on_snapshot(self, snapshot: Snapshot):
+        # Called from whichever thread recorded the snapshot (request threadpool or poller)
+        if self._loop is None or snapshot.key not in self._subscriptions:
+            return
+        self._loop.call_soon_threadsafe(self._publish, snapshot)
+
+    def _publish(self, snapshot: Snapshot):
+        for subscription in self._subscriptions.get(snapshot.key, ()):
+            for datasource_id in subscription.sources[snapshot.key]:
+                subscription.queue.put_nowait({
+                    "datasource_id": datasource_id,
+                    "version": snapshot.version,
+                })
+
+    async def _poll(self, key: tuple):
+        # Source keys are fetch_sheet's arguments, including the subscribers' plan limits
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                # Through the shared cache, so several workers polling one sheet fetch it once
+                raw = await run_in_threadpool(cached_fetch_sheet, key)
+                result = await workers.run(workers.hashes_only, raw)
+                store.record_hashes(key, result.columns, result.hashes)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Live poll failed for {key[0]}: {e}")
+
+hub = LiveHub()
@@ -1,14 +1,7 @@
 import os
-import io
-import time
-import hashlib
-import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse, Response
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
 from typing import Optional, List, Any, Dict
 
 app = FastAPI()
@@ -21,172 +14,147 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- Configuration ---
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-SERVICE_ACCOUNT_FILE = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE', 'service_account.json')
+import metrics
+import timing
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(timing.ServerTimingMiddleware)
 
 # --- Database & Routers ---
-from database import engine, Base, AsyncSessionLocal
-from models import Plan
+import database
+import schemas
+from database import AsyncSessionLocal
+import migrations
+import seed
 from routers.auth import router as auth_router
 from routers.datasources import router as datasources_router
 from routers.dashboards import router as dashboards_router
 from routers.reports import router as reports_router
-from sqlalchemy.future import select
+from routers.live import router as live_router
+from routers.profiles import router as profiles_router
+from sheets import cached_fetch_sheet, sheet_cache, source_key, workbook_cache
+from governor import Limits, fetch_limits
+from snapshots import store
+import workers
+from report_jobs import materializer
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import text
+import auth_utils
+from routers.auth import principal_cache
+from governor import limits_cache
+from config_cache import config_cache
 
 app.include_router(auth_router)
 app.include_router(datasources_router)
 app.include_router(dashboards_router)
 app.include_router(reports_router)
+app.include_router(live_router)
+app.include_router(profiles_router)
+
+# --- Metrics read when scraped ---
+metrics.cache_metrics({
+    "principal": principal_cache, "limits": limits_cache, "config": config_cache,
+    "sheets": sheet_cache.memory, "workbooks": workbook_cache.memory, "results": workers.result_cache.memory,
+})
+metrics.memory_metrics({
+    "sheets": sheet_cache, "workbooks": workbook_cache, "results": workers.result_cache, "snapshots": store,
+})
+metrics.threadpool_metrics()
+metrics.registry.gauge("db_pool_connections", "Database connections, by state", ("state",), collect=lambda: {
+    (state,): database.pool_status()[state] for state in ("checked_out", "checked_in", "waiting")
+})
+metrics.registry.counter("db_pool_timeouts_total", "Connection checkouts that timed out",
+                         collect=lambda: {(): database.pool_stats["timeouts"]})
+metrics.registry.gauge("password_jobs_in_flight", "Password hashes running or queued",
+                       collect=lambda: {(): auth_utils.password_jobs_in_flight()})
+metrics.registry.counter("password_jobs_rejected_total", "Password hashes refused because the queue was full",
+                         collect=lambda: {(): auth_utils.password_pool_stats["rejected"]})
+
+# Set to 0 when migrations and seeding run as a separate step
+# (python migrations.py && python seed.py, the prod compose file's migrate service)
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1") == "1"
 
 @app.on_event("startup")
 async def startup():
-    # create db tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
-    # Migration: Add grid_columns and grid_rows to dashboards table if they don't exist
-    from sqlalchemy import text
-    async with engine.begin() as conn:
-        try:
-            # Check and add grid_columns
-            result = await conn.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'dashboards' AND column_name = 'grid_columns'
-            """))
-            if not result.fetchone():
-                await conn.execute(text("ALTER TABLE dashboards ADD COLUMN grid_columns INTEGER DEFAULT 12"))
-                print("✓ Added grid_columns column to dashboards table")
-            
-            # Check and add grid_rows
-            result = await conn.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'dashboards' AND column_name = 'grid_rows'
-            """))
-            if not result.fetchone():
-                await conn.execute(text("ALTER TABLE dashboards ADD COLUMN grid_rows INTEGER DEFAULT 10"))
-                print("✓ Added grid_rows column to dashboards table")
-        except Exception as e:
-            print(f"⚠️  Migration check failed (may already be migrated): {e}")
-    
-    # Seed Plans
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Plan).where(Plan.name == "Free"))
-        if not result.scalars().first():
-            plans = [
-                Plan(name="Free", price="$0", limits={"max_rows": 1000}),
-                Plan(name="Pro", price="$9.50", limits={"max_rows": 10000}),
-                Plan(name="Enterprise", price="$24.95", limits={"max_rows": 100000})
-            ]
-            session.add_all(plans)
-            await session.commit()
-            
-    # Seed Admin User
-    import auth_utils
-    from models import User
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).where(User.email == "admin@tablesalive.com"))
-        if not result.scalars().first():
-            hashed_password = auth_utils.get_password_hash("admin1324")
-            admin_user = User(
-                email="admin@tablesalive.com", 
-                hashed_password=hashed_password,
-                is_active=True
-            )
-            session.add(admin_user)
-            await session.commit()
-
-# --- Models ---
-class SheetRequest(BaseModel):
-    sheet_url: str
-    gid: Optional[str] = None
-    has_headers: Optional[bool] = True
+    # Worker processes import pandas while the rest of startup runs
+    workers.start()
+
+    if AUTO_MIGRATE:
+        # Only take the migration lock when something is pending
+        if await migrations.pending_versions():
+            await migrations.migrate()
+        await seed.seed()
+    materializer.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    materializer.stop()
+    workers.shutdown()
 
 # --- Helpers ---
-def csv_hash(df):
-    return hashlib.md5(
-        pd.util.hash_pandas_object(df, index=True).values
-    ).hexdigest()
-
-def get_gsheet_df(sheet_url: str, gid: str = None, has_headers: bool = True) -> pd.DataFrame:
-    raw_values = []
-    
-    # 1. Fetch Raw Data (List of Lists)
-    if os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE') and os.path.exists(SERVICE_ACCOUNT_FILE):
-        creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        gc = gspread.authorize(creds)
-        try:
-            sh = gc.open_by_url(sheet_url)
-        except Exception as e:
-            raise Exception(f"Could not open sheet: {str(e)}")
-
-        worksheet = None
-        if gid is not None:
-            for ws in sh.worksheets():
-                if str(ws.id) == str(gid):
-                    worksheet = ws
-                    break
-            if not worksheet:
-                raise Exception(f"Worksheet with gid {gid} not found")
-        else:
-            worksheet = sh.sheet1
-        
-        raw_values = worksheet.get_all_values()
-    else:
-        # Public sheet logic
-        base_url = sheet_url.split('/edit')[0]
-        csv_url = f"{base_url}/export?format=csv"
-        if gid:
-            csv_url += f"&gid={gid}"
-        
-        start = time.time()
-        last_hash = None
-        
-        while True:
-            # header=None ensures we read the file exactly as it is (no rows skipped)
-            df_temp = pd.read_csv(csv_url, header=None, on_bad_lines='skip')
-            current_hash = hashlib.md5(pd.util.hash_pandas_object(df_temp).values).hexdigest()
-            
-            if last_hash is not None and current_hash == last_hash:
-                raw_values = df_temp.values.tolist()
-                break
-                
-            last_hash = current_hash
-            if time.time() - start > 30: # 30s is more than enough for small CSVs
-                if not df_temp.empty:
-                    raw_values = df_temp.values.tolist()
-                    break
-                raise TimeoutError("Sheet data did not stabilize")
-            time.sleep(1)
-
-    # 2. Process Header Logic (Lossless)
-    if not raw_values:
-        return pd.DataFrame()
-
-    if has_headers:
-        # First row is headers
-        columns = [str(x) for x in raw_values[0]]
-        data_rows = raw_values[1:]
-        return pd.DataFrame(data_rows, columns=columns)
-    else:
-        # No headers: keep all rows (including row 0), use numeric columns
-        return pd.DataFrame(raw_values)
+async def read_sheet(req: schemas.SheetRequest, limits: Limits, task, **params) -> workers.SheetResult:
+    """Fetch a sheet (in the threadpool, through the shared cache) and process it with a workers task."""
+    raw = await run_in_threadpool(cached_fetch_sheet, sheet_key(req, limits), limits.max_fetch_seconds)
+    return await workers.run(task, raw, **params)
+
+def sheet_key(req: schemas.SheetRequest, limits: Limits) -> tuple:
+    return source_key(req.sheet_url, req.gid, req.has_headers, **limits.sheet_limits)
 
 # --- Routes ---
 
 @app.get("/")
 def health_check():
+    """Liveness: the process is up (doesn't touch the database)."""
     return {"status": "ok"}
 
+# Once the schema is up to date it stays so for this process
+_schema_ready = False
+
+@app.get("/ready")
+async def readiness():
+    """Readiness: the database answers and its schema is up to date."""
+    global _schema_ready
+    try:
+        async with database.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        if not _schema_ready:
+            pending = await migrations.pending_versions()
+            if pending:
+                raise HTTPException(status_code=503, detail=f"Migrations pending: {pending}")
+            _schema_ready = True
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {e}")
+    return {"status": "ready"}
+
+@app.get("/db/stats")
+def db_stats(_: None = Depends(metrics.require_metrics_token)):
+    # Pool and slow-query details: behind the metrics token, like /metrics
+    return database.pool_status()
+
+@app.get("/metrics")
+async def prometheus_metrics(_: None = Depends(metrics.require_metrics_token)):
+    # async: the threadpool gauges can only be read on the event loop
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/data")
-def get_data(req: SheetRequest):
+async def get_data(req: schemas.SheetRequest, since: Optional[str] = None, limits: Limits = Depends(fetch_limits)):
+    """Sheet rows as records. With `since` (a previous X-Snapshot-Version), only the
+    row ranges that changed since that version, as ops replacing old rows [start:end]."""
     try:
-        df = get_gsheet_df(req.sheet_url, req.gid, req.has_headers)
-        # Convert NaN to None for valid JSON
-        records = df.where(pd.notnull(df), None).to_dict(orient='records')
-        response = JSONResponse(content=records)
+        key = sheet_key(req, limits)
+        previous = store.find(key, since) if since is not None else None
+        result = await read_sheet(
+            req, limits, workers.data_body,
+            since=since, previous=(previous.columns, previous.row_hashes) if previous else None,
+        )
+        with timing.stage("snapshot"):
+            snapshot = store.record_hashes(key, result.columns, result.hashes)
+        # Records and JSON encoding, the response's CPU cost beyond reading the sheet
+        metrics.serialization_seconds.observe(result.serialize_seconds, endpoint="data")
+        metrics.data_responses.inc(kind=result.payload["kind"])
+        response = Response(content=result.payload["body"], media_type="application/json", headers=limits.headers(result.limit_hit))
+        response.headers["X-Snapshot-Version"] = snapshot.version
         response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
         response.headers["Pragma"] = "no-cache"
         response.headers["Expires"] = "0"
@@ -196,15 +164,15 @@ def get_data(req: SheetRequest):
         return JSONResponse(content={"error": str(e)}, status_code=400)
 
 @app.post("/analyze")
-def analyze(req: SheetRequest):
+async def analyze(req: schemas.SheetRequest, limits: Limits = Depends(fetch_limits)):
     try:
-        df = get_gsheet_df(req.sheet_url, req.gid, req.has_headers)
+        result = await read_sheet(req, limits, workers.analyze_content)
+        with timing.stage("snapshot"):
+            store.record_hashes(sheet_key(req, limits), result.columns, result.hashes)
         response = JSONResponse(content={
-            'columns': list(df.columns),
-            'preview': df.head(10).where(pd.notnull(df), None).to_dict(orient='records'),
-            'total_rows': len(df),
-            'numeric_columns': list(df.select_dtypes(include=['number']).columns)
-        })
+            **result.payload,
+            'limit_hit': result.limit_hit
+        }, headers=limits.headers(result.limit_hit))
         response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
         response.headers["Pragma"] = "no-cache"
         response.headers["Expires"] = "0"
@@ -217,12 +185,13 @@ def analyze(req: SheetRequest):
         return response
 
 @app.post("/download")
-def download(req: SheetRequest):
+async def download(req: schemas.SheetRequest, limits: Limits = Depends(fetch_limits)):
     try:
-        df = get_gsheet_df(req.sheet_url, req.gid, req.has_headers)
-        stream = io.StringIO()
-        df.to_csv(stream, index=False)
-        response = Response(content=stream.getvalue(), media_type="text/csv")
+        result = await read_sheet(req, limits, workers.csv_body)
+        with timing.stage("snapshot"):
+            store.record_hashes(sheet_key(req, limits), result.columns, result.hashes)
+        metrics.serialization_seconds.observe(result.serialize_seconds, endpoint="download")
+        response = Response(content=result.payload, media_type="text/csv", headers=limits.headers(result.limit_hit))
         response.headers["Content-Disposition"] = "attachment; filename=data.csv"
         response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
         response.headers["Pragma"] = "no-cache"
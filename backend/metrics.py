@@ -0,0 +1,63 @@
+"""
+Backend metrics: sheet reads, caches, the threadpool and whatever other modules add
+to `registry`. The metric types, the registry, the HTTP middleware and the /metrics
+token are in common/metrics.py, shared with the frontend.
+"""
+from typing import Dict
+
+from common.metrics import (  # noqa: F401  (re-exported for the app's modules)
+    registry, MetricsMiddleware, metrics_authorized, require_metrics_token,
+)
+
+# --- Sheet reads ---
+fetch_seconds = registry.histogram(
+    "sheet_fetch_duration_seconds", "Time to read a sheet into a DataFrame, by source type", ("source",))
+stabilization_iterations = registry.histogram(
+    "sheet_stabilization_iterations", "CSV downloads until two in a row matched",
+    buckets=(1, 2, 3, 4, 5, 10, 20, 30))
+bytes_downloaded = registry.counter("sheet_bytes_downloaded_total", "CSV export bytes downloaded")
+rows_parsed = registry.counter("sheet_rows_parsed_total", "Data rows read from sheets, by source type", ("source",))
+limit_hits = registry.counter("sheet_limit_hits_total", "Sheet reads cut short by a plan limit", ("limit",))
+serialization_seconds = registry.histogram(
+    "serialization_duration_seconds", "Time to turn a DataFrame into a response body", ("endpoint",))
+data_responses = registry.counter("data_responses_total", "/data responses, by kind (records, full, delta)", ("kind",))
+
+# --- Numbers kept elsewhere, read when scraped ---
+def cache_metrics(caches: Dict[str, object]):
+    """Hit/miss counters and sizes of named TTLCaches."""
+    registry.counter("cache_hits_total", "Cache lookups that found a live entry", ("cache",),
+                     collect=lambda: {(name,): cache.hits for name, cache in caches.items()})
+    registry.counter("cache_misses_total", "Cache lookups that found nothing", ("cache",),
+                     collect=lambda: {(name,): cache.misses for name, cache in caches.items()})
+    registry.gauge("cache_entries", "Entries currently cached", ("cache",),
+                   collect=lambda: {(name,): len(cache) for name, cache in caches.items()})
+
+def memory_metrics(caches: Dict[str, object]):
+    """Bytes held in memory and spilled to disk by named memory-budgeted caches
+    (anything with resident_bytes, spilled_bytes and evictions)."""
+    registry.gauge("cache_resident_bytes", "Bytes of cached values held in memory", ("cache",),
+                   collect=lambda: {(name,): cache.resident_bytes for name, cache in caches.items()})
+    registry.gauge("cache_spilled_bytes", "Bytes of cached values spilled to disk", ("cache",),
+                   collect=lambda: {(name,): cache.spilled_bytes for name, cache in caches.items()})
+    registry.counter("cache_evictions_total", "Entries moved out of memory to stay within budget", ("cache",),
+                     collect=lambda: {(name,): cache.evictions for name, cache in caches.items()})
+
+def threadpool_metrics():
+    """Saturation of the threadpool running sync endpoints (anyio's default limiter).
+    Only readable on the event loop, so /metrics must be an async endpoint."""
+    from anyio.to_thread import current_default_thread_limiter
+
+    def read(value):
+        def collect():
+            try:
+                return {(): value(current_default_thread_limiter())}
+            except RuntimeError:  # no running event loop
+                return {}
+        return collect
+
+    registry.gauge("threadpool_threads_busy", "Worker threads running sync endpoints or run_in_threadpool calls",
+                   collect=read(lambda limiter: limiter.borrowed_tokens))
+    registry.gauge("threadpool_threads_max", "Size of the worker threadpool",
+                   collect=read(lambda limiter: limiter.total_tokens))
+    registry.gauge("threadpool_tasks_waiting", "Calls waiting for a free worker thread",
+                   collect=read(lambda limiter: limiter.statistics().tasks_waiting))
@@ -0,0 +1,132 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once, in order, and is recorded in the schema_migrations table.
+Run them with `python migrations.py` (e.g. as a one-off container before a deploy);
+the backend also applies pending ones at startup unless AUTO_MIGRATE=0.
+Migrations must be safe on databases that predate this table, so they check the
+schema before changing it.
+"""
+import asyncio
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from database import engine, Base
+import models  # noqa: F401  (registers the tables on Base.metadata)
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+# Arbitrary key for the Postgres advisory lock serializing concurrent migrators
+MIGRATION_LOCK_ID = 4242001
+
+# --- Migrations (each takes a sync connection) ---
+def create_initial_schema(conn):
+    Base.metadata.create_all(conn)
+
+def add_dashboard_grid_columns(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("dashboards")}
+    if "grid_columns" not in columns:
+        conn.execute(text("ALTER TABLE dashboards ADD COLUMN grid_columns INTEGER DEFAULT 12"))
+    if "grid_rows" not in columns:
+        conn.execute(text("ALTER TABLE dashboards ADD COLUMN grid_rows INTEGER DEFAULT 10"))
+
+def add_version_columns(conn):
+    for table in ("dashboards", "reports"):
+        columns = {c["name"] for c in inspect(conn).get_columns(table)}
+        if "version" not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+def convert_documents_to_jsonb(conn):
+    if conn.dialect.name != "postgresql":
+        return
+    documents = {
+        "dashboards": ("widgets", "filters", "column_mapping"),
+        "reports": ("widget_config", "filters", "column_mapping"),
+    }
+    for table, names in documents.items():
+        types = {c["name"]: c["type"] for c in inspect(conn).get_columns(table)}
+        for name in names:
+            if not isinstance(types[name], JSONB):
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {name} TYPE JSONB USING {name}::jsonb"))
+
+def add_report_viewed_at(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("report_results")}
+    if "viewed_at" not in columns:
+        conn.execute(text("ALTER TABLE report_results ADD COLUMN viewed_at TIMESTAMP WITH TIME ZONE"))
+    create_indexes("ix_report_results_viewed_at")(conn)
+
+def create_indexes(*names):
+    def migration(conn):
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in names:
+                    index.create(conn, checkfirst=True)
+    return migration
+
+def create_tables(*names):
+    def migration(conn):
+        for name in names:
+            Base.metadata.tables[name].create(conn, checkfirst=True)
+    return migration
+
+MIGRATIONS = [
+    (1, "Initial schema", create_initial_schema),
+    (2, "Add grid_columns and grid_rows to dashboards", add_dashboard_grid_columns),
+    (3, "Index per-user and per-datasource lookups", create_indexes(
+        "ix_datasources_user_id_id",
+        "ix_dashboards_user_id_id",
+        "ix_dashboards_datasource_id_user_id",
+        "ix_reports_user_id_id",
+        "ix_reports_datasource_id_user_id",
+        "ix_subscriptions_user_id",
+    )),
+    (4, "Add version to dashboards and reports", add_version_columns),
+    (5, "Store dashboard and report documents as JSONB", convert_documents_to_jsonb),
+    (6, "Add report_results for precomputed reports", create_tables("report_results")),
+    (7, "Track when report results were last viewed", add_report_viewed_at),
+]
+
+# --- Runner ---
+def _applied_versions(conn) -> set:
+    if not inspect(conn).has_table("schema_migrations"):
+        return set()
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+def _apply_pending(conn) -> list:
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+    schema_migrations.create(conn, checkfirst=True)
+    applied = _applied_versions(conn)
+
+    done = []
+    for version, description, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        migration(conn)
+        conn.execute(schema_migrations.insert().values(version=version, description=description))
+        print(f"✓ Applied migration {version}: {description}")
+        done.append(version)
+    return done
+
+async def migrate() -> list:
+    """Apply pending migrations in one transaction; returns the versions applied."""
+    async with engine.begin() as conn:
+        return await conn.run_sync(_apply_pending)
+
+async def pending_versions() -> list:
+    async with engine.connect() as conn:
+        applied = await conn.run_sync(_applied_versions)
+    return [version for version, _, _ in MIGRATIONS if version not in applied]
+
+if __name__ == "__main__":
+    applied = asyncio.run(migrate())
+    print(f"\n✅ Database is up to date ({len(applied)} migration(s) applied)")
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+from documents import JSONDocument
 
 class User(Base):
     __tablename__ = "users"
@@ -29,6 +30,9 @@ class Plan(Base):
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        Index("ix_subscriptions_user_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -42,6 +46,9 @@ class Subscription(Base):
 
 class Datasource(Base):
     __tablename__ = "datasources"
+    __table_args__ = (
+        Index("ix_datasources_user_id_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -56,34 +63,70 @@ class Datasource(Base):
 
 class Dashboard(Base):
     __tablename__ = "dashboards"
+    __table_args__ = (
+        Index("ix_dashboards_user_id_id", "user_id", "id"),
+        Index("ix_dashboards_datasource_id_user_id", "datasource_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     datasource_id = Column(Integer, ForeignKey("datasources.id"))
     name = Column(String, nullable=False)
-    widgets = Column(JSON, default=[]) # Array of widget configs
-    filters = Column(JSON, default=[]) # Array of filter configs
-    column_mapping = Column(JSON, default={}) # Original -> New column mapping
+    widgets = Column(JSONDocument, default=[]) # Array of widget configs
+    filters = Column(JSONDocument, default=[]) # Array of filter configs
+    column_mapping = Column(JSONDocument, default={}) # Original -> New column mapping
     grid_columns = Column(Integer, default=12) # Number of grid columns
     grid_rows = Column(Integer, default=10) # Number of grid rows
+    version = Column(Integer, nullable=False, server_default="1") # Bumped on every write (optimistic locking)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", back_populates="dashboards")
     datasource = relationship("Datasource", back_populates="dashboards")
 
+    __mapper_args__ = {"version_id_col": version}
+
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        Index("ix_reports_user_id_id", "user_id", "id"),
+        Index("ix_reports_datasource_id_user_id", "datasource_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     datasource_id = Column(Integer, ForeignKey("datasources.id"))
     name = Column(String, nullable=False)
-    widget_config = Column(JSON, default={}) # Single widget config
-    filters = Column(JSON, default=[]) # Array of filter configs
-    column_mapping = Column(JSON, default={}) # Original -> New column mapping
+    widget_config = Column(JSONDocument, default={}) # Single widget config
+    filters = Column(JSONDocument, default=[]) # Array of filter configs
+    column_mapping = Column(JSONDocument, default={}) # Original -> New column mapping
+    version = Column(Integer, nullable=False, server_default="1") # Bumped on every write (optimistic locking)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", back_populates="reports")
     datasource = relationship("Datasource", back_populates="reports")
+    result = relationship("ReportResult", back_populates="report", uselist=False,
+                          cascade="all, delete-orphan", passive_deletes=True)
+
+    __mapper_args__ = {"version_id_col": version}
+
+class ReportResult(Base):
+    """A report's widget, precomputed from its sheet (see report_jobs.py)."""
+    __tablename__ = "report_results"
+
+    report_id = Column(Integer, ForeignKey("reports.id", ondelete="CASCADE"), primary_key=True)
+    report_version = Column(Integer) # Report.version the result was computed for
+    source_version = Column(String) # Snapshot version of the sheet it was computed from
+    result = Column(JSONDocument)
+    error = Column(String) # Why the last recompute failed, if it did
+    computed_at = Column(DateTime(timezone=True)) # Last successful recompute
+    attempted_at = Column(DateTime(timezone=True)) # Last recompute, successful or not
+    refreshing_until = Column(DateTime(timezone=True)) # Lease of the worker recomputing it
+    viewed_at = Column(DateTime(timezone=True)) # Last read of the result; only recently viewed ones are kept fresh
+
+    report = relationship("Report", back_populates="result")
+
+    __table_args__ = (
+        Index("ix_report_results_viewed_at", "viewed_at"),
+    )
@@ -0,0 +1,38 @@
+from fastapi import Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+# Upper bound for ?limit= on list endpoints
+MAX_PAGE_SIZE = 500
+
+async def keyset_page(
+    db: AsyncSession,
+    query,
+    id_column,
+    response: Response,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+    include_count: bool = False,
+):
+    """Run a list query ordered by id, one page at a time.
+
+    The page starts after `after_id`; when it is full, the id to pass as `after_id` for
+    the next page is returned in the X-Next-Cursor header. With `include_count` the
+    total number of rows (ignoring paging) is returned in X-Total-Count.
+    """
+    if include_count:
+        total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+        response.headers["X-Total-Count"] = str(total)
+
+    if after_id is not None:
+        query = query.where(id_column > after_id)
+    query = query.order_by(id_column)
+    if limit is not None:
+        query = query.limit(limit)
+
+    result = await db.execute(query)
+    rows = result.mappings().all()
+    if limit is not None and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    return rows
@@ -0,0 +1,54 @@
+"""
+Token-bucket rate limits and concurrency caps for sheet reads.
+
+Every read spends a token from the caller's bucket and from the sheet's bucket,
+which refill at a steady rate up to a burst size, and holds a concurrency slot for
+both while it runs. Requests over a limit get 429 with Retry-After. The sheet
+limits are shared by all users, so one heavy user can't burn the Google quota.
+
+State lives in a RateLimitStore (common/ratelimit.py, shared with the frontend).
+MemoryStore keeps it per process; a shared store (e.g. Redis) implementing the same
+three methods makes the limits hold across workers and replicas.
+"""
+import os
+import math
+from contextlib import contextmanager
+from fastapi import HTTPException, status
+from typing import Hashable, Optional
+
+from common.ratelimit import RateLimitStore, MemoryStore
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# Sheet reads per second per user (or anonymous client), and the burst allowed above that
+RATE_LIMIT_USER_RATE = float(os.getenv("RATE_LIMIT_USER_RATE", "2"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "20"))
+# Reads per second of any one sheet, across all users
+RATE_LIMIT_SOURCE_RATE = float(os.getenv("RATE_LIMIT_SOURCE_RATE", "2"))
+RATE_LIMIT_SOURCE_BURST = float(os.getenv("RATE_LIMIT_SOURCE_BURST", "20"))
+# Simultaneous reads of any one sheet
+RATE_LIMIT_SOURCE_CONCURRENCY = int(os.getenv("RATE_LIMIT_SOURCE_CONCURRENCY", "4")) if RATE_LIMIT_ENABLED else None
+
+store: RateLimitStore = MemoryStore()
+
+def too_many_requests(detail: str, retry_after: float = 1, headers: Optional[dict] = None) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after))), **(headers or {})},
+    )
+
+def check_rate(key: Hashable, rate: float, burst: float, detail: str):
+    if not RATE_LIMIT_ENABLED:
+        return
+    wait = store.take(key, rate, burst)
+    if wait:
+        raise too_many_requests(detail, wait)
+
+@contextmanager
+def concurrency_slot(key: Hashable, limit: Optional[int], detail: str, headers: Optional[dict] = None):
+    if not store.acquire(key, limit):
+        raise too_many_requests(detail, headers=headers)
+    try:
+        yield
+    finally:
+        store.release(key)
@@ -0,0 +1,270 @@
+"""
+Precomputed report results.
+
+A report's widget is computed on the server (widgets.py) and stored in report_results,
+so opening a report is one small read instead of downloading its sheet and computing
+the widget in the browser. Only reports viewed in the last REPORT_ACTIVE_SECONDS are
+kept fresh, since every recompute reads the sheet as the report's owner (their Google
+quota, our CPU). Their results are recomputed in the background when:
+- the report is edited (PUT / PATCH, or its version no longer matches the result's),
+- its sheet's snapshot changes (any read of the sheet in this process: /data, the live
+  poller, another report's recompute),
+- it is older than REPORT_REFRESH_INTERVAL (a periodic sweep, which also picks up
+  results computed by another worker).
+GET /reports/{id}/result serves a fresh report's result at once, stale or not (it says
+which), and queues the recompute. A report never computed, or not viewed lately, is
+computed while the caller waits.
+
+Every backend worker runs the sweep; a lease (refreshing_until) keeps two of them from
+recomputing one report at the same time. Sheets are read through the shared cache, so
+reports over one sheet fetch it once.
+"""
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+from starlette.concurrency import run_in_threadpool
+
+import models
+import workers
+import widgets
+from database import AsyncSessionLocal
+from governor import user_limits
+from sheets import cached_fetch_sheet, datasource_source_key
+from snapshots import store, Snapshot, snapshot_version
+
+# Results older than this are recomputed by the sweep; 0 turns the sweep off
+REPORT_REFRESH_INTERVAL = float(os.getenv("REPORT_REFRESH_INTERVAL", "600"))
+# Reports recomputed at once by each backend worker
+REPORT_REFRESH_CONCURRENCY = int(os.getenv("REPORT_REFRESH_CONCURRENCY", "2"))
+# How long a worker may hold a report before another may take over its recompute
+REPORT_REFRESH_LEASE = float(os.getenv("REPORT_REFRESH_LEASE", "120"))
+# Reports whose result was read more recently than this are kept fresh
+REPORT_ACTIVE_SECONDS = float(os.getenv("REPORT_ACTIVE_SECONDS", str(24 * 3600)))
+# How stale viewed_at may get before a read updates it (one write per report a minute at most)
+REPORT_VIEW_RESOLUTION = 60
+REPORT_SWEEP_BATCH = 100
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes (stored in UTC)
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+class ReportMaterializer:
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[int] = set()
+        self._tasks = []
+        self._loop = None
+        # Sheets behind the results computed here: report id -> (source key, source version)
+        self._sources: Dict[int, tuple] = {}
+        self._reports_by_source: Dict[tuple, Set[int]] = {}
+        store.add_listener(self._on_snapshot)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(REPORT_REFRESH_CONCURRENCY)]
+        if REPORT_REFRESH_INTERVAL > 0:
+            self._tasks.append(asyncio.create_task(self._sweep()))
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._queue = None
+
+    def schedule(self, report_id: int):
+        """Queue a background recompute (once, however often it is asked for)."""
+        if self._queue is None or report_id in self._queued:
+            return
+        self._queued.add(report_id)
+        self._queue.put_nowait(report_id)
+
+    def forget(self, report_id: int):
+        source = self._sources.pop(report_id, None)
+        if source is not None:
+            self._reports_by_source.get(source[0], set()).discard(report_id)
+
+    def is_active(self, row: models.ReportResult) -> bool:
+        """Viewed recently enough to be kept fresh in the background."""
+        viewed_at = as_utc(row.viewed_at)
+        return viewed_at is not None and utcnow() - viewed_at < timedelta(seconds=REPORT_ACTIVE_SECONDS)
+
+    async def viewed(self, db, row: models.ReportResult):
+        """Record a read of the result (at most once per REPORT_VIEW_RESOLUTION)."""
+        now = utcnow()
+        viewed_at = as_utc(row.viewed_at)
+        if viewed_at is None or now - viewed_at > timedelta(seconds=REPORT_VIEW_RESOLUTION):
+            row.viewed_at = now
+            await db.commit()
+
+    def is_stale(self, report: models.Report, row: models.ReportResult) -> bool:
+        if row.report_version != report.version:
+            return True
+        source = self._sources.get(report.id)
+        if source is not None:
+            snapshot = store.latest(source[0])
+            if snapshot is not None and snapshot.version != row.source_version:
+                return True
+        computed_at = as_utc(row.computed_at)
+        return REPORT_REFRESH_INTERVAL > 0 and (
+            computed_at is None or utcnow() - computed_at > timedelta(seconds=REPORT_REFRESH_INTERVAL)
+        )
+
+    def _track(self, report_id: int, key: tuple, version: str):
+        self.forget(report_id)
+        self._sources[report_id] = (key, version)
+        self._reports_by_source.setdefault(key, set()).add(report_id)
+
+    def _on_snapshot(self, snapshot: Snapshot):
+        # Called from whichever thread recorded the snapshot
+        if self._loop is None:
+            return
+        for report_id in list(self._reports_by_source.get(snapshot.key, ())):
+            source = self._sources.get(report_id)
+            if source is not None and source[1] != snapshot.version:
+                self._loop.call_soon_threadsafe(self.schedule, report_id)
+
+    # --- Background work ---
+    async def _work(self):
+        while True:
+            report_id = await self._queue.get()
+            self._queued.discard(report_id)
+            try:
+                await self.refresh(report_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Report {report_id} refresh failed: {e}")
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(min(REPORT_REFRESH_INTERVAL, 60))
+            try:
+                for report_id in await self._due():
+                    self.schedule(report_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Report sweep failed: {e}")
+
+    async def _due(self) -> list:
+        """Recently viewed reports edited since, or not recomputed for REPORT_REFRESH_INTERVAL."""
+        now = utcnow()
+        threshold = now - timedelta(seconds=REPORT_REFRESH_INTERVAL)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.Report.id)
+                .join(models.ReportResult, models.ReportResult.report_id == models.Report.id)
+                .where(
+                    models.ReportResult.viewed_at >= now - timedelta(seconds=REPORT_ACTIVE_SECONDS),
+                    or_(
+                        models.ReportResult.attempted_at.is_(None),
+                        models.ReportResult.attempted_at < threshold,
+                        models.ReportResult.attempted_at < models.Report.updated_at,
+                    ),
+                )
+                .order_by(models.ReportResult.attempted_at.nulls_first())
+                .limit(REPORT_SWEEP_BATCH)
+            )
+            return list(result.scalars())
+
+    async def _claim(self, db, report_id: int, viewed: bool) -> bool:
+        """Take the report's lease; False if another worker holds it or, unless `viewed`,
+        the report hasn't been viewed lately (it is then computed when it next is)."""
+        now = utcnow()
+        conditions = [
+            models.ReportResult.report_id == report_id,
+            or_(models.ReportResult.refreshing_until.is_(None), models.ReportResult.refreshing_until < now),
+        ]
+        if not viewed:
+            conditions.append(models.ReportResult.viewed_at >= now - timedelta(seconds=REPORT_ACTIVE_SECONDS))
+        result = await db.execute(
+            update(models.ReportResult)
+            .where(*conditions)
+            .values(refreshing_until=now + timedelta(seconds=REPORT_REFRESH_LEASE))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            if not viewed or await db.get(models.ReportResult, report_id) is not None:
+                await db.rollback()
+                return False
+            db.add(models.ReportResult(report_id=report_id, refreshing_until=now + timedelta(seconds=REPORT_REFRESH_LEASE)))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return False
+        return True
+
+    async def refresh(self, report_id: int, viewed: bool = False) -> Optional[models.ReportResult]:
+        """Recompute a report's result and store it (or the error). Returns the stored row.
+        `viewed`: a request is waiting for it, so it is computed even if another worker is
+        recomputing it, and the view is recorded. Otherwise it is skipped (None) for a report
+        another worker is recomputing or nobody viewed lately; also None if the report is gone."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.Report)
+                .options(selectinload(models.Report.datasource), selectinload(models.Report.user))
+                .where(models.Report.id == report_id)
+            )
+            report = result.scalars().first()
+            if report is None or report.datasource is None:
+                return None
+            if not await self._claim(db, report_id, viewed) and not viewed:
+                return None
+            # Read the sheet as the report's owner would, under their plan's limits
+            limits = await user_limits(db, report.user)
+        key = datasource_source_key(report.datasource.url, report.datasource.config, **limits.sheet_limits)
+
+        content, source_version, error = None, None, None
+        try:
+            raw = await run_in_threadpool(cached_fetch_sheet, key, limits.max_fetch_seconds)
+            computed = await workers.run(
+                widgets.report_content, raw, has_headers=key[2], widget_config=report.widget_config,
+                filters=report.filters, column_mapping=report.column_mapping,
+            )
+            content = computed.payload
+            source_version = snapshot_version(computed.columns, computed.hashes)
+            # Tracked before recording, so this snapshot doesn't schedule the report again
+            self._track(report_id, key, source_version)
+            await run_in_threadpool(store.record_hashes, key, computed.columns, computed.hashes)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+
+        now = utcnow()
+        async with AsyncSessionLocal() as db:
+            row = await db.get(models.ReportResult, report_id)
+            if row is None:
+                row = models.ReportResult(report_id=report_id)
+                db.add(row)
+            if error is None:
+                row.report_version = report.version
+                row.source_version = source_version
+                row.result = content
+                row.computed_at = now
+            row.error = error
+            row.attempted_at = now
+            row.refreshing_until = None
+            if viewed:
+                row.viewed_at = now
+            try:
+                await db.commit()
+            except IntegrityError:
+                # The report was deleted meanwhile
+                await db.rollback()
+                return None
+        if error is not None:
+            print(f"⚠️  Report {report_id} could not be computed: {error}")
+        return row
+
+materializer = ReportMaterializer()
@@ -2,12 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import Annotated
+from typing import Annotated, Optional
 
 import models
 import schemas
 import auth_utils 
 import database
+from cache import TTLCache
 
 router = APIRouter(
     prefix="/auth",
@@ -15,6 +16,20 @@ router = APIRouter(
 )
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
+
+# Authenticated users by id, so most requests are authorized without a database query.
+# Users are only changed outside the API (seed.py, the database directly), and each
+# worker has its own cache, so nothing evicts entries: a deactivated account, a new
+# password or a changed email takes effect within PRINCIPAL_CACHE_TTL seconds.
+principal_cache = TTLCache(maxsize=10000, ttl=auth_utils.PRINCIPAL_CACHE_TTL)
+
+def password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins in progress, please try again shortly",
+        headers={"Retry-After": "1"},
+    )
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: AsyncSession = Depends(database.get_db)):
     credentials_exception = HTTPException(
@@ -30,13 +45,40 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: As
         token_data = schemas.TokenData(email=email)
     except auth_utils.JWTError:
         raise credentials_exception
-    
-    result = await db.execute(select(models.User).where(models.User.email == token_data.email))
-    user = result.scalars().first()
+    if payload.get("active") is False:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+
+    # Tokens issued before the uid claim existed are looked up by email every time
+    user_id = payload.get("uid")
+    user = principal_cache.get(user_id) if user_id is not None else None
     if user is None:
+        if user_id is not None:
+            result = await db.execute(select(models.User).where(models.User.id == user_id))
+        else:
+            result = await db.execute(select(models.User).where(models.User.email == token_data.email))
+        user = result.scalars().first()
+        if user is None:
+            raise credentials_exception
+        if user_id is not None:
+            # Detach so the cached instance isn't tied to this request's session
+            db.expunge(user)
+            principal_cache.set(user_id, user)
+
+    if user.email != token_data.email:
         raise credentials_exception
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
     return user
 
+async def get_optional_user(token: Annotated[Optional[str], Depends(oauth2_scheme_optional)], db: AsyncSession = Depends(database.get_db)):
+    """The signed-in user for endpoints that also serve anonymous callers; None without a valid token."""
+    if not token:
+        return None
+    try:
+        return await get_current_user(token, db)
+    except HTTPException:
+        return None
+
 @router.post("/register", response_model=schemas.UserResponse)
 async def register(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_db)):
     # Check if user exists
@@ -45,7 +87,10 @@ async def register(user: schemas.UserCreate, db: AsyncSession = Depends(database
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = auth_utils.get_password_hash(user.password)
+    try:
+        hashed_password = await auth_utils.get_password_hash_async(user.password)
+    except auth_utils.PasswordHasherBusy:
+        raise password_pool_busy()
     new_user = models.User(email=user.email, hashed_password=hashed_password)
     db.add(new_user)
     
@@ -62,7 +107,11 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
     result = await db.execute(select(models.User).where(models.User.email == form_data.username))
     user = result.scalars().first()
     
-    if not user or not auth_utils.verify_password(form_data.password, user.hashed_password):
+    try:
+        password_ok = user is not None and await auth_utils.verify_password_async(form_data.password, user.hashed_password)
+    except auth_utils.PasswordHasherBusy:
+        raise password_pool_busy()
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -71,7 +120,7 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
     
     access_token_expires = auth_utils.timedelta(minutes=auth_utils.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth_utils.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "uid": user.id, "active": user.is_active}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -1,30 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.responses import Response
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy.future import select
-from typing import Annotated, List
+from typing import Annotated, List, Optional
 
 import models
 import schemas
 import database
 from routers.auth import get_current_user
+from pagination import keyset_page, MAX_PAGE_SIZE
+from documents import json_array_length, patch_document
+import config_cache
 
 router = APIRouter(
     prefix="/dashboards",
     tags=["dashboards"]
 )
 
-@router.get("", response_model=List[schemas.DashboardResponse])
+# JSON columns editable through PATCH, and their document type
+PATCHABLE_FIELDS = {"widgets": list, "filters": list, "column_mapping": dict}
+
+@router.get("", response_model=List[schemas.DashboardSummary])
 async def list_dashboards(
+    response: Response,
     current_user: Annotated[models.User, Depends(get_current_user)],
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    include_count: bool = False,
     db: AsyncSession = Depends(database.get_db)
 ):
-    """List all dashboards for the current user"""
-    result = await db.execute(
-        select(models.Dashboard).where(models.Dashboard.user_id == current_user.id)
-    )
-    dashboards = result.scalars().all()
-    return dashboards
+    """List dashboard summaries for the current user, without the widget and filter configs"""
+    query = select(
+        models.Dashboard.id,
+        models.Dashboard.name,
+        models.Dashboard.datasource_id,
+        func.coalesce(json_array_length(models.Dashboard.widgets), 0).label("widget_count"),
+        func.coalesce(json_array_length(models.Dashboard.filters), 0).label("filter_count"),
+        models.Dashboard.created_at,
+        models.Dashboard.updated_at,
+    ).where(models.Dashboard.user_id == current_user.id)
+    return await keyset_page(db, query, models.Dashboard.id, response, limit, after_id, include_count)
 
 @router.post("", response_model=schemas.DashboardResponse, status_code=status.HTTP_201_CREATED)
 async def create_dashboard(
@@ -60,10 +77,15 @@ async def create_dashboard(
 @router.get("/{dashboard_id}", response_model=schemas.DashboardResponse)
 async def get_dashboard(
     dashboard_id: int,
+    request: Request,
     current_user: Annotated[models.User, Depends(get_current_user)],
     db: AsyncSession = Depends(database.get_db)
 ):
-    """Get a specific dashboard"""
+    """Get a specific dashboard, ETagged by its version (If-None-Match gets a 304)"""
+    cached = await config_cache.get(db, models.Dashboard, "dashboard", dashboard_id, current_user.id)
+    if cached is not None:
+        return config_cache.respond(request, cached)
+    
     result = await db.execute(
         select(models.Dashboard).where(
             models.Dashboard.id == dashboard_id,
@@ -73,7 +95,8 @@ async def get_dashboard(
     dashboard = result.scalars().first()
     if not dashboard:
         raise HTTPException(status_code=404, detail="Dashboard not found")
-    return dashboard
+    cached = config_cache.put("dashboard", schemas.DashboardResponse.model_validate(dashboard))
+    return config_cache.respond(request, cached)
 
 @router.put("/{dashboard_id}", response_model=schemas.DashboardResponse)
 async def update_dashboard(
@@ -105,14 +128,38 @@ async def update_dashboard(
         if not datasource:
             raise HTTPException(status_code=404, detail="Data source not found")
     
-    update_data = dashboard_update.model_dump(exclude_unset=True)
+    if dashboard_update.version is not None and dashboard_update.version != dashboard.version:
+        raise HTTPException(status_code=409, detail={"message": "Dashboard was modified; reload and retry", "version": dashboard.version})
+    
+    update_data = dashboard_update.model_dump(exclude_unset=True, exclude={"version"})
     for field, value in update_data.items():
         setattr(dashboard, field, value)
     
-    await db.commit()
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Dashboard was modified; reload and retry")
+    finally:
+        config_cache.invalidate("dashboard", dashboard_id)
     await db.refresh(dashboard)
     return dashboard
 
+@router.patch("/{dashboard_id}", response_model=schemas.DocumentVersion)
+async def patch_dashboard(
+    dashboard_id: int,
+    patch: schemas.DocumentPatch,
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    db: AsyncSession = Depends(database.get_db)
+):
+    """Add, replace, move or remove single entries of a dashboard's JSON fields"""
+    try:
+        return await patch_document(
+            db, models.Dashboard, dashboard_id, current_user.id, PATCHABLE_FIELDS, patch, not_found="Dashboard not found"
+        )
+    finally:
+        config_cache.invalidate("dashboard", dashboard_id)
+
 @router.delete("/{dashboard_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_dashboard(
     dashboard_id: int,
@@ -133,6 +180,7 @@ async def delete_dashboard(
         
         await db.delete(dashboard)
         await db.commit()
+        config_cache.invalidate("dashboard", dashboard_id)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,30 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import Response
+from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import Annotated, List
+from typing import Annotated, List, Optional
 
 import models
 import schemas
 import database
 from routers.auth import get_current_user
+from pagination import keyset_page, MAX_PAGE_SIZE
+from starlette.concurrency import run_in_threadpool
+
+import workers
+from governor import user_limits
+from sheets import datasource_source_key
+from snapshots import store
+import config_cache
 
 router = APIRouter(
     prefix="/datasources",
     tags=["datasources"]
 )
 
-@router.get("", response_model=List[schemas.DatasourceResponse])
+@router.get("", response_model=List[schemas.DatasourceSummary])
 async def list_datasources(
+    response: Response,
     current_user: Annotated[models.User, Depends(get_current_user)],
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    include_count: bool = False,
     db: AsyncSession = Depends(database.get_db)
 ):
-    """List all data sources for the current user"""
-    result = await db.execute(
-        select(models.Datasource).where(models.Datasource.user_id == current_user.id)
-    )
-    datasources = result.scalars().all()
-    return datasources
+    """List data source summaries for the current user, without their config"""
+    query = select(
+        models.Datasource.id,
+        models.Datasource.name,
+        models.Datasource.url,
+        models.Datasource.created_at,
+    ).where(models.Datasource.user_id == current_user.id)
+    return await keyset_page(db, query, models.Datasource.id, response, limit, after_id, include_count)
 
 @router.post("", response_model=schemas.DatasourceResponse, status_code=status.HTTP_201_CREATED)
 async def create_datasource(
@@ -97,39 +112,36 @@ async def delete_datasource(
     """Delete a data source and all associated dashboards and reports"""
     try:
         result = await db.execute(
-            select(models.Datasource).where(
+            select(models.Datasource.url, models.Datasource.config).where(
                 models.Datasource.id == datasource_id,
                 models.Datasource.user_id == current_user.id
             )
         )
-        datasource = result.scalars().first()
+        datasource = result.first()
         if not datasource:
             raise HTTPException(status_code=404, detail="Data source not found")
         
-        # Delete all dashboards that reference this datasource
-        dashboards_result = await db.execute(
-            select(models.Dashboard).where(
+        # Set-based deletes in one transaction: dependents first, then the datasource itself
+        dashboards = await db.execute(
+            delete(models.Dashboard).where(
                 models.Dashboard.datasource_id == datasource_id,
                 models.Dashboard.user_id == current_user.id
-            )
+            ).returning(models.Dashboard.id).execution_options(synchronize_session=False)
         )
-        dashboards = dashboards_result.scalars().all()
-        for dashboard in dashboards:
-            await db.delete(dashboard)
-        
-        # Delete all reports that reference this datasource
-        reports_result = await db.execute(
-            select(models.Report).where(
+        dashboard_ids = dashboards.scalars().all()
+        reports = await db.execute(
+            delete(models.Report).where(
                 models.Report.datasource_id == datasource_id,
                 models.Report.user_id == current_user.id
-            )
+            ).returning(models.Report.id).execution_options(synchronize_session=False)
+        )
+        report_ids = reports.scalars().all()
+        await db.execute(
+            delete(models.Datasource).where(
+                models.Datasource.id == datasource_id,
+                models.Datasource.user_id == current_user.id
+            ).execution_options(synchronize_session=False)
         )
-        reports = reports_result.scalars().all()
-        for report in reports:
-            await db.delete(report)
-        
-        # Delete the datasource itself
-        await db.delete(datasource)
         await db.commit()
     except HTTPException:
         raise
@@ -137,4 +149,13 @@ async def delete_datasource(
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete data source: {str(e)}")
     
+    # Drop what's cached for the sheet: snapshots as read under any plan's limits, fetched
+    # sheets and results as read under the owner's (what this datasource read). Other
+    # workers' in-process copies expire within SHARED_CACHE_TTL. Then the deleted configs.
+    store.evict(datasource_source_key(datasource.url, datasource.config)[:3])
+    limits = await user_limits(db, current_user)
+    await run_in_threadpool(workers.forget_sheet, datasource_source_key(datasource.url, datasource.config, **limits.sheet_limits))
+    config_cache.invalidate("dashboard", *dashboard_ids)
+    config_cache.invalidate("report", *report_ids)
+    
     return Response(status_code=status.HTTP_204_NO_CONTENT)
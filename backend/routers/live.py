@@ -0,0 +1,80 @@
+import json
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import Annotated, List
+
+import models
+import database
+from routers.auth import get_current_user
+from sheets import datasource_source_key
+from snapshots import store
+from live import hub, LIVE_HEARTBEAT_INTERVAL
+from governor import user_limits
+
+router = APIRouter(
+    prefix="/live",
+    tags=["live"]
+)
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/events")
+async def datasource_events(
+    request: Request,
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    datasource_id: List[int] = Query(...),
+    db: AsyncSession = Depends(database.get_db)
+):
+    """Server-Sent Events stream notifying when the data behind the given datasources changes"""
+    result = await db.execute(
+        select(models.Datasource).where(
+            models.Datasource.id.in_(datasource_id),
+            models.Datasource.user_id == current_user.id
+        )
+    )
+    datasources = result.scalars().all()
+    if not datasources:
+        raise HTTPException(status_code=404, detail="Data source not found")
+    # Watch the sheets as this user's plan reads them, so versions match their /data responses
+    limits = await user_limits(db, current_user)
+    # Don't keep a pooled connection checked out for the lifetime of the stream
+    await db.close()
+
+    sources = {}
+    for datasource in datasources:
+        key = datasource_source_key(datasource.url, datasource.config, **limits.sheet_limits)
+        sources.setdefault(key, []).append(datasource.id)
+
+    async def stream():
+        subscription = hub.subscribe(sources)
+        try:
+            versions = {}
+            for key, ids in sources.items():
+                snapshot = store.latest(key)
+                for ds_id in ids:
+                    versions[ds_id] = snapshot.version if snapshot else None
+            yield format_event("subscribed", {"versions": versions})
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), LIVE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event("snapshot", event)
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx from buffering the stream
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+from typing import Optional
+
+import timing
+
+router = APIRouter(
+    prefix="/profiles",
+    tags=["profiles"]
+)
+
+@router.get("/{profile_id}")
+def download_profile(profile_id: str, profile: Optional[str] = None, x_profile: Optional[str] = Header(None)):
+    """A saved request profile, as collapsed stacks."""
+    if not timing.profile_token_matches(profile, x_profile):
+        raise HTTPException(status_code=403, detail="Profiling is not enabled for this caller")
+    path = timing.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"profile-{profile_id}.txt")
@@ -1,30 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.responses import Response
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy.future import select
-from typing import Annotated, List
+from typing import Annotated, List, Optional
 
 import models
 import schemas
 import database
 from routers.auth import get_current_user
+from pagination import keyset_page, MAX_PAGE_SIZE
+from documents import json_array_length, patch_document
+import config_cache
+from report_jobs import materializer
 
 router = APIRouter(
     prefix="/reports",
     tags=["reports"]
 )
 
-@router.get("", response_model=List[schemas.ReportResponse])
+# JSON columns editable through PATCH, and their document type
+PATCHABLE_FIELDS = {"widget_config": dict, "filters": list, "column_mapping": dict}
+
+@router.get("", response_model=List[schemas.ReportSummary])
 async def list_reports(
+    response: Response,
     current_user: Annotated[models.User, Depends(get_current_user)],
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    include_count: bool = False,
     db: AsyncSession = Depends(database.get_db)
 ):
-    """List all reports for the current user"""
-    result = await db.execute(
-        select(models.Report).where(models.Report.user_id == current_user.id)
-    )
-    reports = result.scalars().all()
-    return reports
+    """List report summaries for the current user, without the widget and filter configs"""
+    query = select(
+        models.Report.id,
+        models.Report.name,
+        models.Report.datasource_id,
+        models.Datasource.name.label("datasource_name"),
+        models.Report.widget_config["type"].as_string().label("widget_type"),
+        func.coalesce(json_array_length(models.Report.filters), 0).label("filter_count"),
+        models.Report.created_at,
+        models.Report.updated_at,
+    ).outerjoin(
+        models.Datasource, models.Datasource.id == models.Report.datasource_id
+    ).where(models.Report.user_id == current_user.id)
+    return await keyset_page(db, query, models.Report.id, response, limit, after_id, include_count)
 
 @router.post("", response_model=schemas.ReportResponse, status_code=status.HTTP_201_CREATED)
 async def create_report(
@@ -60,10 +81,15 @@ async def create_report(
 @router.get("/{report_id}", response_model=schemas.ReportResponse)
 async def get_report(
     report_id: int,
+    request: Request,
     current_user: Annotated[models.User, Depends(get_current_user)],
     db: AsyncSession = Depends(database.get_db)
 ):
-    """Get a specific report"""
+    """Get a specific report, ETagged by its version (If-None-Match gets a 304)"""
+    cached = await config_cache.get(db, models.Report, "report", report_id, current_user.id)
+    if cached is not None:
+        return config_cache.respond(request, cached)
+    
     result = await db.execute(
         select(models.Report).where(
             models.Report.id == report_id,
@@ -73,7 +99,8 @@ async def get_report(
     report = result.scalars().first()
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
-    return report
+    cached = config_cache.put("report", schemas.ReportResponse.model_validate(report))
+    return config_cache.respond(request, cached)
 
 @router.put("/{report_id}", response_model=schemas.ReportResponse)
 async def update_report(
@@ -105,14 +132,80 @@ async def update_report(
         if not datasource:
             raise HTTPException(status_code=404, detail="Data source not found")
     
-    update_data = report_update.model_dump(exclude_unset=True)
+    if report_update.version is not None and report_update.version != report.version:
+        raise HTTPException(status_code=409, detail={"message": "Report was modified; reload and retry", "version": report.version})
+    
+    update_data = report_update.model_dump(exclude_unset=True, exclude={"version"})
     for field, value in update_data.items():
         setattr(report, field, value)
     
-    await db.commit()
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Report was modified; reload and retry")
+    finally:
+        config_cache.invalidate("report", report_id)
     await db.refresh(report)
+    materializer.schedule(report_id)
     return report
 
+@router.patch("/{report_id}", response_model=schemas.DocumentVersion)
+async def patch_report(
+    report_id: int,
+    patch: schemas.DocumentPatch,
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    db: AsyncSession = Depends(database.get_db)
+):
+    """Add, replace, move or remove single entries of a report's JSON fields"""
+    try:
+        version = await patch_document(
+            db, models.Report, report_id, current_user.id, PATCHABLE_FIELDS, patch, not_found="Report not found"
+        )
+    finally:
+        config_cache.invalidate("report", report_id)
+    materializer.schedule(report_id)
+    return version
+
+@router.get("/{report_id}/result", response_model=schemas.ReportResultResponse)
+async def get_report_result(
+    report_id: int,
+    response: Response,
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    db: AsyncSession = Depends(database.get_db)
+):
+    """A report's precomputed widget result (see report_jobs.py). A stale one is returned
+    as is, marked stale, while it is recomputed; one never computed, or not viewed
+    lately (so not kept fresh), is computed now."""
+    result = await db.execute(
+        select(models.Report).where(
+            models.Report.id == report_id,
+            models.Report.user_id == current_user.id
+        )
+    )
+    report = result.scalars().first()
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    row = await db.get(models.ReportResult, report_id)
+    response.headers["Cache-Control"] = "no-cache"
+
+    if row is None or row.computed_at is None or not materializer.is_active(row):
+        # Don't hold a connection while the sheet is read
+        await db.close()
+        row = await materializer.refresh(report_id, viewed=True)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Report not found")
+        if row.computed_at is None:
+            raise HTTPException(status_code=502, detail=f"Report could not be computed: {row.error}")
+    else:
+        await materializer.viewed(db, row)
+
+    content = schemas.ReportResultResponse.model_validate(row)
+    content.stale = materializer.is_stale(report, row)
+    if content.stale:
+        materializer.schedule(report_id)
+    return content
+
 @router.delete("/{report_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_report(
     report_id: int,
@@ -133,6 +226,8 @@ async def delete_report(
         
         await db.delete(report)
         await db.commit()
+        config_cache.invalidate("report", report_id)
+        materializer.forget(report_id)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Dict, Any, Literal, Union
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -58,6 +58,12 @@ class DatasourceResponse(DatasourceBase):
     class Config:
         from_attributes = True
 
+class DatasourceSummary(BaseModel):
+    id: int
+    name: Optional[str] = None
+    url: Optional[str] = None
+    created_at: datetime
+
 # Dashboard Schemas
 class DashboardBase(BaseModel):
     name: str
@@ -79,16 +85,43 @@ class DashboardUpdate(BaseModel):
     column_mapping: Optional[Dict[str, Any]] = None
     grid_columns: Optional[int] = None
     grid_rows: Optional[int] = None
+    version: Optional[int] = None # If set, the update fails with 409 unless it matches
 
 class DashboardResponse(DashboardBase):
     id: int
     user_id: int
+    version: int
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
 
+class DashboardSummary(BaseModel):
+    id: int
+    name: str
+    datasource_id: int
+    widget_count: int
+    filter_count: int
+    created_at: datetime
+    updated_at: datetime
+
+# Partial document updates (see documents.py)
+class PatchOp(BaseModel):
+    op: Literal["add", "replace", "remove", "move"]
+    path: List[Union[int, str]] # e.g. ["widgets", 2, "config", "layout"]
+    from_: Optional[List[Union[int, str]]] = Field(None, alias="from") # source path of a move
+    value: Any = None
+
+class DocumentPatch(BaseModel):
+    version: int # version the ops were made against
+    ops: List[PatchOp] = Field(min_length=1, max_length=100)
+
+class DocumentVersion(BaseModel):
+    id: int
+    version: int
+    updated_at: datetime
+
 # Report Schemas
 class ReportBase(BaseModel):
     name: str
@@ -106,12 +139,43 @@ class ReportUpdate(BaseModel):
     widget_config: Optional[Dict[str, Any]] = None
     filters: Optional[List[Dict[str, Any]]] = None
     column_mapping: Optional[Dict[str, Any]] = None
+    version: Optional[int] = None # If set, the update fails with 409 unless it matches
 
 class ReportResponse(ReportBase):
     id: int
     user_id: int
+    version: int
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
+
+class ReportResultResponse(BaseModel):
+    report_id: int
+    report_version: Optional[int] = None
+    source_version: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    computed_at: Optional[datetime] = None
+    # The report or its sheet changed since; a recompute is queued
+    stale: bool = False
+
+    class Config:
+        from_attributes = True
+
+class ReportSummary(BaseModel):
+    id: int
+    name: str
+    datasource_id: int
+    datasource_name: Optional[str] = None
+    widget_type: Optional[str] = None
+    filter_count: int
+    created_at: datetime
+    updated_at: datetime
+
+# Sheet Schemas
+class SheetRequest(BaseModel):
+    sheet_url: str
+    gid: Optional[str] = None
+    has_headers: Optional[bool] = True
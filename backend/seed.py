@@ -0,0 +1,48 @@
+"""
+Initial data: the plans and the admin user.
+
+Seeding is idempotent (it only adds what's missing), so it can run on every deploy.
+Run it with `python seed.py` after `python migrations.py` (the prod compose file's
+migrate service does both); the backend also seeds at startup unless AUTO_MIGRATE=0.
+"""
+import asyncio
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models import Plan, User
+import auth_utils
+
+PLANS = [
+    {"name": "Free", "price": "$0", "limits": {"max_rows": 1000}},
+    {"name": "Pro", "price": "$9.50", "limits": {"max_rows": 10000}},
+    {"name": "Enterprise", "price": "$24.95", "limits": {"max_rows": 100000}},
+]
+ADMIN_EMAIL = "admin@tablesalive.com"
+
+async def seed_plans(session) -> int:
+    result = await session.execute(select(Plan.name))
+    existing = set(result.scalars())
+    missing = [Plan(**plan) for plan in PLANS if plan["name"] not in existing]
+    session.add_all(missing)
+    return len(missing)
+
+async def seed_admin(session) -> int:
+    result = await session.execute(select(User.id).where(User.email == ADMIN_EMAIL))
+    if result.first():
+        return 0
+    # Only hashed (slow on purpose) when the user is actually created
+    hashed_password = await auth_utils.get_password_hash_async("admin1324")
+    session.add(User(email=ADMIN_EMAIL, hashed_password=hashed_password, is_active=True))
+    return 1
+
+async def seed() -> int:
+    """Add missing seed rows; returns how many were added."""
+    async with AsyncSessionLocal() as session:
+        added = await seed_plans(session) + await seed_admin(session)
+        if added:
+            await session.commit()
+    return added
+
+if __name__ == "__main__":
+    added = asyncio.run(seed())
+    print(f"\n✅ Seed data is in place ({added} row(s) added)")
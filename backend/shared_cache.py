@@ -0,0 +1,409 @@
+"""
+Two-tier cache shared by all backend workers: an in-process LRU (cache.TTLCache) in
+front of a shared store, so N uvicorn workers or containers fetch each sheet from
+Google once per SHARED_CACHE_TTL instead of N times.
+
+Two caches use it:
+- sheets: fetched sheets (RawSheet) by source key.
+- results: processed responses (workers.SheetResult) by sheet content and task, so a
+  worker that gets a sheet another worker already processed skips parsing it too.
+
+Stampede protection: concurrent misses for one key in a process wait for a single
+computation, and across processes the first to take the store's lock computes while
+the others poll the store. A poller takes the lock over as soon as it is released
+without a result (its holder failed), and computes itself after the lock's lifetime.
+
+Entries are deleted from this process and the shared tier (`delete`); other workers'
+in-process copies live out their TTL.
+
+The shared tier is chosen by SHARED_CACHE:
+- "disk" (default): files under SHARED_CACHE_DIR; share the directory (a volume)
+  between containers on one host.
+- "memory": a per-process stand-in for a network store, for development.
+- "none": in-process tier only.
+- "package.module:Class": any SharedStore implementation (e.g. over Redis or
+  memcached: get / set with expiry / delete / add-if-absent for the lock).
+An entry read from the shared tier may be kept in process for up to another TTL.
+
+The in-process tier is bounded by bytes (SHARED_CACHE_MEMORY_MB per cache) as well as
+entries, and evicts by size, cost and recency (cache.SizedCache). Evicted entries are
+spilled to SHARED_CACHE_SPILL_DIR for the rest of their TTL, unless the shared tier is
+already on local disk.
+"""
+import os
+import json
+import time
+import struct
+import hashlib
+import tempfile
+import importlib
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+import metrics
+from cache import SizedCache
+
+SHARED_CACHE = os.getenv("SHARED_CACHE", "disk")
+SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tables-alive-cache"))
+SHARED_CACHE_TTL = float(os.getenv("SHARED_CACHE_TTL", "10"))
+SHARED_CACHE_MEMORY_ITEMS = int(os.getenv("SHARED_CACHE_MEMORY_ITEMS", "64"))
+SHARED_CACHE_MEMORY_MB = float(os.getenv("SHARED_CACHE_MEMORY_MB", "256"))
+SHARED_CACHE_SPILL_DIR = os.getenv("SHARED_CACHE_SPILL_DIR", os.path.join(tempfile.gettempdir(), "tables-alive-spill"))
+# How long a computation may hold a key's lock (others wait up to this long)
+SHARED_CACHE_LOCK_SECONDS = float(os.getenv("SHARED_CACHE_LOCK_SECONDS", "60"))
+
+lookups = metrics.registry.counter(
+    "shared_cache_lookups_total", "Shared-tier lookups after an in-process miss", ("cache", "result"))
+stampede_waits = metrics.registry.counter(
+    "cache_stampede_waits_total", "Misses that waited for another worker's computation instead of repeating it",
+    ("cache", "scope"))
+spill_reads = metrics.registry.counter(
+    "cache_spill_reads_total", "In-process misses found in the spill directory", ("cache",))
+
+# --- Shared stores ---
+class SharedStore(ABC):
+    """What the shared tier needs from a store; values are bytes, keys short strings."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """The value stored under `key`, or None if missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        """Store `value` under `key` for `ttl` seconds."""
+
+    @abstractmethod
+    def lock(self, key: str, ttl: float) -> bool:
+        """Take `key`'s lock if nobody holds it; it expires after `ttl` seconds regardless."""
+
+    @abstractmethod
+    def unlock(self, key: str):
+        """Release a lock taken by lock."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Drop the value stored under `key`, if any."""
+
+class MemoryStore(SharedStore):
+    def __init__(self):
+        self._values: Dict[str, tuple] = {}
+        self._locks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or entry[0] <= time.time():
+                self._values.pop(key, None)
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._values[key] = (now + ttl, value)
+            for stale in [k for k, (expires_at, _) in self._values.items() if expires_at <= now]:
+                del self._values[stale]
+
+    def lock(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            if self._locks.get(key, 0) > now:
+                return False
+            self._locks[key] = now + ttl
+            return True
+
+    def unlock(self, key: str):
+        with self._lock:
+            self._locks.pop(key, None)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+
+class DiskStore(SharedStore):
+    """Files named by key hash, each starting with its expiry time; written atomically."""
+    _expiry = struct.Struct("<d")
+
+    def __init__(self, directory: str = SHARED_CACHE_DIR, sweep_interval: float = 60):
+        self.directory = directory
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, suffix: str = ".bin") -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + suffix)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < self._expiry.size or self._expiry.unpack_from(data)[0] <= time.time():
+            return None
+        return data[self._expiry.size:]
+
+    def usage(self) -> int:
+        """Bytes of entries on disk (expired ones until the next sweep)."""
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin"):
+                try:
+                    total += entry.stat().st_size
+                except OSError:
+                    pass
+        return total
+
+    def set(self, key: str, value: bytes, ttl: float):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._expiry.pack(time.time() + ttl))
+                f.write(value)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._sweep()
+
+    def lock(self, key: str, ttl: float) -> bool:
+        path = self._path(key, ".lock")
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return True
+            except FileExistsError:
+                try:
+                    if os.path.getmtime(path) + ttl > time.time():
+                        return False
+                    # The holder died without unlocking
+                    os.remove(path)
+                except OSError:
+                    pass
+        return False
+
+    def unlock(self, key: str):
+        try:
+            os.remove(self._path(key, ".lock"))
+        except OSError:
+            pass
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _sweep(self):
+        now = time.time()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.endswith(".bin"):
+                    with open(entry.path, "rb") as f:
+                        expired = self._expiry.unpack(f.read(self._expiry.size))[0] <= now
+                else:
+                    # Orphaned temp files and locks
+                    expired = entry.stat().st_mtime + SHARED_CACHE_LOCK_SECONDS < now
+                if expired:
+                    os.remove(entry.path)
+            except (OSError, struct.error):
+                pass
+
+def make_store(kind: str = SHARED_CACHE) -> Optional[SharedStore]:
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return MemoryStore()
+    if kind == "disk":
+        return DiskStore()
+    module, _, name = kind.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+store = make_store()
+
+# --- Two tiers ---
+class TieredCache:
+    def __init__(self, name: str, encode: Callable[[object], bytes], decode: Callable[[bytes], object],
+                 shared: Optional[SharedStore] = store, ttl: float = SHARED_CACHE_TTL,
+                 memory_items: int = SHARED_CACHE_MEMORY_ITEMS, memory_mb: float = SHARED_CACHE_MEMORY_MB):
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+        self.shared = shared
+        self.ttl = ttl
+        # Entries evicted from memory are still in a disk shared tier; otherwise spill them
+        self.spilled = None if isinstance(shared, DiskStore) else DiskStore(os.path.join(SHARED_CACHE_SPILL_DIR, name))
+        self.memory = SizedCache(maxsize=memory_items, ttl=ttl, max_bytes=int(memory_mb * 1024 * 1024),
+                                 spill=self._spill if self.spilled is not None else None)
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, key) -> str:
+        return f"{self.name}:{hashlib.sha256(repr(key).encode()).hexdigest()}"
+
+    def _get_shared(self, key: str, count: bool = True):
+        if self.shared is None:
+            return None
+        try:
+            data = self.shared.get(key)
+        except Exception as e:
+            print(f"⚠️  Shared cache read failed: {e}")
+            return None
+        if count:
+            lookups.inc(cache=self.name, result="miss" if data is None else "hit")
+        return None if data is None else self.decode(data)
+
+    def _spill(self, key: str, value, seconds_left: float):
+        try:
+            self.spilled.set(key, self.encode(value), seconds_left)
+        except Exception as e:
+            print(f"⚠️  Cache spill failed: {e}")
+
+    def _get_spilled(self, key: str):
+        if self.spilled is None:
+            return None
+        data = self.spilled.get(key)
+        if data is None:
+            return None
+        spill_reads.inc(cache=self.name)
+        return self.decode(data)
+
+    @property
+    def resident_bytes(self) -> int:
+        return self.memory.bytes
+
+    @property
+    def spilled_bytes(self) -> int:
+        return self.spilled.usage() if self.spilled is not None else 0
+
+    @property
+    def evictions(self) -> int:
+        return self.memory.evictions
+
+    def _set_shared(self, key: str, value):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(key, self.encode(value), self.ttl)
+        except Exception as e:
+            print(f"⚠️  Shared cache write failed: {e}")
+
+    def get(self, key):
+        key = self._key(key)
+        value = self.memory.get(key)
+        if value is None:
+            start = time.perf_counter()
+            value = self._get_spilled(key)
+            if value is None:
+                value = self._get_shared(key)
+            if value is not None:
+                self.memory.set(key, value, cost=time.perf_counter() - start)
+        return value
+
+    def set(self, key, value, cost: float = 0.0):
+        """Cache `value`, which took `cost` seconds to produce (see cache.SizedCache)."""
+        key = self._key(key)
+        self.memory.set(key, value, cost)
+        self._set_shared(key, value)
+
+    def delete(self, key):
+        """Drop `key` from this process, the spill directory and the shared tier."""
+        key = self._key(key)
+        self.memory.pop(key)
+        for tier in (self.spilled, self.shared):
+            if tier is None:
+                continue
+            try:
+                tier.delete(key)
+            except Exception as e:
+                print(f"⚠️  Shared cache delete failed: {e}")
+
+    def get_or_compute(self, key, compute: Callable[[], object]):
+        """The cached value, or compute() it once for every process asking at the same time.
+        Blocking; call it from a thread."""
+        key = self._key(key)
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            stampede_waits.inc(cache=self.name, scope="process")
+            return future.result(timeout=SHARED_CACHE_LOCK_SECONDS)
+
+        try:
+            start = time.perf_counter()
+            value = self._get_spilled(key)
+            if value is None:
+                value = self._get_shared(key)
+            if value is None:
+                value = self._compute_shared(key, compute)
+            self.memory.set(key, value, cost=time.perf_counter() - start)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _compute_shared(self, key: str, compute: Callable[[], object]):
+        if self.shared is None:
+            return compute()
+        deadline = None
+        while True:
+            try:
+                if self.shared.lock(key, SHARED_CACHE_LOCK_SECONDS):
+                    break
+            except Exception as e:
+                print(f"⚠️  Shared cache lock failed: {e}")
+                return compute()
+            # Another worker is computing it; wait for its result, or for its lock to be
+            # released without one (it failed) and compute it here
+            if deadline is None:
+                stampede_waits.inc(cache=self.name, scope="shared")
+                deadline = time.monotonic() + SHARED_CACHE_LOCK_SECONDS
+            elif time.monotonic() >= deadline:
+                return compute()
+            time.sleep(0.05)
+            value = self._get_shared(key, count=False)
+            if value is not None:
+                return value
+        try:
+            # Stored by the previous holder between our last poll and taking the lock
+            value = self._get_shared(key, count=False) if deadline is not None else None
+            if value is None:
+                value = compute()
+                self._set_shared(key, value)
+            return value
+        finally:
+            self.shared.unlock(key)
+
+# --- Framing for values made of a JSON header and binary parts ---
+def pack(meta: dict, *parts: bytes) -> bytes:
+    header = json.dumps({**meta, "_parts": [len(part) for part in parts]}).encode()
+    return struct.pack("<I", len(header)) + header + b"".join(parts)
+
+def unpack(data: bytes) -> tuple:
+    (length,) = struct.unpack_from("<I", data)
+    meta = json.loads(data[4:4 + length])
+    parts, offset = [], 4 + length
+    for size in meta.pop("_parts"):
+        parts.append(data[offset:offset + size])
+        offset += size
+    return meta, parts
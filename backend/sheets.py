@@ -0,0 +1,286 @@
+import io
+import os
+import json
+import time
+import hashlib
+import urllib.request
+from typing import TYPE_CHECKING
+
+import metrics
+import timing
+import shared_cache
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas, gspread and google-auth are imported where used: they take most of the
+# backend's import time, and a worker should start serving (and a worker process
+# start) before the first sheet needs them.
+
+# --- Configuration ---
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+SERVICE_ACCOUNT_FILE = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE', 'service_account.json')
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+def csv_hash(df):
+    import pandas as pd
+    return hashlib.md5(
+        pd.util.hash_pandas_object(df, index=True).values
+    ).hexdigest()
+
+class RawSheet:
+    """A fetched sheet before parsing: the CSV export's bytes, or the API's cell values."""
+
+    def __init__(self, source: str, has_headers: bool, max_lines: int = None, limit_hit: str = None,
+                 csv: bytes = None, values: list = None, digest: str = None):
+        self.source = source  # "csv" or "gspread"
+        self.has_headers = has_headers
+        self.max_lines = max_lines
+        self.limit_hit = limit_hit
+        self.csv = csv
+        self.values = values
+        self._digest = digest
+
+    @property
+    def digest(self) -> str:
+        """Content hash of what parse_sheet would read."""
+        if self._digest is None:
+            data = self.csv if self.csv is not None else json.dumps(self.values).encode()
+            self._digest = hashlib.md5(data).hexdigest()
+        return self._digest
+
+def dump_raw(raw: RawSheet) -> bytes:
+    data = raw.csv if raw.csv is not None else json.dumps(raw.values).encode()
+    return shared_cache.pack({
+        "source": raw.source, "has_headers": raw.has_headers, "max_lines": raw.max_lines,
+        "limit_hit": raw.limit_hit, "digest": raw.digest, "csv": raw.csv is not None,
+    }, data)
+
+def load_raw(data: bytes) -> RawSheet:
+    meta, (data,) = shared_cache.unpack(data)
+    is_csv = meta.pop("csv")
+    return RawSheet(**meta, csv=data if is_csv else None, values=None if is_csv else json.loads(data))
+
+# Fetched sheets, shared between backend workers (see shared_cache.py)
+sheet_cache = shared_cache.TieredCache("sheets", dump_raw, load_raw)
+
+def download_csv(csv_url: str, max_lines: int = None, max_bytes: int = None, timeout: float = 30):
+    """Download a CSV, stopping after `max_lines` lines or `max_bytes` bytes.
+    Returns (the bytes, name of the limit that cut the download short or None).
+    A cut download keeps only complete lines, and a limit counts as hit only when
+    more data followed."""
+    buffer = bytearray()
+    lines = 0
+    # End of the `max_lines`-th line, once it has been downloaded
+    cut = None
+    limit_hit = None
+    with timing.stage("fetch"), urllib.request.urlopen(csv_url, timeout=timeout) as response:
+        while True:
+            chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunk_start = len(buffer)
+            buffer += chunk
+            metrics.bytes_downloaded.inc(len(chunk))
+            if max_lines is not None and cut is None:
+                newlines = chunk.count(b"\n")
+                if lines + newlines >= max_lines:
+                    cut = chunk_start
+                    for _ in range(max_lines - lines):
+                        cut = buffer.index(b"\n", cut) + 1
+                lines += newlines
+            if cut is not None and len(buffer) > cut:
+                del buffer[cut:]
+                limit_hit = "max_rows"
+            if max_bytes is not None and len(buffer) > max_bytes:
+                # Keep only complete lines within the budget
+                del buffer[buffer.rfind(b"\n", 0, max_bytes) + 1:]
+                limit_hit = "max_bytes"
+            if limit_hit:
+                break
+    return bytes(buffer), limit_hit
+
+def fetch_sheet(sheet_url: str, gid: str = None, has_headers: bool = True,
+                max_rows: int = None, max_bytes: int = None, timeout: float = 30) -> RawSheet:
+    """Download a sheet of at most `max_rows` data rows (and, for public sheets,
+    `max_bytes` of CSV), giving up after `timeout` seconds. Only I/O; parse_sheet
+    turns the result into a DataFrame."""
+    limit_hit = None
+    # Lines to read: the data rows plus the header row
+    max_lines = None if max_rows is None else max_rows + (1 if has_headers else 0)
+    fetch_started = time.perf_counter()
+    
+    # 1. Fetch Raw Data (List of Lists)
+    if os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE') and os.path.exists(SERVICE_ACCOUNT_FILE):
+        from gspread.utils import fill_gaps
+        workbook = cached_fetch_workbook(sheet_url, max_rows, gid, timeout)
+        tab = workbook["tabs"].get(str(gid) if gid is not None else workbook["first"])
+        if tab is None:
+            raise Exception(f"Worksheet with gid {gid} not found")
+        raw_values, row_count = tab
+        if max_lines is not None:
+            # The workbook was read with a line to spare (see cached_fetch_workbook)
+            if len(raw_values) > max_lines or (len(raw_values) == max_lines and row_count > max_lines):
+                limit_hit = "max_rows"
+            raw_values = raw_values[:max_lines]
+        # Rectangular, like Worksheet.get_values
+        try:
+            raw_values = fill_gaps(raw_values)
+        except KeyError:
+            raw_values = [[]]
+        raw = RawSheet("gspread", has_headers, max_lines, limit_hit, values=raw_values)
+    else:
+        # Public sheet logic
+        base_url = sheet_url.split('/edit')[0]
+        csv_url = f"{base_url}/export?format=csv"
+        if gid:
+            csv_url += f"&gid={gid}"
+        
+        start = time.time()
+        last_hash = None
+        iterations = 0
+        
+        # Re-download until two downloads in a row are identical (the export can lag edits).
+        # Comparing the bytes, not parsed frames, keeps parsing out of the loop.
+        while True:
+            iterations += 1
+            remaining = max(timeout - (time.time() - start), 1)
+            data, limit_hit = download_csv(csv_url, max_lines, max_bytes, remaining)
+            with timing.stage("hash"):
+                current_hash = hashlib.md5(data).hexdigest()
+            
+            if last_hash is not None and current_hash == last_hash:
+                break
+                
+            last_hash = current_hash
+            if time.time() - start > timeout:
+                if data.strip():
+                    break
+                raise TimeoutError("Sheet data did not stabilize")
+            with timing.stage("wait"):
+                time.sleep(1)
+        metrics.stabilization_iterations.observe(iterations)
+        raw = RawSheet("csv", has_headers, max_lines, limit_hit, csv=data, digest=current_hash)
+    metrics.fetch_seconds.observe(time.perf_counter() - fetch_started, source=raw.source)
+    if limit_hit:
+        metrics.limit_hits.inc(limit=limit_hit)
+    return raw
+
+# --- Workbooks (sheets read through the API) ---
+# Every tab of a spreadsheet is read in one batched values call and cached under the
+# spreadsheet's id, so a dashboard over N tabs costs one round trip to Google, not N.
+# Spreadsheets with more tabs than this are read one tab at a time instead.
+WORKBOOK_MAX_TABS = int(os.getenv("WORKBOOK_MAX_TABS", "20"))
+
+def open_spreadsheet(sheet_url: str, timeout: float = 30):
+    """The spreadsheet, through a client whose API calls give up after `timeout` seconds."""
+    import gspread
+    from google.oauth2.service_account import Credentials
+    creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    gc = gspread.authorize(creds)
+    gc.set_timeout(timeout)
+    try:
+        with timing.stage("open"):
+            return gc.open_by_url(sheet_url)
+    except Exception as e:
+        raise Exception(f"Could not open sheet: {str(e)}")
+
+def fetch_workbook(sheet_url: str, max_lines: int = None, gid: str = None, timeout: float = 30) -> dict:
+    """The first `max_lines` rows of every tab of a spreadsheet, in one values call:
+    {"first": gid of the first tab, "partial": bool, "tabs": {gid: [rows, row count]}}.
+    Past WORKBOOK_MAX_TABS tabs only tab `gid` (default the first) is read, and partial is set."""
+    from gspread.utils import absolute_range_name
+    sh = open_spreadsheet(sheet_url, timeout)
+    worksheets = sh.worksheets()
+    first = str(worksheets[0].id)
+    partial = len(worksheets) > WORKBOOK_MAX_TABS
+    if partial:
+        wanted = str(gid) if gid is not None else first
+        worksheets = [ws for ws in worksheets if str(ws.id) == wanted]
+    rows = None if max_lines is None else f"1:{max_lines}"
+    ranges = [absolute_range_name(ws.title, rows) for ws in worksheets]
+    with timing.stage("fetch"):
+        response = sh.values_batch_get(ranges) if ranges else {"valueRanges": []}
+    tabs = {
+        str(ws.id): [value_range.get("values", [[]]), ws.row_count]
+        for ws, value_range in zip(worksheets, response["valueRanges"])
+    }
+    return {"first": first, "partial": partial, "tabs": tabs}
+
+workbook_cache = shared_cache.TieredCache("workbooks", lambda workbook: json.dumps(workbook).encode(), json.loads)
+
+def cached_fetch_workbook(sheet_url: str, max_rows: int = None, gid: str = None, timeout: float = 30) -> dict:
+    """fetch_workbook, once for all tabs and workers every SHARED_CACHE_TTL seconds.
+    Tabs are read with `max_rows` + 1 lines, enough for `max_rows` data rows with or
+    without a header row, so tabs read either way share one call."""
+    from gspread.utils import extract_id_from_url
+    max_lines = None if max_rows is None else max_rows + 1
+    key = (extract_id_from_url(sheet_url), max_rows)
+    workbook = workbook_cache.get_or_compute(key, lambda: fetch_workbook(sheet_url, max_lines, gid, timeout))
+    wanted = str(gid) if gid is not None else workbook["first"]
+    if wanted not in workbook["tabs"] and workbook["partial"]:
+        # Too many tabs to read together, and the cached one is another tab
+        workbook = fetch_workbook(sheet_url, max_lines, gid, timeout)
+    return workbook
+
+def forget_workbook(sheet_url: str, max_rows: int = None):
+    """Drop a spreadsheet's cached workbook (see cached_fetch_workbook)."""
+    from gspread.exceptions import NoValidUrlKeyFound
+    from gspread.utils import extract_id_from_url
+    try:
+        workbook_cache.delete((extract_id_from_url(sheet_url), max_rows))
+    except NoValidUrlKeyFound:
+        pass
+
+def cached_fetch_sheet(key: tuple, timeout: float = 30) -> RawSheet:
+    """fetch_sheet(*key) (key from source_key), fetched once for all workers every SHARED_CACHE_TTL seconds."""
+    return sheet_cache.get_or_compute(key, lambda: fetch_sheet(*key, timeout=timeout))
+
+def parse_sheet(raw: RawSheet) -> "pd.DataFrame":
+    """DataFrame of a fetched sheet. CPU only, so it can run in a worker process
+    (see workers.py). The limit that cut the read short, if any, is in df.attrs["limit_hit"]."""
+    import pandas as pd
+    raw_values = raw.values or []
+    if raw.csv is not None and raw.csv.strip():
+        # header=None ensures we read the file exactly as it is (no rows skipped)
+        with timing.stage("parse"):
+            df_raw = pd.read_csv(io.BytesIO(raw.csv), header=None, on_bad_lines='skip', nrows=raw.max_lines)
+            raw_values = df_raw.values.tolist()
+
+    # 2. Process Header Logic (Lossless)
+    if not raw_values:
+        return pd.DataFrame()
+
+    with timing.stage("headers"):
+        if raw.has_headers:
+            # First row is headers
+            columns = [str(x) for x in raw_values[0]]
+            data_rows = raw_values[1:]
+            df = pd.DataFrame(data_rows, columns=columns)
+        else:
+            # No headers: keep all rows (including row 0), use numeric columns
+            df = pd.DataFrame(raw_values)
+    df.attrs["limit_hit"] = raw.limit_hit
+    return df
+
+def get_gsheet_df(sheet_url: str, gid: str = None, has_headers: bool = True,
+                  max_rows: int = None, max_bytes: int = None, timeout: float = 30) -> "pd.DataFrame":
+    """Read a sheet into a DataFrame (fetch_sheet, then parse_sheet in this thread).
+    The endpoints, the live poller and report recomputes don't use it: they read through
+    cached_fetch_sheet and parse in the worker pool (workers.run). It stays supported for
+    callers that want a frame in-process, such as the benchmarks' "sheet" scenario."""
+    raw = fetch_sheet(sheet_url, gid, has_headers, max_rows, max_bytes, timeout)
+    df = parse_sheet(raw)
+    metrics.rows_parsed.inc(len(df), source=raw.source)
+    return df
+
+def source_key(sheet_url: str, gid: str = None, has_headers: bool = True,
+               max_rows: int = None, max_bytes: int = None) -> tuple:
+    """Identity of a fetched sheet, and the arguments to fetch_sheet that read it.
+    The same tab read with and without headers, or with other limits, differs."""
+    return (sheet_url, str(gid) if gid is not None else None, bool(has_headers), max_rows, max_bytes)
+
+def datasource_source_key(url: str, config: dict, **limits) -> tuple:
+    """Source key of a saved datasource, with the dashboard's defaults (gid 0, headers on)."""
+    config = config or {}
+    return source_key(url, config.get("gid") or "0", config.get("has_headers", True) is not False, **limits)
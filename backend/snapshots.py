@@ -0,0 +1,231 @@
+import os
+import time
+import uuid
+import atexit
+import shutil
+import difflib
+import hashlib
+import tempfile
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+# numpy and pandas are imported where used, to keep backend startup fast (see sheets.py)
+
+# How many past versions of each sheet are kept (as row hashes) to diff against
+SNAPSHOT_HISTORY = int(os.getenv("SNAPSHOT_HISTORY", "8"))
+# Changed regions up to this many rows are diffed row by row; larger ones are sent whole
+DELTA_MATCH_LIMIT = 5000
+# Row hashes held in memory across all snapshots; beyond this the least recently used
+# are spilled to .npy files in SNAPSHOT_SPILL_DIR and read back when diffed against
+SNAPSHOT_MEMORY_MB = float(os.getenv("SNAPSHOT_MEMORY_MB", "128"))
+SNAPSHOT_SPILL_DIR = os.getenv("SNAPSHOT_SPILL_DIR", os.path.join(tempfile.gettempdir(), "tables-alive-snapshots"))
+
+class Snapshot:
+    """The latest known state of a sheet. The version is a content hash, so it is
+    stable across processes and doesn't change when the sheet is re-read unchanged."""
+
+    def __init__(self, key: tuple, version: str, columns: List[str], row_hashes, fetched_at: float):
+        self.key = key
+        self.version = version
+        self.columns = columns
+        self.fetched_at = fetched_at
+        self.used_at = time.monotonic()
+        self.nbytes = row_hashes.nbytes
+        self._row_hashes = row_hashes
+        self._spill_path: Optional[str] = None
+        # Set by the store when it picks the snapshot to spill
+        self.spilled = False
+
+    @property
+    def row_hashes(self):
+        hashes = self._row_hashes
+        if hashes is None:
+            # Spilled; read back without holding on to it
+            import numpy as np
+            hashes = np.load(self._spill_path)
+        return hashes
+
+    def spill(self, directory: str):
+        import numpy as np
+        path = os.path.join(directory, f"{uuid.uuid4().hex}.npy")
+        np.save(path, self._row_hashes)
+        self._spill_path = path
+        self._row_hashes = None
+
+    def drop(self):
+        """Delete the spilled copy, if any, once the snapshot is forgotten."""
+        if self._spill_path is not None:
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+
+def row_hashes(df):
+    import pandas as pd
+    return pd.util.hash_pandas_object(df, index=False).values
+
+def snapshot_version(columns: List[str], hashes) -> str:
+    digest = hashlib.md5(repr(columns).encode())
+    digest.update(hashes.tobytes())
+    return digest.hexdigest()
+
+def diff_rows(old_hashes, new_hashes) -> List[tuple]:
+    """Opcodes (start, end, new_start, new_end) turning the old rows into the new ones:
+    old rows [start:end] are replaced by new rows [new_start:new_end]."""
+    import numpy as np
+    old_len, new_len = len(old_hashes), len(new_hashes)
+
+    # Most edits touch one region, so strip the unchanged head and tail first
+    limit = min(old_len, new_len)
+    same = old_hashes[:limit] == new_hashes[:limit]
+    prefix = limit if same.all() else int(np.argmin(same))
+    tail = limit - prefix
+    same = old_hashes[old_len - tail:][::-1] == new_hashes[new_len - tail:][::-1]
+    suffix = tail if same.all() else int(np.argmin(same))
+
+    old_end, new_end = old_len - suffix, new_len - suffix
+    if prefix == old_end and prefix == new_end:
+        return []
+    if max(old_end - prefix, new_end - prefix) > DELTA_MATCH_LIMIT:
+        return [(prefix, old_end, prefix, new_end)]
+
+    matcher = difflib.SequenceMatcher(
+        None, list(old_hashes[prefix:old_end]), list(new_hashes[prefix:new_end]), autojunk=False
+    )
+    return [
+        (prefix + i1, prefix + i2, prefix + j1, prefix + j2)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+def delta_ops(old_columns: List[str], old_hashes, columns: List[str], hashes) -> Optional[List[tuple]]:
+    """Row opcodes from one version of a sheet to another, or None if they can't be
+    computed (different columns) or wouldn't be smaller than a full copy."""
+    if old_columns != columns:
+        return None
+    ops = diff_rows(old_hashes, hashes)
+    changed = sum(new_end - new_start for _, _, new_start, new_end in ops)
+    if changed * 2 > len(hashes):
+        return None
+    return ops
+
+class SnapshotStore:
+    """Recent versions of each sheet, as row hashes, within a memory budget. Over the
+    budget the least recently used snapshots are spilled to disk (a snapshot costs the same
+    to read back per byte as any other, so unlike cache.SizedCache recency alone decides)."""
+
+    def __init__(self, history: int = SNAPSHOT_HISTORY, max_bytes: int = int(SNAPSHOT_MEMORY_MB * 1024 * 1024),
+                 spill_dir: str = SNAPSHOT_SPILL_DIR):
+        self._history: Dict[tuple, deque] = {}
+        self._listeners: List[Callable[[Snapshot], None]] = []
+        self._lock = threading.Lock()
+        self.history = history
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._process_spill_dir: Optional[str] = None
+        self.resident_bytes = 0
+        self.spilled_bytes = 0
+        self.evictions = 0
+
+    def add_listener(self, listener: Callable[[Snapshot], None]):
+        """Register a callback fired (from the recording thread) when a sheet's version changes."""
+        self._listeners.append(listener)
+
+    def record(self, key: tuple, df) -> Snapshot:
+        return self.record_hashes(key, [str(c) for c in df.columns], row_hashes(df))
+
+    def record_hashes(self, key: tuple, columns: List[str], hashes) -> Snapshot:
+        """Like record(), for a frame hashed elsewhere (e.g. in a worker process)."""
+        snapshot = Snapshot(key, snapshot_version(columns, hashes), columns, hashes, time.time())
+        with self._lock:
+            versions = self._history.setdefault(key, deque(maxlen=self.history))
+            previous = versions[-1] if versions else None
+            if previous is not None and previous.version == snapshot.version:
+                previous.fetched_at = snapshot.fetched_at
+                previous.used_at = snapshot.used_at
+                return previous
+            if len(versions) == versions.maxlen:
+                self._forget(versions[0])
+            versions.append(snapshot)
+            self.resident_bytes += snapshot.nbytes
+            victims = self._spill_victims(snapshot)
+        # Writing the spilled hashes is I/O, so outside the lock
+        for victim in victims:
+            self._spill(victim)
+        for listener in self._listeners:
+            listener(snapshot)
+        return snapshot
+
+    def _forget(self, snapshot: Snapshot):
+        if snapshot.spilled:
+            self.spilled_bytes -= snapshot.nbytes
+        else:
+            self.resident_bytes -= snapshot.nbytes
+        snapshot.drop()
+
+    def _spill_victims(self, keep: Snapshot) -> List[Snapshot]:
+        """Least recently used resident snapshots to spill to get back under budget
+        (marked spilled now, so concurrent recorders don't pick them twice)."""
+        if self.resident_bytes <= self.max_bytes:
+            return []
+        resident = sorted(
+            (snapshot for versions in self._history.values() for snapshot in versions
+             if not snapshot.spilled and snapshot is not keep),
+            key=lambda snapshot: snapshot.used_at,
+        )
+        victims = []
+        for snapshot in resident:
+            if self.resident_bytes <= self.max_bytes:
+                break
+            snapshot.spilled = True
+            self.resident_bytes -= snapshot.nbytes
+            self.spilled_bytes += snapshot.nbytes
+            self.evictions += 1
+            victims.append(snapshot)
+        return victims
+
+    def _spill(self, snapshot: Snapshot):
+        try:
+            if self._process_spill_dir is None:
+                # Spilled hashes only mean something to this process; remove them when it exits
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self._process_spill_dir = tempfile.mkdtemp(prefix="snapshots-", dir=self.spill_dir)
+                atexit.register(shutil.rmtree, self._process_spill_dir, True)
+            snapshot.spill(self._process_spill_dir)
+        except OSError as e:
+            print(f"⚠️  Snapshot spill failed: {e}")
+            with self._lock:
+                snapshot.spilled = False
+                self.resident_bytes += snapshot.nbytes
+                self.spilled_bytes -= snapshot.nbytes
+
+    def latest(self, key: tuple) -> Optional[Snapshot]:
+        versions = self._history.get(key)
+        if not versions:
+            return None
+        versions[-1].used_at = time.monotonic()
+        return versions[-1]
+
+    def find(self, key: tuple, version: str) -> Optional[Snapshot]:
+        for snapshot in self._history.get(key, ()):
+            if snapshot.version == version:
+                snapshot.used_at = time.monotonic()
+                return snapshot
+        return None
+
+    def delta(self, key: tuple, since: str, current: Snapshot) -> Optional[List[tuple]]:
+        """Row opcodes from version `since` to `current`, or None if they can't be
+        computed (unknown version, different columns) or wouldn't be smaller than a full copy."""
+        old = self.find(key, since)
+        if old is None:
+            return None
+        return delta_ops(old.columns, old.row_hashes, current.columns, current.row_hashes)
+
+    def evict(self, prefix: tuple):
+        """Forget every key starting with `prefix` (e.g. a sheet read under any limits)."""
+        with self._lock:
+            for key in [key for key in self._history if key[:len(prefix)] == prefix]:
+                for snapshot in self._history.pop(key):
+                    self._forget(snapshot)
+
+store = SnapshotStore()
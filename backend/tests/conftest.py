@@ -0,0 +1,14 @@
+import os
+import sys
+
+# Run from backend/: pip install -r requirements-dev.txt && python -m pytest tests
+# (the widget tests also need node, for the dashboard's widgets.js; the document patch
+# tests run on Postgres too when TEST_POSTGRES_URL names a postgresql+asyncpg database).
+
+# Import the app's modules as it runs them, from backend/, with the shared common/
+# package at the repository root
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+for path in (REPO_DIR, BACKEND_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
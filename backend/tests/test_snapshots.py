@@ -0,0 +1,128 @@
+import json
+import random
+
+import pandas as pd
+import pytest
+
+import snapshots
+from snapshots import SnapshotStore, delta_ops, diff_rows, row_hashes, snapshot_version
+from workers import data_body, to_records
+
+def sheet(*rows, columns=("name", "value")):
+    return pd.DataFrame([list(row) for row in rows], columns=list(columns))
+
+OLD = sheet(*[(f"row {i}", str(i)) for i in range(20)])
+
+def apply_delta(rows: list, content: dict) -> list:
+    """What main.js applyDatasourceDelta does with a /data?since= body."""
+    rows = list(rows)
+    if content["full"]:
+        return content["rows"]
+    # Ops index into the old rows, so apply them back to front (replaceRows)
+    for op in reversed(content["ops"]):
+        rows[op["start"]:op["end"]] = op["rows"]
+    return rows
+
+def fetch_since(old, new, previous="known") -> dict:
+    old_hashes, new_hashes = row_hashes(old), row_hashes(new)
+    since = snapshot_version([str(c) for c in old.columns], old_hashes)
+    if previous == "known":
+        previous = ([str(c) for c in old.columns], old_hashes)
+    result = data_body(new, new_hashes, since=since, previous=previous)
+    content = json.loads(result["body"])
+    assert result["kind"] == ("full" if content["full"] else "delta")
+    assert content["since"] == since
+    assert content["version"] == snapshot_version([str(c) for c in new.columns], new_hashes)
+    return content
+
+def records(df) -> list:
+    return json.loads(json.dumps(to_records(df)))
+
+def assert_round_trip(old, new, previous="known") -> dict:
+    content = fetch_since(old, new, previous)
+    assert apply_delta(records(old), content) == records(new)
+    return content
+
+EDITS = {
+    "unchanged": OLD,
+    "insert_at_head": pd.concat([sheet(("new", "x")), OLD]),
+    "insert_at_tail": pd.concat([OLD, sheet(("new", "x"), ("newer", "y"))]),
+    "insert_in_middle": pd.concat([OLD[:7], sheet(("new", "x")), OLD[7:]]),
+    "delete_head": OLD[3:],
+    "delete_tail": OLD[:-2],
+    "delete_in_middle": OLD.drop(index=[5, 6, 12]),
+    "edit_row": OLD.replace({"value": {"9": "nine"}}),
+    "edits_at_both_ends": OLD.replace({"value": {"0": "zero", "19": "nineteen"}}),
+    "swap_rows": OLD.iloc[[1, 0] + list(range(2, 20))],
+    "duplicate_rows": pd.concat([OLD[:4], OLD[2:4], OLD[4:]]),
+    "mixed": pd.concat([sheet(("new", "x")), OLD[1:8], sheet(("edit", "e")), OLD[9:15], OLD[16:], sheet(("end", "z"))]),
+}
+
+@pytest.mark.parametrize("name", list(EDITS))
+def test_delta_round_trip(name):
+    content = assert_round_trip(OLD, EDITS[name].reset_index(drop=True))
+    assert not content["full"]
+
+def test_unchanged_sheet_has_no_ops():
+    assert fetch_since(OLD, OLD)["ops"] == []
+
+def test_insert_at_head_is_one_op():
+    content = fetch_since(OLD, pd.concat([sheet(("new", "x")), OLD]).reset_index(drop=True))
+    assert content["ops"] == [{"start": 0, "end": 0, "rows": [{"name": "new", "value": "x"}]}]
+
+def test_delete_at_tail_is_one_op():
+    assert fetch_since(OLD, OLD[:-2])["ops"] == [{"start": 18, "end": 20, "rows": []}]
+
+def test_changed_columns_send_the_whole_sheet():
+    renamed = OLD.rename(columns={"value": "amount"})
+    content = assert_round_trip(OLD, renamed)
+    assert content["full"] and content["columns"] == ["name", "amount"]
+    assert assert_round_trip(OLD, OLD.assign(extra="e"))["full"]
+    assert assert_round_trip(OLD, OLD[["value", "name"]])["full"]
+
+def test_unknown_since_sends_the_whole_sheet(tmp_path):
+    # /data finds no snapshot for the version, so data_body gets no previous one
+    store = SnapshotStore(spill_dir=str(tmp_path))
+    store.record(("sheet",), OLD)
+    current = store.record(("sheet",), OLD[1:])
+    assert store.delta(("sheet",), "unknown", current) is None
+    content = assert_round_trip(OLD, OLD[1:], previous=None)
+    assert content["full"] and content["columns"] == ["name", "value"]
+
+def test_large_changes_send_the_whole_sheet():
+    changed = OLD.replace({"value": {str(i): f"v{i}" for i in range(11)}})
+    assert delta_ops(list(OLD.columns), row_hashes(OLD), list(changed.columns), row_hashes(changed)) is None
+    assert assert_round_trip(OLD, changed)["full"]
+
+def test_regions_over_the_match_limit_are_replaced_whole(monkeypatch):
+    monkeypatch.setattr(snapshots, "DELTA_MATCH_LIMIT", 3)
+    new = pd.concat([OLD[:5], OLD[6:8], sheet(("new", "x")), OLD[8:10], OLD[11:]]).reset_index(drop=True)
+    assert diff_rows(row_hashes(OLD), row_hashes(new)) == [(5, 11, 5, 10)]
+    assert not assert_round_trip(OLD, new)["full"]
+
+def test_empty_sheets():
+    empty = sheet()
+    assert assert_round_trip(empty, OLD)["full"]
+    assert assert_round_trip(OLD, empty)["ops"] == [{"start": 0, "end": 20, "rows": []}]
+    assert assert_round_trip(empty, empty)["ops"] == []
+
+def test_empty_cells_round_trip():
+    new = OLD.copy()
+    new.loc[3, "value"] = None
+    content = assert_round_trip(OLD, new)
+    assert content["ops"] == [{"start": 3, "end": 4, "rows": [{"name": "row 3", "value": None}]}]
+
+@pytest.mark.parametrize("seed", range(30))
+def test_random_edits_round_trip(seed):
+    rng = random.Random(seed)
+    rows = [tuple(row) for row in OLD.itertuples(index=False)]
+    for _ in range(rng.randint(1, 4)):
+        at = rng.randint(0, len(rows))
+        action = rng.choice(["insert", "delete", "edit"])
+        if action == "insert":
+            rows[at:at] = [(f"new {seed}.{at}", str(rng.random()))] * rng.randint(1, 2)
+        elif action == "delete":
+            del rows[at:at + rng.randint(1, 2)]
+        elif at < len(rows):
+            rows[at] = (rows[at][0], "edited")
+    assert_round_trip(OLD, sheet(*rows))
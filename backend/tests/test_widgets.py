@@ -0,0 +1,165 @@
+import os
+import json
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import widgets
+
+WIDGETS_JS = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "static", "js", "widgets.js")
+
+# A sheet's records as to_records gives them: strings, None for empty cells
+ROWS = [
+    {"date": "2024-01-15", "region": "North", "sales": "100", "units": "3", "note": "a"},
+    {"date": "2024-01-20", "region": "south", "sales": "250.5", "units": "x", "note": None},
+    {"date": "2024-02-03", "region": "North", "sales": "n/a", "units": "7", "note": "B"},
+    {"date": "2024/02/29", "region": "East", "sales": "-40", "units": "2", "note": "c"},
+    {"date": "2023-12-31T23:30:00", "region": "10", "sales": "1e3", "units": "", "note": "d"},
+    {"date": "2024-03-10T08:15:00Z", "region": "2", "sales": "12abc", "units": "4.5", "note": "e"},
+    {"date": "2024-03-11", "region": "North", "sales": "Infinity", "units": "1", "note": "b"},
+    {"date": "2024-01-16T10:05:00", "region": "south", "sales": "0.005", "units": "0.015", "note": "f"},
+]
+
+def chart(**config):
+    return {"type": "chart", "config": {"type": "bar", **config}}
+
+def table(**config):
+    return {"type": "table", "config": config}
+
+# (widget_config, filters, column_mapping). Grouping by a period only uses the date
+# column: the browser reads some plain numbers as dates, the server never does.
+CASES = {
+    "chart": (chart(xCols=["region"], yCols=["sales"]), [], {}),
+    "chart_mapped_names": (chart(xCols=["region"], yCols=["sales", "units"]), [], {"sales": "Revenue"}),
+    "chart_no_y": (chart(xCols=["region"], yCols=[]), [], {}),
+    "chart_group_sum": (chart(type="line", xCols=["date"], yCols=["sales", "units"], group="region", agg="sum"), [], {}),
+    "chart_group_month_mean": (chart(type="area", xCols=["region"], yCols=["sales"], group="date", period="month", agg="mean"), [], {}),
+    "chart_group_week_count": (chart(type="pie", xCols=["region"], yCols=["units"], group="date", period="week", agg="count"), [], {}),
+    "chart_group_year_max": (chart(type="scatter", xCols=["note"], yCols=["sales"], group="date", period="year", agg="max"), [], {}),
+    "chart_group_day_min": (chart(xCols=["region"], yCols=["units"], group="date", period="day", agg="min"), [], {}),
+    "chart_group_hour_no_numbers": (chart(xCols=["region"], yCols=["note"], group="date", period="hour", agg="min"), [], {}),
+    "table": (table(columns=["date", "region", "sales"]), [], {"region": "Area"}),
+    "table_no_columns": (table(columns=[]), [], {}),
+    "table_group_sum": (table(columns=["region", "sales", "note"], group="region", agg="sum"), [], {}),
+    "table_group_mean": (table(columns=["region", "sales", "units"], group="region", agg="mean"), [], {}),
+    "table_group_day_count": (table(columns=["date", "sales", "note"], group="date", period="day", agg="count"), [], {}),
+    "table_group_hour_min": (table(columns=["date", "units"], group="date", period="hour", agg="min"), [], {}),
+    "table_group_year_max": (table(columns=["date", "sales"], group="date", period="year", agg="max"), [], {}),
+    "filter_equals": (table(columns=["region", "sales"]), [{"col": "region", "op": "=", "val": "NORTH"}], {}),
+    "filter_not_equals": (table(columns=["region"]), [{"col": "region", "op": "!=", "val": "north"}], {}),
+    "filter_contains": (table(columns=["region"]), [{"col": "region", "op": "contains", "val": "o"}], {}),
+    "filter_contains_null": (table(columns=["note"]), [{"col": "note", "op": "contains", "val": "b"}], {}),
+    "filter_between_numbers": (table(columns=["sales"]), [{"col": "sales", "op": "between", "start": "0", "end": "200"}], {}),
+    "filter_greater": (table(columns=["units"]), [{"col": "units", "op": ">", "val": "2"}], {}),
+    "filter_less": (table(columns=["units"]), [{"col": "units", "op": "<", "val": "4"}], {}),
+    "filter_date_between": (table(columns=["date"]), [{"col": "date", "op": "between", "start": "2024-01-01", "end": "2024-02-01"}], {}),
+    "filter_date_open_end": (table(columns=["date"]), [{"col": "date", "op": "between", "start": "2024-02-01", "end": ""}], {}),
+    "filter_date_equals": (table(columns=["date"]), [{"col": "date", "op": "=", "start": "2024-01-15"}], {}),
+    "filter_date_not_equals": (table(columns=["date"]), [{"col": "date", "op": "!=", "start": "2024-01-15"}], {}),
+    "filter_date_after": (table(columns=["date"]), [{"col": "date", "op": ">", "start": "2024-02-01"}], {}),
+    "filter_date_before": (table(columns=["date"]), [{"col": "date", "op": "<", "start": "2024-01-16"}], {}),
+    "filter_unknown_column": (table(columns=["region"]), [{"col": "nope", "op": "=", "val": "x"}], {}),
+    "filters_combined": (
+        chart(xCols=["region"], yCols=["sales"], group="region", agg="sum"),
+        [{"col": "date", "op": "between", "start": "2024-01-01", "end": "2024-03-01"}, {"col": "units", "op": ">", "val": "1"}],
+        {"sales": "Revenue"},
+    ),
+}
+
+def python_results() -> dict:
+    return {
+        name: json.loads(json.dumps(widgets.widget_result(config, filters, mapping, [dict(r) for r in ROWS]), allow_nan=False))
+        for name, (config, filters, mapping) in CASES.items()
+    }
+
+def javascript_results() -> dict:
+    # In UTC, where the browser reads dates without a time zone as the server does
+    script = (
+        "const w = require(process.argv[1]);"
+        "const cases = JSON.parse(require('fs').readFileSync(0, 'utf8'));"
+        "const out = {};"
+        "for (const [name, c] of Object.entries(cases)) out[name] = w.widgetResult(c[0], c[1], c[2], c[3]);"
+        "process.stdout.write(JSON.stringify(out));"
+    )
+    cases = {name: [config, filters, mapping, ROWS] for name, (config, filters, mapping) in CASES.items()}
+    completed = subprocess.run(
+        ["node", "-e", script, os.path.abspath(WIDGETS_JS)], input=json.dumps(cases),
+        capture_output=True, text=True, check=True, env={**os.environ, "TZ": "UTC"},
+    )
+    return json.loads(completed.stdout)
+
+@pytest.fixture(scope="module")
+def results():
+    if shutil.which("node") is None:
+        pytest.skip("node is needed to run the dashboard's widgets.js")
+    return python_results(), javascript_results()
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_matches_dashboard(results, name):
+    python, javascript = results
+    assert python[name] == javascript[name]
+
+# --- Server-only behaviour ---
+def report(df, **kwargs):
+    return widgets.report_content(df, None, **kwargs)
+
+def test_headerless_columns_are_named_like_the_dashboard():
+    df = pd.DataFrame([["a", "1"], ["b", "2"]])
+    result = report(df, has_headers=False, widget_config=table(columns=["Col 1", "Col 2"]))
+    assert result["columns"] == ["Col 1", "Col 2"]
+    assert result["rows"] == [["a", "1"], ["b", "2"]]
+
+def test_empty_cells_fail_filters_and_aggregate_as_missing():
+    df = pd.DataFrame({"k": ["a", "a", "b"], "v": ["1", np.nan, "x"]})
+    filtered = report(df, widget_config=table(columns=["k"]), filters=[{"col": "v", "op": "contains", "val": ""}])
+    assert filtered["total_rows"] == 2
+    grouped = report(df, widget_config=table(columns=["k", "v"], group="k", agg="sum"))
+    assert grouped["rows"] == [["a", 1], ["b", "x"]]
+
+def test_infinite_values_become_null():
+    df = pd.DataFrame({"k": ["a", "a"], "v": ["Infinity", "-Infinity"]})
+    result = report(df, widget_config=table(columns=["k", "v"], group="k", agg="max"))
+    assert result["rows"] == [["a", None]]
+    json.dumps(result, allow_nan=False)
+
+def test_table_shows_the_first_rows_and_counts_all():
+    df = pd.DataFrame({"n": [str(i) for i in range(widgets.TABLE_ROWS + 10)]})
+    result = report(df, widget_config=table(columns=["n"]))
+    assert len(result["rows"]) == widgets.TABLE_ROWS
+    assert result["total_rows"] == widgets.TABLE_ROWS + 10
+
+def test_empty_sheet():
+    result = report(pd.DataFrame({"n": []}), widget_config=chart(xCols=["n"], yCols=["n"]))
+    assert result == {"type": "chart", "traces": [{"x": [], "y": [], "type": "bar", "name": "n | n"}], "total_rows": 0}
+
+def test_unknown_widget_type():
+    with pytest.raises(ValueError):
+        report(pd.DataFrame({"n": ["1"]}), widget_config={"type": "map", "config": {}})
+
+@pytest.mark.parametrize("value, expected", [
+    ("12abc", 12.0), ("  -3.5e2x", -350.0), (".5", 0.5), ("Infinity", float("inf")), (7, 7.0),
+])
+def test_js_float(value, expected):
+    assert widgets.js_float(value) == expected
+
+@pytest.mark.parametrize("value", ["abc", "", None, True, "e5"])
+def test_js_float_nan(value):
+    assert np.isnan(widgets.js_float(value))
+
+@pytest.mark.parametrize("value, expected", [(1.005, 1.0), (1.255, 1.25), (1.115, 1.12), (-1.005, -1.0), (0.125, 0.13), (-0.125, -0.12)])
+def test_js_round(value, expected):
+    # Math.round rounds halves up, on the binary value (1.005 * 100 is 100.49999...)
+    assert widgets.js_round(value) == expected
+
+def test_js_keys_puts_array_indexes_first():
+    assert widgets.js_keys(["b", "10", "a", "2", "01", "4294967295"]) == ["2", "10", "b", "a", "01", "4294967295"]
+
+@pytest.mark.parametrize("value", ["2024", "12.5", "", "   ", "north", None, 20240101])
+def test_parse_date_rejects_non_dates(value):
+    assert widgets.parse_date(value) is None
+
+def test_parse_date_reads_offsets_as_utc():
+    assert widgets.parse_date("2024-03-10T08:15:00+02:00").isoformat() == "2024-03-10T06:15:00"
@@ -0,0 +1,212 @@
+"""
+Per-request stage timing, reported in a Server-Timing header, and on-demand profiling.
+
+Code on the request path wraps its steps in `with timing.stage("fetch"):`; the
+middleware collects them for the current request (through a contextvar, which also
+reaches the threadpool running sync endpoints) and sends e.g.
+    Server-Timing: limits;dur=3.1, fetch;dur=812.4;desc="2x", parse;dur=40.2, app;dur=871.0
+Repeated stages (the CSV stabilization loop) are summed, with the count in desc.
+Outside a request (the live poller) stage() only runs the block.
+
+With PROFILE_TOKEN set, a request carrying "X-Profile: <token>" (or ?profile=<token>)
+is also sampled: the threads that ran its stages, plus the event loop, have their
+stacks recorded every PROFILE_INTERVAL seconds until the response starts. The
+profile is saved in collapsed-stack format (flamegraph.pl, speedscope) and its id
+returned in X-Profile-Id; download it from /profiles/{id} with the same token.
+"""
+import os
+import sys
+import hmac
+import time
+import uuid
+import tempfile
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional, Set
+from urllib.parse import parse_qs
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "1") == "1"
+# Profiling is off unless a token is configured
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "tables-alive-profiles"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+class Timings:
+    def __init__(self):
+        # stage -> [seconds, count]
+        self.stages: Dict[str, list] = {}
+        self.threads: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, count: int = 1):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += count
+
+    def header(self) -> str:
+        with self._lock:
+            stages = list(self.stages.items())
+        parts = []
+        for name, (seconds, count) in stages:
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if count > 1:
+                part += f';desc="{count}x"'
+            parts.append(part)
+        return ", ".join(parts)
+
+_current: contextvars.ContextVar[Optional[Timings]] = contextvars.ContextVar("timings", default=None)
+
+@contextmanager
+def stage(name: str):
+    """Time a step of the current request (a no-op outside one)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    timings.threads.add(threading.get_ident())
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+@contextmanager
+def collect():
+    """Collect stages into a fresh Timings (e.g. in a worker process, to send back)."""
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+def merge(stages: Dict[str, list]):
+    """Add stages timed elsewhere (see collect) to the current request."""
+    timings = _current.get()
+    if timings is None:
+        return
+    for name, (seconds, count) in stages.items():
+        timings.add(name, seconds, count)
+
+# --- Profiling ---
+class Sampler:
+    """Samples the stacks of a set of threads (which may grow while it runs)."""
+
+    def __init__(self, threads: Set[int], interval: float = PROFILE_INTERVAL):
+        self.threads = threads
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[self._stack(frame)] += 1
+
+    @staticmethod
+    def _stack(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> str:
+        """Stop sampling; returns the profile as collapsed stacks ("a;b;c <count>" per line)."""
+        self._stop.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+def profile_token_matches(*values: Optional[str]) -> bool:
+    """Whether any of the values (header, query parameter) is PROFILE_TOKEN, compared in
+    constant time so response times don't reveal how much of the token matched."""
+    if not PROFILE_TOKEN:
+        return False
+    expected = PROFILE_TOKEN.encode("utf-8")
+    return any(
+        value is not None and hmac.compare_digest(value.encode("utf-8", "replace"), expected)
+        for value in values
+    )
+
+def profile_requested(scope) -> bool:
+    if not PROFILE_TOKEN:
+        return False
+    headers = dict(scope["headers"])
+    header = headers.get(b"x-profile")
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile", [])
+    return profile_token_matches(header.decode("latin-1") if header is not None else None, *query)
+
+def save_profile(method: str, path: str, profile: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.txt"), "w") as f:
+        f.write(f"# {method} {path}\n{profile}")
+    # Keep only the newest PROFILE_KEEP profiles
+    saved = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".txt")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in saved[:-PROFILE_KEEP]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    print(f"🔬 Saved profile {profile_id} for {method} {path}")
+    return profile_id
+
+def profile_path(profile_id: str) -> Optional[str]:
+    if not profile_id.isalnum():
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.txt")
+    return path if os.path.exists(path) else None
+
+class ServerTimingMiddleware:
+    """ASGI middleware collecting stage timings (and, if asked, a profile) per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (SERVER_TIMING_ENABLED or PROFILE_TOKEN):
+            return await self.app(scope, receive, send)
+        timings = Timings()
+        token = _current.set(timings)
+        sampler = None
+        if profile_requested(scope):
+            timings.threads.add(threading.get_ident())
+            sampler = Sampler(timings.threads).start()
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal sampler
+            if message["type"] == "http.response.start":
+                timings.add("app", time.perf_counter() - start)
+                headers = list(message.get("headers", []))
+                if SERVER_TIMING_ENABLED:
+                    headers.append((b"server-timing", timings.header().encode("latin-1")))
+                if sampler is not None:
+                    profile_id = save_profile(scope["method"], scope["path"], sampler.stop())
+                    sampler = None
+                    headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if sampler is not None:
+                sampler.stop()
+            _current.reset(token)
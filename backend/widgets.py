@@ -0,0 +1,299 @@
+"""
+A report's widget computed on the server: the dashboard's widget computations
+(frontend/static/js/widgets.js) ported to Python, so reports can be precomputed (see
+report_jobs.py) and opened without downloading their sheet. Both return the same
+result, which main.js renders; tests/test_widgets.py runs both over the same sheets.
+
+The port keeps the JavaScript semantics the results depend on: parseFloat's lenient
+number prefix, String() of numbers, Math.round, and the key order of plain objects
+(integer-like keys first, ascending). Two deliberate differences: dates without a time
+zone are read as UTC (the browser uses its own), and numbers are never read as dates
+(the browser reads some as timestamps).
+"""
+import re
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+NAN = float("nan")
+_NUMBER_PREFIX = re.compile(r"\s*([+-]?(?:Infinity|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?))")
+_NUMBER = re.compile(r"\s*[+-]?(?:Infinity|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*")
+_ARRAY_INDEX = re.compile(r"0|[1-9]\d*")
+# Rows shown by a table widget
+TABLE_ROWS = 50
+
+# --- JavaScript semantics ---
+def js_float(value) -> float:
+    """parseFloat(value): the number at the start of String(value), else NaN."""
+    if value is None or isinstance(value, bool):
+        return NAN
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_PREFIX.match(str(value))
+    return float(match.group(1).replace("Infinity", "inf")) if match else NAN
+
+def js_str(value) -> str:
+    """String(value) for JSON values."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        if value.is_integer() and abs(value) < 1e21:
+            return str(int(value))
+    return str(value)
+
+def js_round(value: float) -> float:
+    """Math.round(value * 100) / 100."""
+    scaled = value * 100
+    if not math.isfinite(scaled):
+        return value
+    rounded = math.floor(scaled)
+    if scaled - rounded >= 0.5:
+        rounded += 1
+    return rounded / 100
+
+def js_keys(keys: List[str]) -> List[str]:
+    """Object.keys order of an object whose keys were added in this order."""
+    indexes = sorted((key for key in keys if _ARRAY_INDEX.fullmatch(key) and int(key) < 2 ** 32 - 1), key=int)
+    index_set = set(indexes)
+    return indexes + [key for key in keys if key not in index_set]
+
+def parse_date(value) -> Optional[datetime]:
+    """Date.parse(value) as a naive UTC datetime, or None if it isn't a date."""
+    if not isinstance(value, str) or not value.strip() or _NUMBER.fullmatch(value):
+        return None
+    from dateutil import parser
+    try:
+        # Missing parts default as in V8 (year 2001, January, the 1st)
+        parsed = parser.parse(value, default=datetime(2001, 1, 1))
+    except (ValueError, OverflowError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+# --- Filters ---
+def row_matches(row: dict, columns: List[str], filters: List[dict]) -> bool:
+    for f in filters:
+        c = f.get("col")
+        # Skip if column doesn't exist in this datasource
+        if c not in columns:
+            continue
+        op = f.get("op")
+        val = str(f.get("val") or "").lower()
+        s = f.get("start") or ""
+        e = f.get("end") or ""
+
+        rv = row.get(c)
+        if rv is None:
+            return False
+
+        rs = js_str(rv)
+        rv_date = parse_date(rv) if ("-" in rs or "/" in rs) else None
+        if rv_date is not None:
+            start, end = parse_date(s), parse_date(e)
+            if op == "between":
+                if start is not None and rv_date < start:
+                    return False
+                if end is not None and rv_date > end:
+                    return False
+            elif op == "=":
+                if s and rv_date.date().isoformat() != s:
+                    return False
+            elif op == "!=":
+                if s and rv_date.date().isoformat() == s:
+                    return False
+            elif op == ">":
+                if start is not None and rv_date <= start:
+                    return False
+            elif op == "<":
+                if start is not None and rv_date >= start:
+                    return False
+        else:
+            rs = rs.lower()
+            if op == "between":
+                num_rv = js_float(rv)
+                if s and num_rv < js_float(s):
+                    return False
+                if e and num_rv > js_float(e):
+                    return False
+            elif op == "=":
+                if val and rs != val:
+                    return False
+            elif op == "!=":
+                if val and rs == val:
+                    return False
+            elif op == "contains":
+                if val and val not in rs:
+                    return False
+            elif op == ">":
+                if val and js_float(rv) <= js_float(val):
+                    return False
+            elif op == "<":
+                if val and js_float(rv) >= js_float(val):
+                    return False
+    return True
+
+def apply_filters(rows: List[dict], columns: List[str], filters: List[dict]) -> List[dict]:
+    return [row for row in rows if row_matches(row, columns, filters)]
+
+# --- Grouping ---
+def group_key(key, period: Optional[str]):
+    if not period:
+        return key
+    d = parse_date(key)
+    if d is None:
+        return key
+    if period == "year":
+        return d.year
+    if period == "month":
+        return f"{d.year}-{d.month}"
+    if period == "week":
+        # Monday of the week
+        return (d - timedelta(days=d.weekday())).date().isoformat()
+    if period == "day":
+        return d.date().isoformat()
+    if period == "hour":
+        return d.strftime("%Y-%m-%dT%H")
+    return key
+
+def _aggregate(agg: Optional[str], numbers: List[float], count: int) -> float:
+    if agg == "sum":
+        return sum(numbers)
+    if agg == "mean":
+        return sum(numbers) / (len(numbers) or 1)
+    if agg == "count":
+        return count
+    if agg == "min":
+        return min(numbers) if numbers else 0
+    if agg == "max":
+        return max(numbers) if numbers else 0
+    return 0
+
+def _finite(value):
+    # JSON has no Infinity (a sheet can hold "Infinity", which parseFloat reads)
+    return value if not isinstance(value, float) or math.isfinite(value) else None
+
+# --- Widgets ---
+def chart_result(config: dict, rows: List[dict], mapped) -> dict:
+    x_cols = config.get("xCols") or []
+    y_cols = config.get("yCols") or []
+    group, agg = config.get("group"), config.get("agg")
+    if not x_cols or not y_cols:
+        return {"type": "chart", "traces": [], "total_rows": len(rows)}
+
+    data = rows
+    if group:
+        grouped: Dict[str, dict] = {}
+        for row in rows:
+            key = js_str(group_key(row.get(group), config.get("period")))
+            g = grouped.setdefault(key, {"vals": {}, "count": 0, "x_vals": {}})
+            for y in y_cols:
+                v = js_float(row.get(y))
+                values = g["vals"].setdefault(y, [])
+                if not math.isnan(v):
+                    values.append(v)
+            for x in x_cols:
+                g["x_vals"].setdefault(x, row.get(x))
+            g["count"] += 1
+
+        data = []
+        for k in js_keys(list(grouped)):
+            g = grouped[k]
+            res = {group: k}
+            for x in x_cols:
+                res[x] = g["x_vals"].get(x)
+            for y in y_cols:
+                res[y] = js_round(_aggregate(agg, g["vals"][y], g["count"]))
+            data.append(res)
+
+    chart_type = config.get("type")
+    traces = []
+    for x in x_cols:
+        for y in y_cols:
+            trace = {
+                "x": [_finite(d.get(x)) for d in data],
+                "y": [_finite(d.get(y)) for d in data],
+                "type": "scatter" if chart_type == "area" else chart_type,
+                "name": f"{mapped(x)} | {mapped(y)}",
+            }
+            if chart_type == "area":
+                trace["fill"] = "tozeroy"
+            traces.append(trace)
+    return {"type": "chart", "traces": traces, "total_rows": len(data)}
+
+def table_result(config: dict, rows: List[dict], mapped) -> dict:
+    cols = config.get("columns") or []
+    group, agg = config.get("group"), config.get("agg")
+    if not cols:
+        return {"type": "table", "columns": [], "rows": [], "total_rows": 0,
+                "message": "Select columns in settings"}
+
+    data = rows
+    if group:
+        grouped: Dict[str, dict] = {}
+        for row in rows:
+            key = group_key(row.get(group), config.get("period"))
+            g = grouped.get(js_str(key))
+            if g is None:
+                g = grouped[js_str(key)] = {"key": key, "vals": {c: [] for c in cols if c != group}}
+            for c in cols:
+                if c != group:
+                    v = js_float(row.get(c))
+                    # Numbers where they parse, the raw cell ("" if missing) otherwise
+                    g["vals"][c].append(v if not math.isnan(v) else row.get(c, ""))
+
+        data = []
+        for k in js_keys(list(grouped)):
+            g = grouped[k]
+            res = {group: g["key"]}
+            for c in cols:
+                if c != group:
+                    values = g["vals"][c]
+                    numbers = [v for v in values if isinstance(v, float)]
+                    if numbers:
+                        res[c] = js_round(_aggregate(agg, numbers, len(values)))
+                    else:
+                        res[c] = len(values) if agg == "count" else values[0]
+            data.append(res)
+
+    return {
+        "type": "table",
+        "columns": [mapped(c) for c in cols],
+        "rows": [[_finite(r.get(c, "")) for c in cols] for r in data[:TABLE_ROWS]],
+        "total_rows": len(data),
+    }
+
+def widget_result(widget_config: dict, filters: List[dict], column_mapping: dict, rows: List[dict]) -> dict:
+    """A report's widget computed from its sheet's records, as the dashboard would show it."""
+    widget_config = widget_config or {}
+    column_mapping = column_mapping or {}
+    columns = list(rows[0].keys()) if rows else []
+    rows = apply_filters(rows, columns, filters or [])
+
+    def mapped(column):
+        return column_mapping.get(column) or column
+
+    widget_type = widget_config.get("type")
+    config = widget_config.get("config") or {}
+    if widget_type == "chart":
+        return chart_result(config, rows, mapped)
+    if widget_type == "table":
+        return table_result(config, rows, mapped)
+    raise ValueError(f"Unknown widget type: {widget_type}")
+
+# --- Task for workers.run ---
+def report_content(df, hashes, has_headers: bool = True, widget_config: dict = None, filters: list = None,
+                   column_mapping: dict = None) -> dict:
+    """workers task: a report's widget result."""
+    from workers import to_records
+    records = to_records(df)
+    if not has_headers and records:
+        # The dashboard names headerless columns "Col 1", "Col 2"... (see loadData)
+        records = [{f"Col {i + 1}": value for i, value in enumerate(row.values())} for row in records]
+    return widget_result(widget_config, filters, column_mapping, records)
@@ -0,0 +1,231 @@
+"""
+Process pool for the CPU-heavy part of sheet requests.
+
+Parsing a CSV export, building the frame, hashing its rows and encoding the response
+all hold the GIL, so run in a request thread they use one core per backend process
+and stall every other request meanwhile. Endpoints instead `await workers.run(task,
+raw)`: the downloaded CSV is copied once into shared memory, a worker process
+attaches to it, parses and hashes the sheet, runs `task` on the frame and returns
+the encoded body. Only the row hashes (8 bytes a row, for the snapshot store) and
+the body come back; the frame itself never crosses the process boundary.
+
+Sheets read through the API (already Python objects), CSVs smaller than
+DATA_WORKER_MIN_BYTES, and everything when DATA_WORKERS=0 run the same code in the
+threadpool instead. The live poller and report recomputes go through the same pool
+(cached_fetch_sheet, then workers.run); sheets.get_gsheet_df is the in-thread path.
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+import timing
+import shared_cache
+from sheets import RawSheet, parse_sheet, sheet_cache, forget_workbook
+from snapshots import delta_ops, row_hashes, snapshot_version
+
+DATA_WORKERS = int(os.getenv("DATA_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Below this, handing the CSV to a worker costs more than parsing it in place
+DATA_WORKER_MIN_BYTES = int(os.getenv("DATA_WORKER_MIN_BYTES", str(256 * 1024)))
+
+jobs_in_flight = metrics.registry.gauge("data_worker_jobs", "Sheet jobs submitted to the worker processes and not finished")
+
+class SheetResult:
+    def __init__(self, columns: List[str], hashes, rows: int, limit_hit: Optional[str], payload, serialize_seconds: float):
+        self.columns = columns
+        self.hashes = hashes
+        self.rows = rows
+        self.limit_hit = limit_hit
+        self.payload = payload
+        self.serialize_seconds = serialize_seconds
+        # Stages timed in a worker process, to merge into the request's Server-Timing
+        self.stages = {}
+
+def dump_result(result: SheetResult) -> bytes:
+    payload = result.payload
+    meta = {"columns": result.columns, "rows": result.rows, "limit_hit": result.limit_hit,
+            "serialize_seconds": result.serialize_seconds}
+    if payload is None:
+        meta["payload"], data = "none", b""
+    elif isinstance(payload, str):
+        meta["payload"], data = "str", payload.encode()
+    elif isinstance(payload.get("body"), bytes):
+        meta["payload"], meta["kind"], data = "body", payload["kind"], payload["body"]
+    else:
+        meta["payload"], data = "json", json.dumps(payload).encode()
+    return shared_cache.pack(meta, result.hashes.tobytes(), data)
+
+def load_result(data: bytes) -> SheetResult:
+    import numpy as np
+    meta, (hashes, data) = shared_cache.unpack(data)
+    kind = meta.pop("payload")
+    payload = {
+        "none": lambda: None,
+        "str": lambda: data.decode(),
+        "body": lambda: {"kind": meta.pop("kind"), "body": data},
+        "json": lambda: json.loads(data),
+    }[kind]()
+    return SheetResult(meta["columns"], np.frombuffer(hashes, dtype=np.uint64), meta["rows"], meta["limit_hit"],
+                       payload, meta["serialize_seconds"])
+
+# Task results by sheet content, shared between backend workers (see shared_cache.py)
+result_cache = shared_cache.TieredCache("results", dump_result, load_result)
+
+# --- Tasks: fn(df, row hashes, **params) -> payload; run in a worker or a thread ---
+# pandas is imported where used, to keep backend startup fast (see sheets.py)
+def to_records(df):
+    import pandas as pd
+    # Convert NaN to None for valid JSON (as object columns: str and float columns
+    # keep NaN whatever they are given)
+    with timing.stage("nan"):
+        df = df.astype(object).where(pd.notnull(df), None)
+    with timing.stage("records"):
+        return df.to_dict(orient='records')
+
+def encode_json(content) -> bytes:
+    # Same encoding as JSONResponse
+    with timing.stage("encode"):
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def data_body(df, hashes, since: str = None, previous: tuple = None) -> dict:
+    """/data body: all rows as records or, with `since`, the changes from the
+    `previous` (columns, row hashes) snapshot, if known. Returns {"kind", "body"}."""
+    if since is None:
+        return {"kind": "records", "body": encode_json(to_records(df))}
+    columns = [str(c) for c in df.columns]
+    content = {"version": snapshot_version(columns, hashes), "since": since}
+    ops = delta_ops(*previous, columns, hashes) if previous is not None else None
+    if ops is None:
+        content.update(full=True, columns=columns, rows=to_records(df))
+    else:
+        content.update(full=False, ops=[
+            {"start": start, "end": end, "rows": to_records(df.iloc[new_start:new_end])}
+            for start, end, new_start, new_end in ops
+        ])
+    return {"kind": "full" if ops is None else "delta", "body": encode_json(content)}
+
+def analyze_content(df, hashes) -> dict:
+    return {
+        'columns': list(df.columns),
+        'preview': to_records(df.head(10)),
+        'total_rows': len(df),
+        'numeric_columns': list(df.select_dtypes(include=['number']).columns),
+    }
+
+def csv_body(df, hashes) -> str:
+    with timing.stage("csv"):
+        return df.to_csv(index=False)
+
+def hashes_only(df, hashes) -> None:
+    """Just the snapshot (columns and row hashes), e.g. for the live poller."""
+    return None
+
+# Tasks whose results are cached (run without params)
+CACHED_TASKS = (data_body, analyze_content, csv_body, hashes_only)
+
+def result_key(raw: RawSheet, task: Callable) -> tuple:
+    return (raw.digest, raw.has_headers, raw.max_lines, raw.limit_hit, task.__name__)
+
+def forget_sheet(key: tuple):
+    """Drop a sheet (source key) from the shared caches: the fetched sheet, the results
+    computed from it and its workbook. Blocking; call it from a thread."""
+    raw = sheet_cache.get(key)
+    sheet_cache.delete(key)
+    if raw is not None:
+        for task in CACHED_TASKS:
+            result_cache.delete(result_key(raw, task))
+    forget_workbook(key[0], key[3])
+
+# --- Running tasks ---
+def _process(task: Callable, raw: RawSheet, params: dict) -> SheetResult:
+    df = parse_sheet(raw)
+    with timing.stage("row_hashes"):
+        hashes = row_hashes(df)
+    start = time.perf_counter()
+    payload = task(df, hashes, **params)
+    return SheetResult([str(c) for c in df.columns], hashes, len(df), raw.limit_hit, payload, time.perf_counter() - start)
+
+def _worker_job(task: Callable, name: str, size: int, raw_fields: dict, params: dict) -> SheetResult:
+    # Runs in a worker process; the parent owns (and unlinks) the shared block
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        raw = RawSheet(csv=bytes(block.buf[:size]), **raw_fields)
+    finally:
+        block.close()
+    with timing.collect() as timings:
+        result = _process(task, raw, params)
+    result.stages = timings.stages
+    return result
+
+def _ready() -> bool:
+    import pandas  # noqa: F401
+    return True
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the parent has threads (and an event loop) that fork would copy mid-flight
+        _pool = ProcessPoolExecutor(DATA_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def start():
+    """Start the worker processes now, so the first big sheet doesn't wait for them to
+    import pandas; this process imports it in the background too, for small sheets."""
+    threading.Thread(target=_ready, name="preload", daemon=True).start()
+    if DATA_WORKERS:
+        pool = get_pool()
+        for _ in range(DATA_WORKERS):
+            pool.submit(_ready)
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+async def run(task: Callable, raw: RawSheet, **params) -> SheetResult:
+    """Parse a fetched sheet and run `task` on it, in a worker process when worthwhile.
+    Results of tasks without params are cached by sheet content."""
+    params = {name: value for name, value in params.items() if value is not None}
+    cache_key = None if params else result_key(raw, task)
+    if cache_key is not None:
+        with timing.stage("result_cache"):
+            cached = await run_in_threadpool(result_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+    start = time.perf_counter()
+    size = len(raw.csv) if raw.csv is not None else 0
+    if not DATA_WORKERS or size < max(DATA_WORKER_MIN_BYTES, 1):
+        result = await run_in_threadpool(_process, task, raw, params)
+    else:
+        block = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            block.buf[:size] = raw.csv
+            raw_fields = {"source": raw.source, "has_headers": raw.has_headers,
+                          "max_lines": raw.max_lines, "limit_hit": raw.limit_hit}
+            with jobs_in_flight.track(), timing.stage("worker"):
+                result = await asyncio.wrap_future(get_pool().submit(_worker_job, task, block.name, size, raw_fields, params))
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool for the next request
+            print("⚠️  Data worker pool broke, restarting it")
+            shutdown()
+            raise
+        finally:
+            block.close()
+            block.unlink()
+        timing.merge(result.stages)
+    metrics.rows_parsed.inc(result.rows, source=raw.source)
+    if cache_key is not None:
+        await run_in_threadpool(result_cache.set, cache_key, result, time.perf_counter() - start)
+    return result
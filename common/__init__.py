@@ -0,0 +1,5 @@
+"""
+Code shared by the backend and the frontend. Both images copy this directory in as the
+`common` package next to the app; to run an app outside Docker, put the repository root
+on PYTHONPATH (e.g. `PYTHONPATH=.. uvicorn main:app` from backend/).
+"""
@@ -0,0 +1,21 @@
+"""
+Access tokens: signed by the backend (auth_utils.create_access_token) and read by the
+frontend, which rate-limits each signed-in user in one bucket whatever token they send.
+"""
+import os
+from typing import Optional
+
+# Secret key to sign JWTs (should be env var in production)
+SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
+ALGORITHM = "HS256"
+
+def token_user_id(token: str) -> Optional[int]:
+    """The user id in a valid, unexpired access token; None otherwise (or for tokens
+    issued before they carried one)."""
+    from jose import JWTError, jwt
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    user_id = payload.get("uid")
+    return user_id if isinstance(user_id, int) and not isinstance(user_id, bool) else None
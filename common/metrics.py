@@ -0,0 +1,207 @@
+"""
+Minimal Prometheus metrics shared by the backend and the frontend: counters, gauges and
+histograms with labels, rendered in the text exposition format by each app's /metrics,
+plus the HTTP middleware and the token guarding /metrics. Each app's metrics.py adds
+its own metrics to `registry`.
+
+Gauges and counters can also take a `collect` callback returning {label values: value},
+for numbers that already live elsewhere (cache hit counts, pool sizes) and are only
+read when scraped.
+"""
+import os
+import hmac
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from fastapi import Header, HTTPException
+
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>", and is off while it is unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[Tuple, float]]] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self):
+        values = self._collect() if self._collect else dict(self._values)
+        for key, value in values.items():
+            yield self.name, self.labelnames, key, value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labelnames, key, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count a block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        names = self.labelnames + ("le",)
+        for key, state in values.items():
+            for bound, count in zip(self.buckets, state):
+                yield f"{self.name}_bucket", names, key + (_format_value(bound),), count
+            yield f"{self.name}_sum", self.labelnames, key, state[-2]
+            yield f"{self.name}_count", self.labelnames, key, state[-1]
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+registry = Registry()
+
+# --- HTTP ---
+http_requests = registry.counter(
+    "http_requests_total", "Requests handled, by route and status", ("method", "route", "status"))
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Time until the response was fully sent", ("method", "route"))
+http_in_flight = registry.gauge("http_requests_in_flight", "Requests being handled")
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request until its last body chunk (so streams count in full)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        root_path = scope.get("root_path", "")
+        start = time.perf_counter()
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            # Route templates (or the mount point, for mounted apps), not raw paths,
+            # keep label cardinality bounded
+            route = scope.get("route")
+            if route is not None:
+                route = route.path
+            elif scope.get("root_path", "") != root_path:
+                route = scope["root_path"][len(root_path):]
+            else:
+                route = "unmatched"
+            http_requests.inc(method=scope["method"], route=route, status=status["code"])
+            http_request_seconds.observe(time.perf_counter() - start, method=scope["method"], route=route)
+
+def metrics_authorized(authorization: Optional[str]) -> bool:
+    return bool(METRICS_TOKEN) and hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}")
+
+def require_metrics_token(authorization: Optional[str] = Header(None)):
+    """Dependency guarding /metrics and other internals: request paths, pool sizes and
+    queue depths are not for the public, so without METRICS_TOKEN they are off."""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not metrics_authorized(authorization):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
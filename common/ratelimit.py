@@ -0,0 +1,65 @@
+"""
+Rate-limit state shared by the backend's limits (per user and per sheet, plan-aware)
+and the frontend's admission control (per client, before calls reach the backend).
+"""
+import time
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Hashable, Optional
+
+class RateLimitStore(ABC):
+    """Token buckets and concurrency slots. MemoryStore keeps them per process; a shared
+    store (e.g. over Redis) makes the limits hold across workers and replicas."""
+
+    @abstractmethod
+    def take(self, key: Hashable, rate: float, burst: float, cost: float = 1) -> float:
+        """Spend `cost` tokens; returns 0 if they were available, else the seconds until they will be."""
+
+    @abstractmethod
+    def acquire(self, key: Hashable, limit: Optional[int]) -> bool:
+        """Take one of `limit` concurrency slots (None means unlimited)."""
+
+    @abstractmethod
+    def release(self, key: Hashable):
+        """Give back a slot taken by acquire."""
+
+class MemoryStore(RateLimitStore):
+    def __init__(self, max_buckets: int = 100000):
+        self.max_buckets = max_buckets
+        # key -> (tokens, updated_at, full_at)
+        self._buckets: Dict[Hashable, tuple] = {}
+        self._in_flight: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: Hashable, rate: float, burst: float, cost: float = 1) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if len(self._buckets) > self.max_buckets:
+                # Full buckets are the same as absent ones
+                for stale in [k for k, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+                    del self._buckets[stale]
+        return wait
+
+    def acquire(self, key: Hashable, limit: Optional[int]) -> bool:
+        with self._lock:
+            count = self._in_flight.get(key, 0)
+            if limit is not None and count >= limit:
+                return False
+            self._in_flight[key] = count + 1
+            return True
+
+    def release(self, key: Hashable):
+        with self._lock:
+            count = self._in_flight.get(key, 0) - 1
+            if count > 0:
+                self._in_flight[key] = count
+            else:
+                self._in_flight.pop(key, None)
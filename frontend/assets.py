@@ -0,0 +1,227 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is always available
+    brotli = None
+
+STATIC_DIR = "static"
+# Rebuild assets whose source changed on the next lookup (for development with mounted
+# code; docker-compose.yml sets it)
+DEV_RELOAD = os.getenv("DEV_RELOAD", "0") == "1"
+
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".svg", ".json", ".txt", ".html"}
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+MEDIA_CACHE = "public, max-age=86400"
+CHUNK_SIZE = 64 * 1024
+
+class Asset:
+    def __init__(self, path: str, hashed_path: str, media_type: str, variants: Dict[str, bytes], mtime: float):
+        self.path = path
+        self.hashed_path = hashed_path
+        self.media_type = media_type
+        # content-encoding ("identity", "gzip", "br") -> body
+        self.variants = variants
+        self.mtime = mtime
+        self.etag = f'"{hashed_path.rsplit(".", 2)[-2]}"'
+
+# --- Minification ---
+def minify_css(text: str) -> str:
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    return re.sub(r"\s*([{};,])\s*", r"\1", text).strip()
+
+def minify_js(text: str) -> str:
+    # Conservative: drop indentation, blank lines and whole-line comments, but leave
+    # everything inside multi-line template literals alone. Newlines are kept so
+    # automatic semicolon insertion behaves exactly as before.
+    lines = []
+    in_template = False
+    for line in text.splitlines():
+        if not in_template:
+            line = line.strip()
+            if not line or line.startswith("//"):
+                continue
+        lines.append(line)
+        if len(re.findall(r"(?<!\\)`", line)) % 2:
+            in_template = not in_template
+    return "\n".join(lines) + "\n"
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+# --- Build ---
+def build_asset(path: str) -> Asset:
+    source = os.path.join(STATIC_DIR, path)
+    with open(source, "rb") as f:
+        content = f.read()
+    root, ext = os.path.splitext(path)
+
+    minify = MINIFIERS.get(ext)
+    if minify:
+        content = minify(content.decode("utf-8")).encode("utf-8")
+
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    variants = {"identity": content}
+    if ext in COMPRESSIBLE_EXTENSIONS:
+        variants["gzip"] = gzip.compress(content, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants["br"] = brotli.compress(content, quality=11)
+
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return Asset(path, f"{root}.{digest}{ext}", media_type, variants, os.path.getmtime(source))
+
+class AssetManifest:
+    def __init__(self):
+        self._by_path: Dict[str, Asset] = {}
+        self._by_hashed_path: Dict[str, Asset] = {}
+
+    def build(self):
+        for directory, _, files in os.walk(STATIC_DIR):
+            for name in files:
+                path = os.path.relpath(os.path.join(directory, name), STATIC_DIR).replace(os.sep, "/")
+                self._add(build_asset(path))
+
+    def _add(self, asset: Asset):
+        self._by_path[asset.path] = asset
+        self._by_hashed_path[asset.hashed_path] = asset
+
+    def get(self, path: str) -> Optional[Asset]:
+        asset = self._by_path.get(path)
+        if asset is not None and DEV_RELOAD:
+            source = os.path.join(STATIC_DIR, path)
+            if os.path.exists(source) and os.path.getmtime(source) != asset.mtime:
+                asset = build_asset(path)
+                self._add(asset)
+        return asset
+
+    def get_hashed(self, hashed_path: str) -> Optional[Asset]:
+        return self._by_hashed_path.get(hashed_path)
+
+manifest = AssetManifest()
+
+def asset_url(path: str) -> str:
+    """URL of a static file under its content-hashed name (Jinja global)."""
+    asset = manifest.get(path)
+    if asset is None:
+        return f"/static/{path}"
+    return f"/assets/{asset.hashed_path}"
+
+def _accepted_encodings(request: Request) -> set:
+    header = request.headers.get("accept-encoding", "")
+    return {part.split(";")[0].strip().lower() for part in header.split(",") if part.strip()}
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+def serve_asset(request: Request, hashed_path: str) -> Response:
+    asset = manifest.get_hashed(hashed_path)
+    if asset is None:
+        return Response(status_code=404)
+
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE,
+        "ETag": asset.etag,
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request, asset.etag):
+        return Response(status_code=304, headers=headers)
+
+    accepted = _accepted_encodings(request)
+    for encoding in ("br", "gzip"):
+        if encoding in asset.variants and encoding in accepted:
+            headers["Content-Encoding"] = encoding
+            return Response(asset.variants[encoding], media_type=asset.media_type, headers=headers)
+    return Response(asset.variants["identity"], media_type=asset.media_type, headers=headers)
+
+# --- Range-served media ---
+def _parse_range(header: str, size: int) -> Optional[tuple]:
+    """(start, end) inclusive for a single "bytes=" range; None if unsatisfiable.
+    Raises ValueError for headers we don't handle (multiple ranges, other units) or
+    that aren't valid (not numbers, last byte before the first)."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError(header)
+    start, _, end = spec.strip().partition("-")
+    if not (start or end) or not all(part.isdigit() for part in (start, end) if part):
+        raise ValueError(header)
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        raise ValueError(header)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        return None
+    return start, end
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def serve_media(request: Request, path: str) -> Response:
+    """Serve a large file with validators, conditional requests and single byte ranges."""
+    if not os.path.exists(path):
+        return Response(status_code=404)
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{int(stat.st_mtime)}-{size}"'
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": MEDIA_CACHE,
+        "ETag": etag,
+        "Last-Modified": last_modified,
+    }
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if "if-none-match" not in request.headers and "if-modified-since" in request.headers:
+        try:
+            if int(stat.st_mtime) <= parsedate_to_datetime(request.headers["if-modified-since"]).timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range means the client's partial copy is outdated: send the whole file
+    if range_header and (not if_range or if_range.strip() in (etag, last_modified)):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            # A Range we don't handle is ignored (RFC 9110): the whole file, as without one
+            pass
+        else:
+            if byte_range is None:
+                headers["Content-Range"] = f"bytes */{size}"
+                return Response(status_code=416, headers=headers)
+            start, end = byte_range
+            length = end - start + 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(_iter_file(path, start, length), status_code=206, media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_iter_file(path, 0, size), media_type=media_type, headers=headers)
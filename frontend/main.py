@@ -1,13 +1,16 @@
-import os
-import requests
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
-from typing import Optional
+
+import assets
+import metrics
+import pages
+import proxy
+import ratelimit
 
 app = FastAPI()
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -21,291 +24,91 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # or better, just `app.mount("/media", ...)` and I'll ensure I create that dir and move the file.
 
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = assets.asset_url
+page_cache = pages.PageCache(templates)
+
+# Pages whose HTML is the same for every visitor (all user state lives in main.js)
+STATIC_PAGES = [
+    "index.html", "faq.html", "usecases.html", "pricing.html", "login.html",
+    "register.html", "dashboard.html", "datasources.html", "dashboards.html", "reports.html",
+]
 
-BACKEND_URL = os.getenv("BACKEND_URL", "http://backend:5000")
+@app.on_event("startup")
+async def startup():
+    # Minify, content-hash and precompress static files once per process
+    assets.manifest.build()
+    page_cache.prerender(STATIC_PAGES)
 
-class ProxyRequest(BaseModel):
-    sheet_url: str
-    gid: Optional[str] = None
-    has_headers: Optional[bool] = True
+@app.get("/assets/{path:path}")
+async def get_asset(path: str, request: Request):
+    return assets.serve_asset(request, path)
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return page_cache.respond(request, "index.html")
 
 @app.get("/faq", response_class=HTMLResponse)
 async def read_faq(request: Request):
-    return templates.TemplateResponse("faq.html", {"request": request})
+    return page_cache.respond(request, "faq.html")
 
 @app.get("/usecases", response_class=HTMLResponse)
 async def read_usecases(request: Request):
-    return templates.TemplateResponse("usecases.html", {"request": request})
+    return page_cache.respond(request, "usecases.html")
 
 @app.get("/pricing", response_class=HTMLResponse)
 async def read_pricing(request: Request):
-    return templates.TemplateResponse("pricing.html", {"request": request})
+    return page_cache.respond(request, "pricing.html")
 
 @app.get("/login", response_class=HTMLResponse)
 async def read_login(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return page_cache.respond(request, "login.html")
 
 @app.get("/register", response_class=HTMLResponse)
 async def read_register(request: Request):
-    return templates.TemplateResponse("register.html", {"request": request})
+    return page_cache.respond(request, "register.html")
 
 @app.get("/dashboard", response_class=HTMLResponse)
 async def read_dashboard(request: Request):
-    return templates.TemplateResponse("dashboard.html", {"request": request})
+    return page_cache.respond(request, "dashboard.html")
 
 @app.get("/data-sources", response_class=HTMLResponse)
 async def read_datasources(request: Request):
-    return templates.TemplateResponse("datasources.html", {"request": request})
+    return page_cache.respond(request, "datasources.html")
 
 @app.get("/dashboards", response_class=HTMLResponse)
 async def read_dashboards(request: Request):
-    return templates.TemplateResponse("dashboards.html", {"request": request})
+    return page_cache.respond(request, "dashboards.html")
 
 @app.get("/reports", response_class=HTMLResponse)
 async def read_reports(request: Request):
-    return templates.TemplateResponse("reports.html", {"request": request})
-
-# Proxy Auth Requests
-@app.post("/api/register")
-async def proxy_register(request: Request):
-    try:
-        body = await request.json()
-        resp = requests.post(f"{BACKEND_URL}/auth/register", json=body)
-        if resp.status_code != 200:
-             return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.post("/api/login")
-async def proxy_login(request: Request):
-    try:
-        form = await request.form()
-        # forward as form data
-        resp = requests.post(f"{BACKEND_URL}/auth/token", data=form, headers={"Content-Type": "application/x-www-form-urlencoded"})
-        if resp.status_code != 200:
-             return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        print(e)
-        return JSONResponse(status_code=500, content={"error": str(e)})
+    return page_cache.respond(request, "reports.html")
 
-@app.get("/api/me")
-async def proxy_me(request: Request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        resp = requests.get(f"{BACKEND_URL}/auth/me", headers={'Authorization': auth_header})
-        if resp.status_code != 200:
-             return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+@app.get("/metrics")
+async def prometheus_metrics(_: None = Depends(metrics.require_metrics_token)):
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/video.mp4")
-async def get_video():
-    from fastapi.responses import FileResponse
-    return FileResponse("7947397-hd_1920_1080_30fps.mp4")
+async def get_video(request: Request):
+    return assets.serve_media(request, "7947397-hd_1920_1080_30fps.mp4")
 
 # Proxy to Backend
-@app.post("/api/proxy/data")
-async def proxy_data(req: ProxyRequest):
-    try:
-        resp = requests.post(f"{BACKEND_URL}/data", json=req.model_dump(), timeout=60)
-        if resp.status_code != 200:
-             return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-# Data Sources API Proxies
-@app.get("/api/datasources")
-async def proxy_list_datasources(request: Request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        resp = requests.get(f"{BACKEND_URL}/datasources", headers={'Authorization': auth_header})
-        if resp.status_code != 200:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.post("/api/datasources")
-async def proxy_create_datasource(request: Request):
-    try:
-        body = await request.json()
-        auth_header = request.headers.get('Authorization')
-        resp = requests.post(f"{BACKEND_URL}/datasources", json=body, headers={'Authorization': auth_header})
-        if resp.status_code != 200 and resp.status_code != 201:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json(), status_code=resp.status_code)
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.get("/api/datasources/{datasource_id}")
-async def proxy_get_datasource(datasource_id: int, request: Request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        resp = requests.get(f"{BACKEND_URL}/datasources/{datasource_id}", headers={'Authorization': auth_header})
-        if resp.status_code != 200:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.put("/api/datasources/{datasource_id}")
-async def proxy_update_datasource(datasource_id: int, request: Request):
-    try:
-        body = await request.json()
-        auth_header = request.headers.get('Authorization')
-        resp = requests.put(f"{BACKEND_URL}/datasources/{datasource_id}", json=body, headers={'Authorization': auth_header})
-        if resp.status_code != 200:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.delete("/api/datasources/{datasource_id}")
-async def proxy_delete_datasource(datasource_id: int, request: Request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        resp = requests.delete(f"{BACKEND_URL}/datasources/{datasource_id}", headers={'Authorization': auth_header})
-        if resp.status_code != 200 and resp.status_code != 204:
-            try:
-                error_content = resp.json()
-            except:
-                error_content = {"detail": resp.text or "Unknown error"}
-            return JSONResponse(status_code=resp.status_code, content=error_content)
-        return Response(status_code=resp.status_code)
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-# Dashboards API Proxies
-@app.get("/api/dashboards")
-async def proxy_list_dashboards(request: Request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        resp = requests.get(f"{BACKEND_URL}/dashboards", headers={'Authorization': auth_header})
-        if resp.status_code != 200:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.post("/api/dashboards")
-async def proxy_create_dashboard(request: Request):
-    try:
-        body = await request.json()
-        auth_header = request.headers.get('Authorization')
-        resp = requests.post(f"{BACKEND_URL}/dashboards", json=body, headers={'Authorization': auth_header})
-        if resp.status_code != 200 and resp.status_code != 201:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json(), status_code=resp.status_code)
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.get("/api/dashboards/{dashboard_id}")
-async def proxy_get_dashboard(dashboard_id: int, request: Request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        resp = requests.get(f"{BACKEND_URL}/dashboards/{dashboard_id}", headers={'Authorization': auth_header})
-        if resp.status_code != 200:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.put("/api/dashboards/{dashboard_id}")
-async def proxy_update_dashboard(dashboard_id: int, request: Request):
-    try:
-        body = await request.json()
-        auth_header = request.headers.get('Authorization')
-        resp = requests.put(f"{BACKEND_URL}/dashboards/{dashboard_id}", json=body, headers={'Authorization': auth_header})
-        if resp.status_code != 200:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.delete("/api/dashboards/{dashboard_id}")
-async def proxy_delete_dashboard(dashboard_id: int, request: Request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        resp = requests.delete(f"{BACKEND_URL}/dashboards/{dashboard_id}", headers={'Authorization': auth_header})
-        if resp.status_code != 200 and resp.status_code != 204:
-            try:
-                error_content = resp.json()
-            except:
-                error_content = {"detail": resp.text or "Unknown error"}
-            return JSONResponse(status_code=resp.status_code, content=error_content)
-        return Response(status_code=resp.status_code)
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-# Reports API Proxies
-@app.get("/api/reports")
-async def proxy_list_reports(request: Request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        resp = requests.get(f"{BACKEND_URL}/reports", headers={'Authorization': auth_header})
-        if resp.status_code != 200:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.post("/api/reports")
-async def proxy_create_report(request: Request):
-    try:
-        body = await request.json()
-        auth_header = request.headers.get('Authorization')
-        resp = requests.post(f"{BACKEND_URL}/reports", json=body, headers={'Authorization': auth_header})
-        if resp.status_code != 200 and resp.status_code != 201:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json(), status_code=resp.status_code)
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.get("/api/reports/{report_id}")
-async def proxy_get_report(report_id: int, request: Request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        resp = requests.get(f"{BACKEND_URL}/reports/{report_id}", headers={'Authorization': auth_header})
-        if resp.status_code != 200:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.put("/api/reports/{report_id}")
-async def proxy_update_report(report_id: int, request: Request):
-    try:
-        body = await request.json()
-        auth_header = request.headers.get('Authorization')
-        resp = requests.put(f"{BACKEND_URL}/reports/{report_id}", json=body, headers={'Authorization': auth_header})
-        if resp.status_code != 200:
-            return JSONResponse(status_code=resp.status_code, content=resp.json())
-        return JSONResponse(content=resp.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-
-@app.delete("/api/reports/{report_id}")
-async def proxy_delete_report(report_id: int, request: Request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        resp = requests.delete(f"{BACKEND_URL}/reports/{report_id}", headers={'Authorization': auth_header})
-        if resp.status_code != 200 and resp.status_code != 204:
-            try:
-                error_content = resp.json()
-            except:
-                error_content = {"detail": resp.text or "Unknown error"}
-            return JSONResponse(status_code=resp.status_code, content=error_content)
-        return Response(status_code=resp.status_code)
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+@app.on_event("shutdown")
+async def shutdown():
+    await proxy.close_client()
+
+@app.api_route("/api/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def proxy_api(path: str, request: Request):
+    upstream_path = proxy.resolve(path)
+    if upstream_path is None:
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+    try:
+        admission = await ratelimit.admit(request, upstream_path)
+    except ratelimit.RateLimited as e:
+        metrics.rate_limited.inc(upstream=metrics.upstream_label(upstream_path))
+        return e.response
+    # Concurrency slots are held until the backend's response headers arrive
+    with admission:
+        return await proxy.forward(request, upstream_path)
 
 if __name__ == "__main__":
     import uvicorn
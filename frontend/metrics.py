@@ -0,0 +1,21 @@
+"""
+Frontend metrics, rendered by /metrics: requests by route and status (304s from the
+page and asset caches included), requests in flight, and for proxied API calls the
+backend's latency, proxy errors and rate-limit refusals. The metric types, the
+registry, the HTTP middleware and the /metrics token are in common/metrics.py, shared
+with the backend.
+"""
+from common.metrics import (  # noqa: F401  (re-exported for the app's modules)
+    registry, MetricsMiddleware, metrics_authorized, require_metrics_token,
+)
+
+# --- Proxy ---
+upstream_seconds = registry.histogram(
+    "proxy_upstream_duration_seconds", "Time until the backend's response headers arrived", ("upstream",))
+upstream_errors = registry.counter(
+    "proxy_upstream_errors_total", "Proxied calls that got no response from the backend", ("upstream", "error"))
+rate_limited = registry.counter("proxy_rate_limited_total", "API calls refused by admission control", ("upstream",))
+
+def upstream_label(upstream_path: str) -> str:
+    """The backend resource a call went to (/data, /dashboards, ...), without ids."""
+    return "/" + upstream_path.strip("/").split("/", 1)[0]
@@ -0,0 +1,59 @@
+import os
+import hashlib
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.templating import Jinja2Templates
+from typing import Dict
+
+import assets
+
+TEMPLATE_DIR = "templates"
+
+class RenderedPage:
+    def __init__(self, body: bytes, stamp: float):
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        self.stamp = stamp
+
+def _tree_mtime(directory: str) -> float:
+    latest = 0.0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return latest
+
+class PageCache:
+    """Rendered bytes of templates that don't depend on the request or user.
+
+    Pages are rendered once and served with an ETag. With DEV_RELOAD=1 a page is
+    re-rendered when anything under templates/ or static/ (asset URLs) changed."""
+
+    def __init__(self, templates: Jinja2Templates):
+        self.templates = templates
+        self._pages: Dict[str, RenderedPage] = {}
+
+    def _stamp(self) -> float:
+        if not assets.DEV_RELOAD:
+            return 0.0
+        return max(_tree_mtime(TEMPLATE_DIR), _tree_mtime(assets.STATIC_DIR))
+
+    def render(self, name: str) -> RenderedPage:
+        stamp = self._stamp()
+        page = self._pages.get(name)
+        if page is None or page.stamp != stamp:
+            body = self.templates.get_template(name).render().encode("utf-8")
+            page = RenderedPage(body, stamp)
+            self._pages[name] = page
+        return page
+
+    def prerender(self, names):
+        for name in names:
+            self.render(name)
+
+    def respond(self, request: Request, name: str) -> Response:
+        page = self.render(name)
+        # Revalidate every time so a deploy's new asset URLs are picked up at once
+        headers = {"ETag": page.etag, "Cache-Control": "no-cache"}
+        if assets.etag_matches(request, page.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(page.body, media_type="text/html", headers=headers)
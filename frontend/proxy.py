@@ -0,0 +1,122 @@
+import os
+import time
+import httpx
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Optional
+
+import metrics
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://backend:5000")
+PROXY_TIMEOUT = float(os.getenv("PROXY_TIMEOUT", "60"))
+
+# Frontend API paths that don't map 1:1 onto a backend path
+API_ALIASES = {
+    "register": "/auth/register",
+    "login": "/auth/token",
+    "me": "/auth/me",
+    "proxy/data": "/data",
+    "proxy/analyze": "/analyze",
+    "proxy/download": "/download",
+}
+
+# Backend resources exposed as /api/<resource>/... with the same sub-paths
+API_RESOURCES = ("datasources", "dashboards", "reports", "live", "profiles")
+
+# Long-lived event streams; these must not hit the read timeout between events
+STREAMING_PATHS = ("/live/",)
+
+# Connection-level headers that must not be forwarded by a proxy (RFC 7230, 6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+}
+
+# Set by our own server on the way out; forwarding them would duplicate them
+SERVER_HEADERS = {"date", "server"}
+
+_client: Optional[httpx.AsyncClient] = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(base_url=BACKEND_URL, timeout=PROXY_TIMEOUT)
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def resolve(path: str) -> Optional[str]:
+    """Map a path below /api/ onto the backend path it proxies, or None if it isn't proxied."""
+    path = path.strip("/")
+    if path in API_ALIASES:
+        return API_ALIASES[path]
+    resource = path.split("/", 1)[0]
+    if resource in API_RESOURCES:
+        return f"/{path}"
+    return None
+
+def _filter_headers(headers, skip=HOP_BY_HOP_HEADERS) -> dict:
+    return {k: v for k, v in headers.items() if k.lower() not in skip}
+
+async def forward(request: Request, upstream_path: str, timeout=httpx.USE_CLIENT_DEFAULT):
+    """Stream a request to the backend and its response back, without decoding either body."""
+    client = get_client()
+    if upstream_path.startswith(STREAMING_PATHS):
+        timeout = httpx.Timeout(PROXY_TIMEOUT, read=None)
+    url = upstream_path
+    if request.url.query:
+        url = f"{upstream_path}?{request.url.query}"
+
+    # Only stream a body if the client actually sent one (GET/DELETE usually don't)
+    content = None
+    if "content-length" in request.headers or "transfer-encoding" in request.headers:
+        content = request.stream()
+
+    headers = _filter_headers(request.headers)
+    # Append the browser's address so the backend can tell anonymous callers apart
+    if request.client:
+        forwarded = request.headers.get("x-forwarded-for")
+        headers["x-forwarded-for"] = f"{forwarded}, {request.client.host}" if forwarded else request.client.host
+
+    upstream_request = client.build_request(
+        request.method,
+        url,
+        headers=headers,
+        content=content,
+        timeout=timeout,
+    )
+    upstream_label = metrics.upstream_label(upstream_path)
+    start = time.perf_counter()
+    try:
+        upstream = await client.send(upstream_request, stream=True)
+    except httpx.HTTPError as e:
+        metrics.upstream_errors.inc(upstream=upstream_label, error=type(e).__name__)
+        return JSONResponse(status_code=502, content={"error": str(e)})
+    upstream_seconds = time.perf_counter() - start
+    metrics.upstream_seconds.observe(upstream_seconds, upstream=upstream_label)
+
+    # The backend's Server-Timing passes through, with the time seen by the proxy added
+    headers = _filter_headers(upstream.headers, HOP_BY_HOP_HEADERS | SERVER_HEADERS)
+    server_timing = headers.pop("server-timing", None)
+    proxy_timing = f"proxy;dur={upstream_seconds * 1000:.1f}"
+    headers["Server-Timing"] = f"{server_timing}, {proxy_timing}" if server_timing else proxy_timing
+
+    # aiter_raw keeps any Content-Encoding intact, so Content-Length stays valid
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers=headers,
+        background=BackgroundTask(upstream.aclose),
+    )
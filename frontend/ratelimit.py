@@ -0,0 +1,100 @@
+"""
+Admission control for proxied API calls, before they reach the backend.
+
+Each client (the user id in a valid access token, else the address) has a token
+bucket for all API calls and a stricter one for sheet reads (/data, /analyze,
+/download); each sheet has a bucket shared by all clients. Sheet reads also hold a
+concurrency slot per client and per sheet until the backend answers. Over a limit:
+429 with Retry-After. The backend enforces its own (plan-aware) limits too; these
+just stop floods early.
+
+State lives in a RateLimitStore (common/ratelimit.py, shared with the backend);
+MemoryStore is per process, a shared store implementing the same three methods makes
+the limits hold across workers.
+"""
+import os
+import json
+import math
+from contextlib import ExitStack
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from typing import Hashable, Optional
+
+from common.auth import token_user_id
+from common.ratelimit import RateLimitStore, MemoryStore
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# Any API call, per client
+RATE_LIMIT_CLIENT_RATE = float(os.getenv("RATE_LIMIT_CLIENT_RATE", "10"))
+RATE_LIMIT_CLIENT_BURST = float(os.getenv("RATE_LIMIT_CLIENT_BURST", "50"))
+# Sheet reads, per client and per sheet
+RATE_LIMIT_DATA_RATE = float(os.getenv("RATE_LIMIT_DATA_RATE", "2"))
+RATE_LIMIT_DATA_BURST = float(os.getenv("RATE_LIMIT_DATA_BURST", "20"))
+RATE_LIMIT_SOURCE_RATE = float(os.getenv("RATE_LIMIT_SOURCE_RATE", "2"))
+RATE_LIMIT_SOURCE_BURST = float(os.getenv("RATE_LIMIT_SOURCE_BURST", "20"))
+RATE_LIMIT_DATA_CONCURRENCY = int(os.getenv("RATE_LIMIT_DATA_CONCURRENCY", "4"))
+RATE_LIMIT_SOURCE_CONCURRENCY = int(os.getenv("RATE_LIMIT_SOURCE_CONCURRENCY", "4"))
+
+DATA_PATHS = ("/data", "/analyze", "/download")
+
+store: RateLimitStore = MemoryStore()
+
+class RateLimited(Exception):
+    def __init__(self, message: str, retry_after: float = 1):
+        super().__init__(message)
+        self.response = JSONResponse(
+            status_code=429,
+            content={"error": message},
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+def client_key(request: Request) -> str:
+    # The token is verified, so made-up tokens can't each get a fresh bucket; anyone
+    # without a valid one is limited by address
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        user_id = token_user_id(token)
+        if user_id is not None:
+            return f"user:{user_id}"
+    return "address:" + (request.client.host if request.client else "unknown")
+
+async def sheet_source(request: Request) -> Optional[tuple]:
+    # The body is cached, so the proxy still forwards it afterwards
+    try:
+        body = json.loads(await request.body())
+        return (body["sheet_url"], str(body.get("gid") or "0"))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def _check(key: Hashable, rate: float, burst: float, message: str):
+    wait = store.take(key, rate, burst)
+    if wait:
+        raise RateLimited(message, wait)
+
+def _slot(stack: ExitStack, key: Hashable, limit: int, message: str):
+    if not store.acquire(key, limit):
+        stack.close()
+        raise RateLimited(message)
+    stack.callback(store.release, key)
+
+async def admit(request: Request, upstream_path: str) -> ExitStack:
+    """Check the limits for a proxied call. Returns a context holding its concurrency
+    slots (exit it once the backend has answered); raises RateLimited if over a limit."""
+    stack = ExitStack()
+    if not RATE_LIMIT_ENABLED:
+        return stack
+    client = client_key(request)
+    _check(("client", client), RATE_LIMIT_CLIENT_RATE, RATE_LIMIT_CLIENT_BURST, "Too many requests, slow down")
+    if upstream_path not in DATA_PATHS:
+        return stack
+
+    source = await sheet_source(request)
+    _check(("data", client), RATE_LIMIT_DATA_RATE, RATE_LIMIT_DATA_BURST, "Too many sheet reads, slow down")
+    if source:
+        _check(("source",) + source, RATE_LIMIT_SOURCE_RATE, RATE_LIMIT_SOURCE_BURST,
+               "This sheet is being read too often, try again shortly")
+    _slot(stack, ("data", client), RATE_LIMIT_DATA_CONCURRENCY, "Too many sheet reads in progress")
+    if source:
+        _slot(stack, ("source",) + source, RATE_LIMIT_SOURCE_CONCURRENCY,
+              "This sheet is already being read, try again shortly")
+    return stack
@@ -10,6 +10,7 @@ let widgets = [];
 let activeFilters = [];
 let selectedWidgetId = null;
 let datasourceData = {}; // Map of datasource_id -> {data, columns, columnMapping, filteredData}
+let datasourceVersions = {}; // Map of datasource_id -> snapshot version the loaded data came from
 
 // Grid layout state
 let gridColumns = 12;
@@ -55,6 +56,8 @@ const elements = {
 let isLoggedIn = false;
 let currentUser = null;
 let currentDatasourceId = null; // Track current datasource ID if saved
+let liveController = null; // Aborts the live updates stream
+let liveDatasourceIds = ''; // Datasource ids the live stream is subscribed to
 
 // --- Initialization ---
 document.addEventListener('DOMContentLoaded', () => {
@@ -645,7 +648,7 @@ async function restoreWidget(w) {
 
     // Ensure widget's datasource data is loaded
     const dsId = w.datasource_id || currentDatasourceId;
-    if (dsId && !datasourceData[dsId]) {
+    if (dsId && !datasourceData[dsId] && !w.serverResult) {
         try {
             await loadDatasourceData(dsId);
         } catch (error) {
@@ -705,6 +708,11 @@ function showWidgetSettings(widgetId) {
     selectedWidgetId = widgetId;
     const w = widgets.find(obj => obj.id === widgetId);
     if (!w) return;
+    if (w.serverResult) {
+        // Editing needs the sheet itself: load it and compute the widget here from now on
+        editReportInBrowser(w);
+        return;
+    }
 
     // Highlight active widget
     document.querySelectorAll('.widget').forEach(node => node.classList.remove('active-widget'));
@@ -976,6 +984,25 @@ function updateReorderUI(w) {
 }
 
 // --- Data Management ---
+// Sheet reads are limited by the signed-in user's plan (anonymous reads get the Free plan)
+function dataRequestHeaders() {
+    const headers = { 'Content-Type': 'application/json' };
+    const token = localStorage.getItem('token');
+    if (token) headers['Authorization'] = 'Bearer ' + token;
+    return headers;
+}
+
+function showPlanLimit(response) {
+    const limitHit = response.headers.get('X-Limit-Hit');
+    if (!limitHit || !elements.connStatus) return;
+    const text = elements.connStatus.querySelector('.status-text');
+    const plan = response.headers.get('X-Plan');
+    const rowLimit = response.headers.get('X-Row-Limit');
+    const detail = limitHit === 'max_rows' ? `first ${rowLimit} rows` : 'partial data';
+    if (text) text.innerHTML = `Connected (${detail}, ${plan} plan limit)`;
+    console.warn(`⚠️ Sheet was cut short by the ${plan} plan's ${limitHit} limit`);
+}
+
 async function loadData() {
     const url = elements.sheetUrl.value;
     const gid = elements.gidInput.value || '0';
@@ -991,12 +1018,13 @@ async function loadData() {
     try {
         const response = await fetch('/api/proxy/data', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: dataRequestHeaders(),
             body: JSON.stringify({ sheet_url: url, gid: gid, has_headers: hasHeaders })
         });
 
         if (!response.ok) throw new Error('Failed to fetch data');
 
+        const version = response.headers.get('X-Snapshot-Version');
         let rawData = await response.json();
 
         if (rawData.length > 0) {
@@ -1031,13 +1059,17 @@ async function loadData() {
                     data: dashboardData,
                     filteredData: filteredData,
                     columns: currentColumns,
-                    columnMapping: columnMapping
+                    columnMapping: columnMapping,
+                    source: { sheet_url: url, gid: gid, has_headers: hasHeaders }
                 };
+                datasourceVersions[currentDatasourceId] = version;
+                subscribeToLiveUpdates();
             }
 
             renderRenameSection();
             if (elements.renameDetails) elements.renameDetails.style.display = 'block';
             updateStatus('connected');
+            showPlanLimit(response);
             if (elements.disconnectBtn) elements.disconnectBtn.style.display = 'block';
             const saveDataSourceBtn = document.getElementById('save-datasource-btn');
             if (saveDataSourceBtn) saveDataSourceBtn.style.display = 'block';
@@ -1087,6 +1119,7 @@ function disconnectData() {
         elements.datasourceSelector.value = '';
     }
     currentDatasourceId = null;
+    stopLiveUpdates();
     clearSidebarSettings();
 
     updateStatus('disconnected');
@@ -1120,10 +1153,17 @@ function refreshAllWidgets() {
     widgets.forEach(w => refreshWidget(w.id));
 }
 
+function refreshDatasourceWidgets(datasourceId) {
+    widgets
+        .filter(w => String(w.datasource_id || currentDatasourceId) === String(datasourceId))
+        .forEach(w => refreshWidget(w.id));
+}
+
 function refreshWidget(id) {
     const w = widgets.find(obj => obj.id === id);
     if (!w) return;
-    if (w.type === 'chart') renderChart(id);
+    if (w.serverResult) renderServerResult(id);
+    else if (w.type === 'chart') renderChart(id);
     else renderTable(id);
 }
 
@@ -1135,72 +1175,13 @@ function renderChart(id) {
     // Get widget-specific data
     const widgetData = getWidgetData(w);
     if (!widgetData || !widgetData.length) return;
+    if (!w.config.xCols.length || !w.config.yCols.length) return;
 
-    const xCols = w.config.xCols;
-    const yCols = w.config.yCols;
-    if (!xCols.length || !yCols.length) return;
-
-    let data = [...widgetData];
-    if (w.config.group) {
-        const grouped = {};
-        data.forEach(row => {
-            let key = row[w.config.group];
-            if (w.config.period && !isNaN(Date.parse(key))) {
-                const d = new Date(key);
-                if (w.config.period === 'year') key = d.getFullYear();
-                else if (w.config.period === 'month') key = `${d.getFullYear()}-${d.getMonth() + 1}`;
-                else if (w.config.period === 'week') {
-                    const day = d.getDay(),
-                        diff = d.getDate() - day + (day == 0 ? -6 : 1); // Monday
-                    const monday = new Date(d.setDate(diff));
-                    key = monday.toISOString().split('T')[0];
-                }
-                else if (w.config.period === 'day') key = d.toISOString().split('T')[0];
-                else if (w.config.period === 'hour') key = d.toISOString().split(':')[0];
-            }
-            if (!grouped[key]) grouped[key] = { vals: {}, count: 0, xVals: {} };
-            yCols.forEach(y => {
-                if (!grouped[key].vals[y]) grouped[key].vals[y] = [];
-                const v = parseFloat(row[y]);
-                if (!isNaN(v)) grouped[key].vals[y].push(v);
-            });
-            xCols.forEach(x => { if (grouped[key].xVals[x] === undefined) grouped[key].xVals[x] = row[x]; });
-            grouped[key].count++;
-        });
-
-        data = Object.keys(grouped).map(k => {
-            const g = grouped[k];
-            const res = { [w.config.group]: k };
-            xCols.forEach(x => res[x] = g.xVals[x]);
-            yCols.forEach(y => {
-                const l = g.vals[y];
-                let val = 0;
-                if (w.config.agg === 'sum') val = l.reduce((a, b) => a + b, 0);
-                else if (w.config.agg === 'mean') val = l.reduce((a, b) => a + b, 0) / (l.length || 1);
-                else if (w.config.agg === 'count') val = g.count;
-                else if (w.config.agg === 'min') val = l.length ? Math.min(...l) : 0;
-                else if (w.config.agg === 'max') val = l.length ? Math.max(...l) : 0;
-                res[y] = Math.round(val * 100) / 100;
-            });
-            return res;
-        });
-    }
-
-    const traces = [];
-    xCols.forEach(x => {
-        yCols.forEach(y => {
-            const widgetMapping = getWidgetColumnMapping(w);
-            const getWidgetMappedName = (col) => widgetMapping[col] || col;
-            traces.push({
-                x: data.map(d => d[x]),
-                y: data.map(d => d[y]),
-                type: w.config.type === 'area' ? 'scatter' : (w.config.type === 'pie' ? 'pie' : w.config.type),
-                fill: w.config.type === 'area' ? 'tozeroy' : undefined,
-                name: `${getWidgetMappedName(x)} | ${getWidgetMappedName(y)}`
-            });
-        });
-    });
+    const widgetMapping = getWidgetColumnMapping(w);
+    renderResult(node, chartResult(w.config, widgetData, col => widgetMapping[col] || col));
+}
 
+function plotChart(node, traces) {
     const placeholder = node.querySelector('.chart-placeholder');
     const layout = {
         margin: { t: 30, b: 50, l: 50, r: 30 },
@@ -1239,70 +1220,42 @@ function renderTable(id) {
     const widgetData = getWidgetData(w);
     if (!widgetData || !widgetData.length) return;
 
-    let data = [...widgetData];
-    const cols = w.config.columns;
-    if (!cols.length) {
-        node.querySelector('.table-container').innerHTML = '<div class="settings-empty-msg">Select columns in settings</div>';
-        return;
-    }
+    const widgetMapping = getWidgetColumnMapping(w);
+    renderResult(node, tableResult(w.config, widgetData, col => widgetMapping[col] || col));
+}
 
-    if (w.config.group) {
-        const grouped = {};
-        data.forEach(row => {
-            let key = row[w.config.group];
-            if (w.config.period && !isNaN(Date.parse(key))) {
-                const d = new Date(key);
-                if (w.config.period === 'year') key = d.getFullYear();
-                else if (w.config.period === 'month') key = `${d.getFullYear()}-${d.getMonth() + 1}`;
-                else if (w.config.period === 'week') {
-                    const day = d.getDay(),
-                        diff = d.getDate() - day + (day == 0 ? -6 : 1); // Monday
-                    const monday = new Date(d.setDate(diff));
-                    key = monday.toISOString().split('T')[0];
-                }
-                else if (w.config.period === 'day') key = d.toISOString().split('T')[0];
-                else if (w.config.period === 'hour') key = d.toISOString().split(':')[0];
-            }
-            if (!grouped[key]) {
-                grouped[key] = { [w.config.group]: key, '_vals': {} };
-                cols.forEach(c => { if (c !== w.config.group) grouped[key]._vals[c] = []; });
-            }
-            cols.forEach(c => {
-                if (c !== w.config.group) {
-                    const v = parseFloat(row[c]);
-                    if (!isNaN(v)) grouped[key]._vals[c].push(v);
-                    else grouped[key]._vals[c].push(row[c]);
-                }
-            });
-        });
+// A saved report's widget as the backend computed it (GET /reports/{id}/result)
+function renderServerResult(id) {
+    const node = document.getElementById(id);
+    const w = widgets.find(obj => obj.id === id);
+    if (!node || !w) return;
 
-        data = Object.keys(grouped).map(k => {
-            const g = grouped[k];
-            const res = { [w.config.group]: g[w.config.group] };
-            cols.forEach(c => {
-                if (c !== w.config.group) {
-                    const l = g._vals[c];
-                    const nl = l.filter(v => typeof v === 'number');
-                    if (nl.length > 0) {
-                        let val = 0;
-                        if (w.config.agg === 'sum') val = nl.reduce((a, b) => a + b, 0);
-                        else if (w.config.agg === 'mean') val = nl.reduce((a, b) => a + b, 0) / (nl.length || 1);
-                        else if (w.config.agg === 'count') val = l.length;
-                        else if (w.config.agg === 'min') val = Math.min(...nl);
-                        else if (w.config.agg === 'max') val = Math.max(...nl);
-                        res[c] = Math.round(val * 100) / 100;
-                    } else {
-                        res[c] = w.config.agg === 'count' ? l.length : l[0];
-                    }
-                }
-            });
-            return res;
-        });
+    let badge = node.querySelector('.widget-stale');
+    if (w.stale && !badge) {
+        badge = document.createElement('span');
+        badge.className = 'widget-stale';
+        badge.textContent = 'Updating…';
+        badge.title = 'The report or its sheet changed since this was computed; a fresh result is on its way';
+        node.querySelector('.widget-title').appendChild(badge);
+    } else if (!w.stale && badge) {
+        badge.remove();
     }
 
-    const widgetMapping = getWidgetColumnMapping(w);
-    const getWidgetMappedName = (col) => widgetMapping[col] || col;
-    const html = `<table class="data-table"><thead><tr>${cols.map(c => `<th>${getWidgetMappedName(c)}</th>`).join('')}</tr></thead><tbody>${data.slice(0, 50).map(r => `<tr>${cols.map(c => `<td>${r[c] !== undefined ? r[c] : ''}</td>`).join('')}</tr>`).join('')}</tbody></table>`;
+    renderResult(node, w.serverResult);
+}
+
+// A widget's result (widgets.js, or backend/widgets.py for saved reports) on its node
+function renderResult(node, result) {
+    if (result.type === 'chart') {
+        plotChart(node, result.traces);
+        return;
+    }
+    if (result.message) {
+        node.querySelector('.table-container').innerHTML = `<div class="settings-empty-msg">${result.message}</div>`;
+        return;
+    }
+    const cell = v => (v === null || v === undefined ? '' : v);
+    const html = `<table class="data-table"><thead><tr>${result.columns.map(c => `<th>${c}</th>`).join('')}</tr></thead><tbody>${result.rows.map(r => `<tr>${r.map(v => `<td>${cell(v)}</td>`).join('')}</tr>`).join('')}</tbody></table>`;
     node.querySelector('.table-container').innerHTML = html;
 }
 
@@ -1362,72 +1315,34 @@ function addFilterRow(autoApply = true) {
     return row;
 }
 
-function applyFilters() {
+function applyFilters(onlyDatasourceId) {
     // Apply filters to primary datasource
     if (!dashboardData) return;
-    const fRows = document.querySelectorAll('.filter-row');
-    
-    // Helper function to filter a single row
-    const filterRow = (r, columns) => {
-        for (let row of fRows) {
-            const c = row.querySelector('.filter-col').value;
-            // Skip if column doesn't exist in this datasource
-            if (!columns.includes(c)) continue;
-            
-            const op = row.querySelector('.filter-op').value;
-            const val = row.querySelector('.filter-val')?.value.toLowerCase() || '';
-            const s = row.querySelector('.filter-start')?.value || '';
-            const e = row.querySelector('.filter-end')?.value || '';
-
-            let rv = r[c];
-            if (rv === null || rv === undefined) return false;
-
-            // Date handling logic
-            const rvDate = Date.parse(rv);
-            const isDateCol = !isNaN(rvDate) && (String(rv).includes('-') || String(rv).includes('/'));
-
-            if (isDateCol) {
-                const targetRV = new Date(rvDate).getTime();
-                if (op === 'between') {
-                    if (s && targetRV < new Date(s).getTime()) return false;
-                    if (e && targetRV > new Date(e).getTime()) return false;
-                } else if (op === '=') {
-                    if (s && new Date(targetRV).toISOString().split('T')[0] !== s) return false;
-                } else if (op === '!=') {
-                    if (s && new Date(targetRV).toISOString().split('T')[0] === s) return false;
-                } else if (op === '>') {
-                    if (s && targetRV <= new Date(s).getTime()) return false;
-                } else if (op === '<') {
-                    if (s && targetRV >= new Date(s).getTime()) return false;
-                }
-            } else {
-                const rs = String(rv).toLowerCase();
-                if (op === 'between') {
-                    const numRV = parseFloat(rv);
-                    if (s && numRV < parseFloat(s)) return false;
-                    if (e && numRV > parseFloat(e)) return false;
-                } else if (op === '=') { if (val && rs !== val) return false; }
-                else if (op === '!=') { if (val && rs === val) return false; }
-                else if (op === 'contains') { if (val && !rs.includes(val)) return false; }
-                else if (op === '>') { if (val && parseFloat(rv) <= parseFloat(val)) return false; }
-                else if (op === '<') { if (val && parseFloat(rv) >= parseFloat(val)) return false; }
-            }
-        }
-        return true;
-    };
+    const isTarget = dsId => !onlyDatasourceId || String(dsId) === String(onlyDatasourceId);
+    const filters = Array.from(document.querySelectorAll('.filter-row')).map(row => ({
+        col: row.querySelector('.filter-col').value,
+        op: row.querySelector('.filter-op').value,
+        val: row.querySelector('.filter-val')?.value || '',
+        start: row.querySelector('.filter-start')?.value || '',
+        end: row.querySelector('.filter-end')?.value || ''
+    }));
     
     // Apply filters to primary datasource
-    filteredData = dashboardData.filter(r => filterRow(r, currentColumns));
+    if (!onlyDatasourceId || !currentDatasourceId || isTarget(currentDatasourceId)) {
+        filteredData = dashboardData.filter(r => rowMatches(r, currentColumns, filters));
+    }
     
     // Apply filters to all datasources in datasourceData
     for (const dsId in datasourceData) {
+        if (!isTarget(dsId)) continue;
         const dsData = datasourceData[dsId];
         if (dsData && dsData.data) {
-            dsData.filteredData = dsData.data.filter(r => filterRow(r, dsData.columns || []));
+            dsData.filteredData = dsData.data.filter(r => rowMatches(r, dsData.columns || [], filters));
         }
     }
     
-    refreshAllWidgets();
+    if (onlyDatasourceId) refreshDatasourceWidgets(onlyDatasourceId);
+    else refreshAllWidgets();
 }
 
 // --- Utils ---
@@ -1591,6 +1506,7 @@ async function handleAuthSubmit(e) {
 }
 
 function handleLogout() {
+    stopLiveUpdates();
     localStorage.removeItem('token');
     isLoggedIn = false;
     currentUser = null;
@@ -2064,67 +1980,137 @@ async function loadSavedReport(report) {
             elements.hasHeaders.checked = datasource.config.has_headers !== false;
         }
 
+        // Show the result the backend keeps for the report, without downloading its sheet.
+        // The sheet is only loaded to edit the report, or if there is no result to show.
+        const result = await fetchReportResult(report.id);
+        if (result) {
+            clearCanvas();
+            columnMapping = report.column_mapping || {};
+            const widget = {
+                id: 'widget-' + Date.now() + Math.random(),
+                type: report.widget_config.type,
+                datasource_id: report.datasource_id,
+                config: report.widget_config.config || {},
+                report: report,
+                serverResult: result.result,
+                stale: result.stale
+            };
+            await restoreWidget(widget);
+            if (result.stale) watchReportResult(widget);
+            return;
+        }
+
         // Load the data
         await loadData();
 
         // Wait a bit for data to load, then restore report state
-        setTimeout(async () => {
-            // Restore column mapping for report's datasource
-            if (report.column_mapping) {
-                columnMapping = report.column_mapping;
-                if (datasourceData[report.datasource_id]) {
-                    datasourceData[report.datasource_id].columnMapping = report.column_mapping;
-                }
-                renderRenameSection();
-            }
+        setTimeout(() => restoreReportState(report), 500);
+    } catch (error) {
+        console.error('Error loading report:', error);
+        alert('Failed to load report');
+    }
+}
 
-            // Clear existing widgets
-            widgets = [];
-            elements.workspaceCanvas.innerHTML = '';
-            if (document.querySelector('.empty-canvas-message')) {
-                document.querySelector('.empty-canvas-message').style.display = 'none';
+async function fetchReportResult(reportId) {
+    try {
+        const response = await fetch(`/api/reports/${reportId}/result`, {
+            headers: {
+                'Authorization': 'Bearer ' + localStorage.getItem('token')
             }
+        });
+        if (!response.ok) return null;
+        const result = await response.json();
+        return result.result ? result : null;
+    } catch (error) {
+        console.error('Error loading report result:', error);
+        return null;
+    }
+}
 
-            // Restore filters
-            if (report.filters && report.filters.length > 0) {
-                elements.activeFiltersList.innerHTML = '';
-                report.filters.forEach(f => {
-                    const row = addFilterRow(false);
-                    row.querySelector('.filter-col').value = f.col;
-                    row.querySelector('.filter-op').value = f.op;
-                    row.querySelector('.filter-col').dispatchEvent(new Event('change'));
-                    if (row.querySelector('.filter-val')) row.querySelector('.filter-val').value = f.val;
-                    if (row.querySelector('.filter-start')) row.querySelector('.filter-start').value = f.start;
-                    if (row.querySelector('.filter-end')) row.querySelector('.filter-end').value = f.end;
-                });
-            }
+// A stale result is being recomputed; show the fresh one once it is stored
+function watchReportResult(w, attempts = 10) {
+    setTimeout(async () => {
+        if (!w.serverResult || !widgets.includes(w)) return;
+        const result = await fetchReportResult(w.report.id);
+        if (result && w.serverResult) {
+            w.serverResult = result.result;
+            w.stale = result.stale;
+            refreshWidget(w.id);
+        }
+        if (w.stale && attempts > 1) watchReportResult(w, attempts - 1);
+    }, 3000);
+}
 
-            // Restore single widget from report
-            if (report.widget_config && report.widget_config.type) {
-                // Ensure report's datasource is loaded
-                if (!datasourceData[report.datasource_id]) {
-                    try {
-                        await loadDatasourceData(report.datasource_id);
-                    } catch (error) {
-                        console.error(`Failed to load datasource ${report.datasource_id}:`, error);
-                    }
-                }
+async function editReportInBrowser(w) {
+    await loadData();
+    await new Promise(resolve => setTimeout(resolve, 500));
+    const widgetId = await restoreReportState({
+        ...w.report,
+        widget_config: { type: w.type, config: w.config }
+    });
+    if (widgetId) showWidgetSettings(widgetId);
+}
 
-                const widget = {
-                    id: 'widget-' + Date.now() + Math.random(),
-                    type: report.widget_config.type,
-                    datasource_id: report.datasource_id,
-                    config: report.widget_config.config || {}
-                };
-                await restoreWidget(widget);
+function clearCanvas() {
+    widgets = [];
+    elements.workspaceCanvas.innerHTML = '';
+    if (document.querySelector('.empty-canvas-message')) {
+        document.querySelector('.empty-canvas-message').style.display = 'none';
+    }
+}
+
+// The report's widget, filters and column names over the loaded sheet; returns the widget id
+async function restoreReportState(report) {
+    // Restore column mapping for report's datasource
+    if (report.column_mapping) {
+        columnMapping = report.column_mapping;
+        if (datasourceData[report.datasource_id]) {
+            datasourceData[report.datasource_id].columnMapping = report.column_mapping;
+        }
+        renderRenameSection();
+    }
+
+    // Clear existing widgets
+    clearCanvas();
+
+    // Restore filters
+    if (report.filters && report.filters.length > 0) {
+        elements.activeFiltersList.innerHTML = '';
+        report.filters.forEach(f => {
+            const row = addFilterRow(false);
+            row.querySelector('.filter-col').value = f.col;
+            row.querySelector('.filter-op').value = f.op;
+            row.querySelector('.filter-col').dispatchEvent(new Event('change'));
+            if (row.querySelector('.filter-val')) row.querySelector('.filter-val').value = f.val;
+            if (row.querySelector('.filter-start')) row.querySelector('.filter-start').value = f.start;
+            if (row.querySelector('.filter-end')) row.querySelector('.filter-end').value = f.end;
+        });
+    }
+
+    // Restore single widget from report
+    let widgetId = null;
+    if (report.widget_config && report.widget_config.type) {
+        // Ensure report's datasource is loaded
+        if (!datasourceData[report.datasource_id]) {
+            try {
+                await loadDatasourceData(report.datasource_id);
+            } catch (error) {
+                console.error(`Failed to load datasource ${report.datasource_id}:`, error);
             }
+        }
 
-            applyFilters();
-        }, 500);
-    } catch (error) {
-        console.error('Error loading report:', error);
-        alert('Failed to load report');
+        const widget = {
+            id: 'widget-' + Date.now() + Math.random(),
+            type: report.widget_config.type,
+            datasource_id: report.datasource_id,
+            config: report.widget_config.config || {}
+        };
+        await restoreWidget(widget);
+        widgetId = widget.id;
     }
+
+    applyFilters();
+    return widgetId;
 }
 
 // Datasource Data Management
@@ -2150,7 +2136,7 @@ async function loadDatasourceData(datasourceId) {
         // Load the data
         const dataResponse = await fetch('/api/proxy/data', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: dataRequestHeaders(),
             body: JSON.stringify({ 
                 sheet_url: datasource.url, 
                 gid: datasource.config.gid || '0', 
@@ -2160,6 +2146,7 @@ async function loadDatasourceData(datasourceId) {
 
         if (!dataResponse.ok) throw new Error('Failed to fetch data');
 
+        const version = dataResponse.headers.get('X-Snapshot-Version');
         let rawData = await dataResponse.json();
 
         // Process data similar to loadData()
@@ -2190,8 +2177,15 @@ async function loadDatasourceData(datasourceId) {
                 data: rawData,
                 filteredData: [...rawData],
                 columns: columns,
-                columnMapping: colMapping
+                columnMapping: colMapping,
+                source: {
+                    sheet_url: datasource.url,
+                    gid: datasource.config.gid || '0',
+                    has_headers: hasHeaders
+                }
             };
+            datasourceVersions[datasourceId] = version;
+            subscribeToLiveUpdates();
 
             return datasourceData[datasourceId];
         }
@@ -2201,6 +2195,174 @@ async function loadDatasourceData(datasourceId) {
     }
 }
 
+// --- Live Updates ---
+function subscribeToLiveUpdates() {
+    const token = localStorage.getItem('token');
+    const ids = Object.keys(datasourceData).sort();
+    if (!token || ids.length === 0) return;
+
+    // Already streaming exactly these datasources
+    const key = ids.join(',');
+    if (liveController && key === liveDatasourceIds) return;
+
+    stopLiveUpdates();
+    liveDatasourceIds = key;
+    liveController = new AbortController();
+    readLiveEvents(ids, token, liveController);
+}
+
+function stopLiveUpdates() {
+    if (liveController) liveController.abort();
+    liveController = null;
+    liveDatasourceIds = '';
+}
+
+async function readLiveEvents(ids, token, controller) {
+    // fetch() rather than EventSource so the Authorization header can be sent
+    const query = ids.map(id => `datasource_id=${encodeURIComponent(id)}`).join('&');
+    try {
+        const response = await fetch(`/api/live/events?${query}`, {
+            headers: { 'Authorization': 'Bearer ' + token },
+            signal: controller.signal
+        });
+        if (!response.ok || !response.body) throw new Error('Failed to subscribe to live updates');
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            let end;
+            while ((end = buffer.indexOf('\n\n')) !== -1) {
+                handleLiveEvent(buffer.slice(0, end));
+                buffer = buffer.slice(end + 2);
+            }
+        }
+    } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error('Live updates disconnected:', error);
+    }
+
+    // Reconnect unless the stream was replaced or stopped on purpose
+    if (liveController === controller) {
+        setTimeout(() => {
+            if (liveController !== controller) return;
+            liveController = null;
+            subscribeToLiveUpdates();
+        }, 5000);
+    }
+}
+
+function handleLiveEvent(raw) {
+    let event = 'message';
+    let data = '';
+    raw.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+    });
+    if (event !== 'snapshot' || !data) return;
+
+    const payload = JSON.parse(data);
+    refreshDatasourceData(payload.datasource_id, payload.version)
+        .catch(err => console.error('Error refreshing data source:', err));
+}
+
+async function refreshDatasourceData(datasourceId, version) {
+    if (datasourceVersions[datasourceId] === version) return;
+
+    // Patch the loaded rows with just the changes if the server still has our version
+    let patched = false;
+    try {
+        patched = await applyDatasourceDelta(datasourceId);
+    } catch (error) {
+        console.error('Error applying data source delta:', error);
+    }
+
+    if (!patched) {
+        const previous = datasourceData[datasourceId];
+        delete datasourceData[datasourceId];
+        try {
+            const fresh = await loadDatasourceData(datasourceId);
+            if (!fresh) {
+                if (previous) datasourceData[datasourceId] = previous;
+                return;
+            }
+            // Keep the user's column renames
+            if (previous) fresh.columnMapping = previous.columnMapping;
+            if (String(datasourceId) === String(currentDatasourceId)) {
+                dashboardData = fresh.data;
+                currentColumns = fresh.columns;
+            }
+        } catch (error) {
+            if (previous) datasourceData[datasourceId] = previous;
+            throw error;
+        }
+    }
+
+    if (dashboardData) {
+        applyFilters(datasourceId);
+    } else {
+        const dsData = datasourceData[datasourceId];
+        if (dsData) dsData.filteredData = [...dsData.data];
+        refreshDatasourceWidgets(datasourceId);
+    }
+    console.log(`🔄 Data source ${datasourceId} updated`);
+}
+
+async function applyDatasourceDelta(datasourceId) {
+    const dsData = datasourceData[datasourceId];
+    const since = datasourceVersions[datasourceId];
+    if (!dsData || !dsData.source || !since) return false;
+
+    const response = await fetch(`/api/proxy/data?since=${encodeURIComponent(since)}`, {
+        method: 'POST',
+        headers: dataRequestHeaders(),
+        body: JSON.stringify(dsData.source)
+    });
+    if (!response.ok) return false;
+
+    const delta = await response.json();
+    const normalize = rows => dsData.source.has_headers ? rows : renameGenericColumns(rows);
+
+    if (delta.full) {
+        const rows = normalize(delta.rows);
+        replaceRows(dsData.data, 0, dsData.data.length, rows);
+        const columns = rows.length > 0 ? Object.keys(rows[0]) : dsData.columns;
+        dsData.columns.splice(0, dsData.columns.length, ...columns);
+        columns.forEach(c => { if (!(c in dsData.columnMapping)) dsData.columnMapping[c] = c; });
+    } else {
+        // Ops index into the old rows, so apply them back to front
+        for (let i = delta.ops.length - 1; i >= 0; i--) {
+            const op = delta.ops[i];
+            replaceRows(dsData.data, op.start, op.end, normalize(op.rows));
+        }
+    }
+
+    datasourceVersions[datasourceId] = delta.version;
+    return true;
+}
+
+function replaceRows(rows, start, end, newRows) {
+    // In place, so every reference to the array (e.g. dashboardData) sees the change.
+    // Not splice(start, n, ...newRows): spreading a large array overflows the call stack.
+    const tail = rows.slice(end);
+    rows.length = start;
+    newRows.forEach(r => rows.push(r));
+    tail.forEach(r => rows.push(r));
+}
+
+function renameGenericColumns(rows) {
+    // Sheets without headers come back keyed "0", "1"...; show them as "Col 1", "Col 2"...
+    return rows.map(row => {
+        const renamed = {};
+        Object.keys(row).forEach((k, i) => {
+            renamed[`Col ${i + 1}`] = row[k];
+        });
+        return renamed;
+    });
+}
+
 function getWidgetData(widget) {
     const dsId = widget.datasource_id || currentDatasourceId;
     
@@ -2308,25 +2470,14 @@ async function showReportSelectionModal() {
             return;
         }
 
-        // Fetch datasource names for each report
-        const token = localStorage.getItem('token');
-        const reportsWithDatasources = await Promise.all(reports.map(async (report) => {
-            try {
-                const dsResponse = await fetch(`/api/datasources/${report.datasource_id}`, {
-                    headers: { 'Authorization': 'Bearer ' + token }
-                });
-                if (dsResponse.ok) {
-                    const datasource = await dsResponse.json();
-                    return { ...report, datasource_name: datasource.name };
-                }
-            } catch (e) {
-                console.error('Error fetching datasource:', e);
-            }
-            return { ...report, datasource_name: 'Unknown' };
+        // Report summaries already include the datasource name
+        const reportsWithDatasources = reports.map(report => ({
+            ...report,
+            datasource_name: report.datasource_name || 'Unknown'
         }));
 
         listContainer.innerHTML = reportsWithDatasources.map(report => {
-            const widgetType = report.widget_config && report.widget_config.type ? report.widget_config.type : 'unknown';
+            const widgetType = report.widget_type || 'unknown';
             const itemId = `report-item-${report.id}`;
             return `
                 <div class="report-selection-item" id="${itemId}" style="padding: 15px; border: 1px solid #e0e0e0; border-radius: 8px; margin-bottom: 10px; cursor: pointer; transition: background 0.2s;">
@@ -0,0 +1,198 @@
+// Widget computations: a chart's traces or a table's rows from a sheet's rows.
+// backend/widgets.py computes the same results for saved reports (GET /reports/{id}/result),
+// and main.js renders either; backend/tests/test_widgets.py checks that the two agree.
+
+const TABLE_ROWS = 50;
+
+// --- Filters ---
+// filters: [{col, op, val, start, end}], as in the dashboard's filter rows and saved reports
+function rowMatches(r, columns, filters) {
+    for (const f of filters) {
+        const c = f.col;
+        // Skip if column doesn't exist in this datasource
+        if (!columns.includes(c)) continue;
+
+        const op = f.op;
+        const val = (f.val || '').toLowerCase();
+        const s = f.start || '';
+        const e = f.end || '';
+
+        let rv = r[c];
+        if (rv === null || rv === undefined) return false;
+
+        // Date handling logic
+        const rvDate = Date.parse(rv);
+        const isDateCol = !isNaN(rvDate) && (String(rv).includes('-') || String(rv).includes('/'));
+
+        if (isDateCol) {
+            const targetRV = new Date(rvDate).getTime();
+            if (op === 'between') {
+                if (s && targetRV < new Date(s).getTime()) return false;
+                if (e && targetRV > new Date(e).getTime()) return false;
+            } else if (op === '=') {
+                if (s && new Date(targetRV).toISOString().split('T')[0] !== s) return false;
+            } else if (op === '!=') {
+                if (s && new Date(targetRV).toISOString().split('T')[0] === s) return false;
+            } else if (op === '>') {
+                if (s && targetRV <= new Date(s).getTime()) return false;
+            } else if (op === '<') {
+                if (s && targetRV >= new Date(s).getTime()) return false;
+            }
+        } else {
+            const rs = String(rv).toLowerCase();
+            if (op === 'between') {
+                const numRV = parseFloat(rv);
+                if (s && numRV < parseFloat(s)) return false;
+                if (e && numRV > parseFloat(e)) return false;
+            } else if (op === '=') { if (val && rs !== val) return false; }
+            else if (op === '!=') { if (val && rs === val) return false; }
+            else if (op === 'contains') { if (val && !rs.includes(val)) return false; }
+            else if (op === '>') { if (val && parseFloat(rv) <= parseFloat(val)) return false; }
+            else if (op === '<') { if (val && parseFloat(rv) >= parseFloat(val)) return false; }
+        }
+    }
+    return true;
+}
+
+function filterRows(rows, columns, filters) {
+    return filters.length ? rows.filter(r => rowMatches(r, columns, filters)) : rows;
+}
+
+// --- Grouping ---
+function periodKey(key, period) {
+    if (period && !isNaN(Date.parse(key))) {
+        const d = new Date(key);
+        if (period === 'year') key = d.getFullYear();
+        else if (period === 'month') key = `${d.getFullYear()}-${d.getMonth() + 1}`;
+        else if (period === 'week') {
+            const day = d.getDay(),
+                diff = d.getDate() - day + (day == 0 ? -6 : 1); // Monday
+            const monday = new Date(d.setDate(diff));
+            key = monday.toISOString().split('T')[0];
+        }
+        else if (period === 'day') key = d.toISOString().split('T')[0];
+        else if (period === 'hour') key = d.toISOString().split(':')[0];
+    }
+    return key;
+}
+
+function aggregate(agg, values, count) {
+    let val = 0;
+    if (agg === 'sum') val = values.reduce((a, b) => a + b, 0);
+    else if (agg === 'mean') val = values.reduce((a, b) => a + b, 0) / (values.length || 1);
+    else if (agg === 'count') val = count;
+    else if (agg === 'min') val = values.length ? Math.min(...values) : 0;
+    else if (agg === 'max') val = values.length ? Math.max(...values) : 0;
+    return Math.round(val * 100) / 100;
+}
+
+// --- Widgets ---
+// mappedName: original column name -> the name shown
+function chartResult(config, rows, mappedName) {
+    const xCols = config.xCols || [];
+    const yCols = config.yCols || [];
+    if (!xCols.length || !yCols.length) return { type: 'chart', traces: [], total_rows: rows.length };
+
+    let data = rows;
+    if (config.group) {
+        const grouped = {};
+        data.forEach(row => {
+            const key = periodKey(row[config.group], config.period);
+            if (!grouped[key]) grouped[key] = { vals: {}, count: 0, xVals: {} };
+            yCols.forEach(y => {
+                if (!grouped[key].vals[y]) grouped[key].vals[y] = [];
+                const v = parseFloat(row[y]);
+                if (!isNaN(v)) grouped[key].vals[y].push(v);
+            });
+            xCols.forEach(x => { if (grouped[key].xVals[x] === undefined) grouped[key].xVals[x] = row[x]; });
+            grouped[key].count++;
+        });
+
+        data = Object.keys(grouped).map(k => {
+            const g = grouped[k];
+            const res = { [config.group]: k };
+            xCols.forEach(x => res[x] = g.xVals[x]);
+            yCols.forEach(y => res[y] = aggregate(config.agg, g.vals[y], g.count));
+            return res;
+        });
+    }
+
+    const traces = [];
+    xCols.forEach(x => {
+        yCols.forEach(y => {
+            traces.push({
+                x: data.map(d => d[x]),
+                y: data.map(d => d[y]),
+                type: config.type === 'area' ? 'scatter' : (config.type === 'pie' ? 'pie' : config.type),
+                fill: config.type === 'area' ? 'tozeroy' : undefined,
+                name: `${mappedName(x)} | ${mappedName(y)}`
+            });
+        });
+    });
+    return { type: 'chart', traces, total_rows: data.length };
+}
+
+function tableResult(config, rows, mappedName) {
+    const cols = config.columns || [];
+    if (!cols.length) {
+        return { type: 'table', columns: [], rows: [], total_rows: 0, message: 'Select columns in settings' };
+    }
+
+    let data = rows;
+    if (config.group) {
+        const grouped = {};
+        data.forEach(row => {
+            const key = periodKey(row[config.group], config.period);
+            if (!grouped[key]) {
+                grouped[key] = { [config.group]: key, '_vals': {} };
+                cols.forEach(c => { if (c !== config.group) grouped[key]._vals[c] = []; });
+            }
+            cols.forEach(c => {
+                if (c !== config.group) {
+                    const v = parseFloat(row[c]);
+                    if (!isNaN(v)) grouped[key]._vals[c].push(v);
+                    else grouped[key]._vals[c].push(row[c]);
+                }
+            });
+        });
+
+        data = Object.keys(grouped).map(k => {
+            const g = grouped[k];
+            const res = { [config.group]: g[config.group] };
+            cols.forEach(c => {
+                if (c !== config.group) {
+                    const l = g._vals[c];
+                    const nl = l.filter(v => typeof v === 'number');
+                    if (nl.length > 0) res[c] = aggregate(config.agg, nl, l.length);
+                    else res[c] = config.agg === 'count' ? l.length : l[0];
+                }
+            });
+            return res;
+        });
+    }
+
+    return {
+        type: 'table',
+        columns: cols.map(c => mappedName(c)),
+        rows: data.slice(0, TABLE_ROWS).map(r => cols.map(c => r[c] !== undefined ? r[c] : '')),
+        total_rows: data.length
+    };
+}
+
+// A saved report's widget over its sheet's rows, as backend/widgets.py widget_result computes it
+function widgetResult(widgetConfig, filters, columnMapping, rows) {
+    widgetConfig = widgetConfig || {};
+    columnMapping = columnMapping || {};
+    const columns = rows.length ? Object.keys(rows[0]) : [];
+    rows = filterRows(rows, columns, filters || []);
+    const mappedName = col => columnMapping[col] || col;
+
+    const config = widgetConfig.config || {};
+    if (widgetConfig.type === 'chart') return chartResult(config, rows, mappedName);
+    if (widgetConfig.type === 'table') return tableResult(config, rows, mappedName);
+    throw new Error(`Unknown widget type: ${widgetConfig.type}`);
+}
+
+if (typeof module !== 'undefined') {
+    module.exports = { rowMatches, filterRows, periodKey, chartResult, tableResult, widgetResult };
+}